@@ -4,9 +4,20 @@ Interactive web interface to create trip itinerary PDFs
 """
 
 import streamlit as st
-from trip_pdf_generator import generate_pdf_from_data
+from ics_import import ICSImportError, import_ics
+from incremental_renderer import IncrementalRenderer
+from pdf_thumbnails import page_count, render_thumbnails, thumbnail_backend
+from render_cache import MemoryCacheBackend, RenderCache, cache_key
+from render_service import QueueFull, RenderService
+from trip_pdf_generator import DEFAULT_COLOR_MAP, warm_up
+from trip_renderers import get_renderer
+from trip_model import Trip
+from trip_schedule import check_schedule
+from trip_validation import validate_trip
 import os
+import time
 from datetime import datetime
+from threading import Thread
 
 st.set_page_config(
     page_title="Trip Itinerary PDF Generator",
@@ -14,20 +25,91 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize session state
+# Render cache shared by all sessions: re-clicking "Generate PDF" on an
+# unchanged trip returns the stored PDF instead of rendering it again
+@st.cache_resource
+def get_render_cache():
+    return RenderCache(MemoryCacheBackend(max_bytes=64 * 1024 * 1024))
+
+# Worker pool shared by all sessions; renders run off the script thread
+@st.cache_resource
+def get_render_service():
+    return RenderService(workers=2, max_pending=8)
+
+# ReportLab is only imported by the first render. Load it and build the styles in
+# the background once per server, while the first visitor fills in the form.
+@st.cache_resource
+def start_warm_up():
+    thread = Thread(target=warm_up, name='render-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+start_warm_up()
+
+# Default event types; each session edits its own copy
+@st.cache_data
+def default_event_types():
+    return {event_type.lower(): color for event_type, color in DEFAULT_COLOR_MAP.items()}
+
+# Example PDF for the sidebar, read once per version of the file instead of on every rerun
+@st.cache_data(show_spinner=False)
+def load_example_pdf(path, modified):
+    with open(path, "rb") as file:
+        return file.read()
+
+# Preview thumbnails, rasterized once per rendered PDF rather than on every rerun
+@st.cache_data(show_spinner=False, max_entries=32)
+def preview_thumbnails(pdf_bytes, max_pages):
+    return render_thumbnails(pdf_bytes, max_pages=max_pages), page_count(pdf_bytes)
+
+# Sidebar legend for a set of (event type, color) pairs
+@st.cache_data
+def event_type_legend(event_types):
+    lines = []
+    for event_type, color in event_types:
+        color_icon = f'<span style="display:inline-block; width:12px; height:12px; background-color:{color}; border-radius:2px; margin-right:5px;"></span>'
+        lines.append(f'{color_icon}**{type_label(event_type)}**')
+    return '  \n'.join(lines)
+
+def type_label(event_type):
+    return event_type.replace('_', ' ').title()
+
+# Days and events get stable ids, and their widget keys use them, so removing
+# one leaves the values typed into the others where they are
+def new_id():
+    st.session_state.next_id += 1
+    return st.session_state.next_id
+
+def new_day():
+    return {'id': new_id(), 'events': [new_id()]}
+
+# Initialize session state: the days in order, each with its event ids in order
 if 'days' not in st.session_state:
-    st.session_state.days = [{'events': [{}]}]
+    st.session_state.next_id = 0
+    st.session_state.days = [new_day()]
+
+# Per-session renderer that only re-parses the days edited since the last render
+if 'renderer' not in st.session_state:
+    st.session_state.renderer = IncrementalRenderer()
+
+# Render in progress (or finished) for this session, and the trip it was started for
+if 'render_job' not in st.session_state:
+    st.session_state.render_job = None
+    st.session_state.render_key = None
+
+# Live preview: the background render of the trip as it is edited, and the last
+# preview that finished; edits are debounced by waiting for the trip to stop changing
+if 'preview_job' not in st.session_state:
+    st.session_state.preview_job = None
+    st.session_state.preview_key = None
+    st.session_state.preview_pdf = None
+    st.session_state.preview_pdf_key = None
+    st.session_state.preview_seen_key = None
+    st.session_state.preview_seen_at = 0.0
 
 # Initialize custom event types
 if 'custom_event_types' not in st.session_state:
-    st.session_state.custom_event_types = {
-        'flight': '#3498db',
-        'hotel': '#e74c3c',
-        'activity': '#2ecc71',
-        'restaurant': '#f39c12',
-        'transport': '#9b59b6',
-        'other': '#95a5a6'
-    }
+    st.session_state.custom_event_types = default_event_types()
 
 # Custom CSS for better styling
 st.markdown("""
@@ -53,16 +135,119 @@ st.markdown("""
 st.markdown('<div class="main-header">✈️ Trip Itinerary PDF Generator</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">Create beautiful, minimalist trip itinerary PDFs</div>', unsafe_allow_html=True)
 
+# Detail fields of each event type, as rows of (trip field, label, widget key prefix);
+# custom event types use the 'other' fields
+EVENT_FORM_FIELDS = {
+    'flight': [
+        [('airline', "Airline/Flight #", 'airline'), ('from', "From", 'from'), ('to', "To", 'to')],
+        [('confirmation', "Confirmation #", 'confirmation'), ('seat', "Seat", 'seat')],
+    ],
+    'hotel': [
+        [('name', "Hotel Name", 'hotel_name'), ('address', "Address", 'address')],
+        [('check_in', "Check-in", 'checkin'), ('check_out', "Check-out", 'checkout'),
+         ('confirmation', "Confirmation #", 'conf')],
+    ],
+    'activity': [
+        [('name', "Activity Name", 'activity_name'), ('address', "Location/Address", 'location')],
+        [('duration', "Duration", 'duration'), ('confirmation', "Ticket/Confirmation", 'ticket')],
+    ],
+    'restaurant': [
+        [('name', "Restaurant Name", 'restaurant_name'), ('address', "Address", 'rest_address')],
+        [('reservation', "Reservation", 'reservation'), ('phone', "Phone", 'phone')],
+    ],
+    'transport': [
+        [('details', "Details", 'transport_details'), ('company', "Company/Service", 'company')],
+    ],
+    'other': [
+        [('name', "Name/Title", 'other_name'), ('location', "Location", 'custom_location')],
+        [('details', "Details", 'other_details'), ('confirmation', "Confirmation/Reference", 'custom_conf')],
+    ],
+}
+
+# Fields an imported value may go into when its event type has no field of the same name
+IMPORT_FIELD_ALIASES = {
+    'name': ('airline', 'details'),
+    'address': ('location', 'from'),
+    'confirmation': ('reservation',),
+}
+
+def event_form_fields(event_type):
+    return EVENT_FORM_FIELDS.get(event_type, EVENT_FORM_FIELDS['other'])
+
+def load_trip_into_form(trip):
+    """Replace the form's contents with trip data (e.g. from a calendar import)"""
+    state = st.session_state
+    state.trip_title = trip.get('title') or ''
+    state.trip_destination = trip.get('destination') or ''
+    state.trip_dates = trip.get('dates') or ''
+    
+    available_types = list(state.custom_event_types)
+    days = []
+    for day in trip['days']:
+        day_id = new_id()
+        state[f"day_date_{day_id}"] = day.get('date') or ''
+        event_ids = []
+        for event in day['events']:
+            event_id = new_id()
+            event_ids.append(event_id)
+            event_type = event.get('type', 'other')
+            if event_type not in available_types:
+                event_type = 'other' if 'other' in available_types else available_types[0]
+            state[f"event_type_{event_id}"] = event_type
+            state[f"event_time_{event_id}"] = event.get('time', '')
+            # Fields without a widget for this type go into the notes
+            widgets = {field: prefix for row in event_form_fields(event_type) for field, _, prefix in row}
+            notes = []
+            for field, value in event.items():
+                if field in ('type', 'time', 'notes'):
+                    continue
+                candidates = (field,) + IMPORT_FIELD_ALIASES.get(field, ())
+                key = next((f"{widgets[name]}_{event_id}" for name in candidates
+                            if name in widgets and f"{widgets[name]}_{event_id}" not in state), None)
+                if key is not None:
+                    state[key] = value
+                else:
+                    notes.append(f"{type_label(field)}: {value}")
+            if event.get('notes'):
+                notes.append(event['notes'])
+            state[f"notes_{event_id}"] = '\n'.join(notes)
+        days.append({'id': day_id, 'events': event_ids})
+    state.days = days or [new_day()]
+
+# Calendar import: fills in the form from a calendar export instead of typing every event
+with st.expander("📥 Import from Calendar (.ics)", expanded=False):
+    st.markdown("Upload a calendar export (Google Calendar, Outlook, Apple Calendar, TripIt...). "
+                "Events are grouped by day, and their types are guessed from their titles. "
+                "This replaces the days below.")
+    calendar_file = st.file_uploader("Calendar file", type=['ics'], key="ics_upload")
+    col1, col2 = st.columns(2)
+    with col1:
+        import_from = st.date_input("From (optional)", value=None, key="ics_from")
+    with col2:
+        import_to = st.date_input("To (optional)", value=None, key="ics_to")
+    if calendar_file is not None and st.button("📥 Import Events", use_container_width=True):
+        try:
+            # The upload is read a line at a time, so large calendars import quickly
+            imported_trip = import_ics(calendar_file, start=import_from, end=import_to)
+        except ICSImportError as e:
+            st.error(f"❌ {e}")
+        else:
+            if imported_trip['days']:
+                load_trip_into_form(imported_trip)
+                st.rerun()
+            else:
+                st.warning("No events found in that date range.")
+
 # Trip Info Section
 st.header("📋 Trip Information")
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    trip_title = st.text_input("Trip Name *", placeholder="e.g., European Adventure")
+    trip_title = st.text_input("Trip Name *", key="trip_title", placeholder="e.g., European Adventure")
 with col2:
-    destination = st.text_input("Destination", placeholder="e.g., Paris → Rome → Barcelona")
+    destination = st.text_input("Destination", key="trip_destination", placeholder="e.g., Paris → Rome → Barcelona")
 with col3:
-    dates = st.text_input("Dates", placeholder="e.g., June 15-25, 2024")
+    dates = st.text_input("Dates", key="trip_dates", placeholder="e.g., June 15-25, 2024")
 
 st.markdown("---")
 
@@ -112,293 +297,397 @@ st.markdown("---")
 # Days Section
 st.header("📅 Daily Itinerary")
 
-# Function to add a new day
+# Each day's editor is isolated, so editing one day costs the same however long
+# the trip is. Streamlit 1.33+ reruns just the day's fragment (st.fragment, or
+# st.experimental_fragment before 1.37); older versions put each day in a form
+# that only reruns the page when the day is saved.
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+def find_day(day_id):
+    return next((day for day in st.session_state.days if day['id'] == day_id), None)
+
+# Button callbacks: they run before the rerun the click starts, so no second rerun is needed
 def add_day():
-    st.session_state.days.append({'events': [{}]})
+    st.session_state.days.append(new_day())
 
-# Function to remove a day
-def remove_day(day_idx):
+def remove_day(day_id):
     if len(st.session_state.days) > 1:
-        st.session_state.days.pop(day_idx)
+        st.session_state.days = [day for day in st.session_state.days if day['id'] != day_id]
 
-# Function to add event to a day
-def add_event(day_idx):
-    st.session_state.days[day_idx]['events'].append({})
+def add_event(day_id):
+    find_day(day_id)['events'].append(new_id())
 
-# Function to remove event from a day
-def remove_event(day_idx, event_idx):
-    if len(st.session_state.days[day_idx]['events']) > 1:
-        st.session_state.days[day_idx]['events'].pop(event_idx)
+def remove_event(day_id, event_id):
+    events = find_day(day_id)['events']
+    if len(events) > 1:
+        events.remove(event_id)
 
-# Display each day
-for day_idx, day in enumerate(st.session_state.days):
+def event_editor(day, event_id, event_number, button):
+    """Widgets for one event"""
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        st.markdown(f"**Event {event_number}**")
+    with col2:
+        if len(day['events']) > 1:
+            button("❌", f"remove_event_{event_id}", form_label=f"❌ Event {event_number}",
+                   on_click=remove_event, args=(day['id'], event_id))
+    
+    # A type removed under "Event Types" falls back to the first available one
+    available_types = list(st.session_state.custom_event_types.keys())
+    type_key = f"event_type_{event_id}"
+    if st.session_state.get(type_key, available_types[0]) not in available_types:
+        del st.session_state[type_key]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        event_type = st.selectbox("Event Type *", available_types, key=type_key, format_func=type_label)
+    with col2:
+        st.text_input("Time", key=f"event_time_{event_id}", placeholder="e.g., 10:30 AM")
+    
+    # Event-specific fields based on type
+    for row in event_form_fields(event_type):
+        for column, (_, label, prefix) in zip(st.columns(len(row)), row):
+            with column:
+                st.text_input(label, key=f"{prefix}_{event_id}")
+    
+    # Notes field for all event types
+    st.text_area("Notes", key=f"notes_{event_id}", placeholder="Any additional notes or reminders...")
+
+def day_fields(day, day_number, in_form):
+    """Widgets for one day and its events"""
+    def button(label, key, form_label=None, **kwargs):
+        if in_form:
+            # Submits the day's edits too; labels must be unique within the form
+            return st.form_submit_button(form_label or label, **kwargs)
+        return st.button(label, key=key, **kwargs)
+    
     col1, col2 = st.columns([3, 1])
     with col1:
-        st.subheader(f"Day {day_idx + 1}")
+        st.subheader(f"Day {day_number}")
     with col2:
         if len(st.session_state.days) > 1:
-            if st.button(f"🗑️ Remove Day", key=f"remove_day_{day_idx}"):
-                remove_day(day_idx)
+            # Renumbers the following days, so the whole page reruns
+            if button("🗑️ Remove Day", f"remove_day_{day['id']}"):
+                remove_day(day['id'])
                 st.rerun()
     
     # Day details
     col1, col2 = st.columns(2)
     with col1:
-        day_date = st.text_input(
-            "Date",
-            key=f"day_date_{day_idx}",
-            placeholder="e.g., Saturday, June 15"
-        )
+        st.text_input("Date", key=f"day_date_{day['id']}", placeholder="e.g., Saturday, June 15")
     
     st.markdown("**Events:**")
     
     # Display each event in this day
-    for event_idx, event in enumerate(day['events']):
-        col1, col2 = st.columns([4, 1])
-        with col1:
-            st.markdown(f"**Event {event_idx + 1}**")
-        with col2:
-            if len(day['events']) > 1:
-                if st.button("❌", key=f"remove_event_{day_idx}_{event_idx}"):
-                    remove_event(day_idx, event_idx)
-                    st.rerun()
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            # Get list of available event types
-            available_types = list(st.session_state.custom_event_types.keys())
-            event_type = st.selectbox(
-                "Event Type *",
-                available_types,
-                key=f"event_type_{day_idx}_{event_idx}",
-                format_func=lambda x: x.replace('_', ' ').title()
-            )
-        with col2:
-            event_time = st.text_input(
-                "Time",
-                key=f"event_time_{day_idx}_{event_idx}",
-                placeholder="e.g., 10:30 AM"
-            )
-        
-        # Store basic info
-        st.session_state.days[day_idx]['events'][event_idx]['type'] = event_type
-        st.session_state.days[day_idx]['events'][event_idx]['time'] = event_time
-        
-        # Event-specific fields based on type
-        if event_type == "flight":
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                airline = st.text_input("Airline/Flight #", key=f"airline_{day_idx}_{event_idx}")
-                if airline:
-                    st.session_state.days[day_idx]['events'][event_idx]['airline'] = airline
-            with col2:
-                from_loc = st.text_input("From", key=f"from_{day_idx}_{event_idx}")
-                if from_loc:
-                    st.session_state.days[day_idx]['events'][event_idx]['from'] = from_loc
-            with col3:
-                to_loc = st.text_input("To", key=f"to_{day_idx}_{event_idx}")
-                if to_loc:
-                    st.session_state.days[day_idx]['events'][event_idx]['to'] = to_loc
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                confirmation = st.text_input("Confirmation #", key=f"confirmation_{day_idx}_{event_idx}")
-                if confirmation:
-                    st.session_state.days[day_idx]['events'][event_idx]['confirmation'] = confirmation
-            with col2:
-                seat = st.text_input("Seat", key=f"seat_{day_idx}_{event_idx}")
-                if seat:
-                    st.session_state.days[day_idx]['events'][event_idx]['seat'] = seat
-        
-        elif event_type == "hotel":
-            col1, col2 = st.columns(2)
-            with col1:
-                hotel_name = st.text_input("Hotel Name", key=f"hotel_name_{day_idx}_{event_idx}")
-                if hotel_name:
-                    st.session_state.days[day_idx]['events'][event_idx]['name'] = hotel_name
-            with col2:
-                address = st.text_input("Address", key=f"address_{day_idx}_{event_idx}")
-                if address:
-                    st.session_state.days[day_idx]['events'][event_idx]['address'] = address
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                check_in = st.text_input("Check-in", key=f"checkin_{day_idx}_{event_idx}")
-                if check_in:
-                    st.session_state.days[day_idx]['events'][event_idx]['check_in'] = check_in
-            with col2:
-                check_out = st.text_input("Check-out", key=f"checkout_{day_idx}_{event_idx}")
-                if check_out:
-                    st.session_state.days[day_idx]['events'][event_idx]['check_out'] = check_out
-            with col3:
-                confirmation = st.text_input("Confirmation #", key=f"conf_{day_idx}_{event_idx}")
-                if confirmation:
-                    st.session_state.days[day_idx]['events'][event_idx]['confirmation'] = confirmation
-        
-        elif event_type == "activity":
-            col1, col2 = st.columns(2)
-            with col1:
-                activity_name = st.text_input("Activity Name", key=f"activity_name_{day_idx}_{event_idx}")
-                if activity_name:
-                    st.session_state.days[day_idx]['events'][event_idx]['name'] = activity_name
-            with col2:
-                address = st.text_input("Location/Address", key=f"location_{day_idx}_{event_idx}")
-                if address:
-                    st.session_state.days[day_idx]['events'][event_idx]['address'] = address
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                duration = st.text_input("Duration", key=f"duration_{day_idx}_{event_idx}")
-                if duration:
-                    st.session_state.days[day_idx]['events'][event_idx]['duration'] = duration
-            with col2:
-                ticket = st.text_input("Ticket/Confirmation", key=f"ticket_{day_idx}_{event_idx}")
-                if ticket:
-                    st.session_state.days[day_idx]['events'][event_idx]['confirmation'] = ticket
-        
-        elif event_type == "restaurant":
-            col1, col2 = st.columns(2)
-            with col1:
-                restaurant_name = st.text_input("Restaurant Name", key=f"restaurant_name_{day_idx}_{event_idx}")
-                if restaurant_name:
-                    st.session_state.days[day_idx]['events'][event_idx]['name'] = restaurant_name
-            with col2:
-                address = st.text_input("Address", key=f"rest_address_{day_idx}_{event_idx}")
-                if address:
-                    st.session_state.days[day_idx]['events'][event_idx]['address'] = address
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                reservation = st.text_input("Reservation", key=f"reservation_{day_idx}_{event_idx}")
-                if reservation:
-                    st.session_state.days[day_idx]['events'][event_idx]['reservation'] = reservation
-            with col2:
-                phone = st.text_input("Phone", key=f"phone_{day_idx}_{event_idx}")
-                if phone:
-                    st.session_state.days[day_idx]['events'][event_idx]['phone'] = phone
-        
-        elif event_type == "transport":
-            col1, col2 = st.columns(2)
-            with col1:
-                transport_details = st.text_input("Details", key=f"transport_details_{day_idx}_{event_idx}")
-                if transport_details:
-                    st.session_state.days[day_idx]['events'][event_idx]['details'] = transport_details
-            with col2:
-                company = st.text_input("Company/Service", key=f"company_{day_idx}_{event_idx}")
-                if company:
-                    st.session_state.days[day_idx]['events'][event_idx]['company'] = company
-        
-        else:  # Custom event types or "other"
-            col1, col2 = st.columns(2)
-            with col1:
-                name = st.text_input("Name/Title", key=f"other_name_{day_idx}_{event_idx}")
-                if name:
-                    st.session_state.days[day_idx]['events'][event_idx]['name'] = name
-            with col2:
-                location = st.text_input("Location", key=f"custom_location_{day_idx}_{event_idx}")
-                if location:
-                    st.session_state.days[day_idx]['events'][event_idx]['location'] = location
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                details = st.text_input("Details", key=f"other_details_{day_idx}_{event_idx}")
-                if details:
-                    st.session_state.days[day_idx]['events'][event_idx]['details'] = details
-            with col2:
-                confirmation = st.text_input("Confirmation/Reference", key=f"custom_conf_{day_idx}_{event_idx}")
-                if confirmation:
-                    st.session_state.days[day_idx]['events'][event_idx]['confirmation'] = confirmation
-        
-        # Notes field for all event types
-        notes = st.text_area(
-            "Notes",
-            key=f"notes_{day_idx}_{event_idx}",
-            placeholder="Any additional notes or reminders..."
-        )
-        if notes:
-            st.session_state.days[day_idx]['events'][event_idx]['notes'] = notes
+    for event_number, event_id in enumerate(day['events'], 1):
+        event_editor(day, event_id, event_number, button)
     
     # Add event button
-    if st.button(f"➕ Add Event to Day {day_idx + 1}", key=f"add_event_{day_idx}"):
-        add_event(day_idx)
-        st.rerun()
-    
-    # Store day date
-    if day_date:
-        st.session_state.days[day_idx]['date'] = day_date
+    button(f"➕ Add Event to Day {day_number}", f"add_event_{day['id']}",
+           on_click=add_event, args=(day['id'],))
+    if in_form:
+        st.form_submit_button(f"💾 Save Day {day_number}", type="primary")
+        st.caption("Changes to this day, including a new event type's fields, apply when you save it.")
+
+def day_editor(day_id):
+    day = find_day(day_id)
+    if day is None:
+        # Removed since this fragment was last drawn
+        return
+    day_number = st.session_state.days.index(day) + 1
+    if fragment is not None:
+        day_fields(day, day_number, in_form=False)
+    else:
+        with st.form(f"day_form_{day_id}"):
+            day_fields(day, day_number, in_form=True)
+
+# Display each day
+day_editor_run = fragment(day_editor) if fragment is not None else day_editor
+for day in list(st.session_state.days):
+    day_editor_run(day['id'])
 
 # Add day button
 col1, col2, col3 = st.columns([1, 1, 1])
 with col2:
-    if st.button("➕ Add Another Day", use_container_width=True):
-        add_day()
-        st.rerun()
+    st.button("➕ Add Another Day", use_container_width=True, on_click=add_day)
 
 st.markdown("---")
 
 # Generate PDF Section
 st.header("🎨 Generate PDF")
 
-col1, col2, col3 = st.columns([1, 2, 1])
-with col2:
-    output_filename = st.text_input(
-        "PDF Filename",
-        value="my_trip_itinerary.pdf",
-        help="Name for your PDF file"
-    )
+def read_event(event_id):
+    """Event dictionary from an event's widgets, without empty fields"""
+    state = st.session_state
+    event_type = state.get(f"event_type_{event_id}")
+    if not event_type:
+        return None
+    event = {'type': event_type, 'time': state.get(f"event_time_{event_id}", '')}
+    for row in event_form_fields(event_type):
+        for field, _, prefix in row:
+            event[field] = state.get(f"{prefix}_{event_id}", '')
+    event['notes'] = state.get(f"notes_{event_id}", '')
+    return {k: v for k, v in event.items() if v}
+
+def build_trip_data():
+    """Trip data dictionary from the form"""
+    trip_data = {
+        'title': st.session_state.get('trip_title', ''),
+        'destination': st.session_state.get('trip_destination') or None,
+        'dates': st.session_state.get('trip_dates') or None,
+        'days': []
+    }
     
-    if st.button("🚀 Generate PDF", type="primary", use_container_width=True):
-        if not trip_title:
-            st.error("❌ Please enter a trip name!")
-        else:
-            try:
-                # Build trip data structure
-                trip_data = {
-                    'title': trip_title,
-                    'destination': destination if destination else None,
-                    'dates': dates if dates else None,
-                    'days': []
-                }
-                
-                # Process each day
-                for day_idx, day in enumerate(st.session_state.days):
-                    day_data = {
-                        'day_number': day_idx + 1,
-                        'date': day.get('date', ''),
-                        'events': []
-                    }
-                    
-                    # Process each event
-                    for event in day['events']:
-                        # Only add events that have a type
-                        if 'type' in event and event['type']:
-                            # Remove empty string values
-                            clean_event = {k: v for k, v in event.items() if v}
-                            if clean_event:  # Only add if not empty
-                                day_data['events'].append(clean_event)
-                    
-                    # Only add day if it has events
-                    if day_data['events']:
-                        trip_data['days'].append(day_data)
-                
-                # Generate PDF with custom colors
-                generate_pdf_from_data(trip_data, output_filename, st.session_state.custom_event_types)
-                
+    # Process each day
+    for day_idx, day in enumerate(st.session_state.days):
+        events = [event for event in map(read_event, day['events']) if event]
+        
+        # Only add day if it has events
+        if events:
+            trip_data['days'].append({
+                'day_number': day_idx + 1,
+                'date': st.session_state.get(f"day_date_{day['id']}", ''),
+                'events': events
+            })
+    
+    return trip_data
+
+def check_trip():
+    """
+    Validated trip from the form, its schedule, the trip to render and its render cache key
+
+    The schedule (None while the trip has errors) holds any clashing
+    bookings. The trip to render has each day sorted by time; it is held as
+    a trip_model.Trip record, and is None while the trip has errors. The
+    result is kept in the session with the form data it was checked from,
+    so the fragments polling the form only check it again after an edit.
+    """
+    state = st.session_state
+    form = build_trip_data()
+    event_types = dict(state.custom_event_types)
+    checked = state.get('checked_trip')
+    if checked is not None and checked[0] == form and checked[1] == event_types:
+        return checked[2]
+    
+    # Markup characters in the text are escaped so they print as typed
+    validation = validate_trip(form, event_types)
+    schedule = check_schedule(validation.trip) if validation.ok else None
+    trip = Trip.from_dict(schedule.trip) if schedule is not None else None
+    key = cache_key(trip if trip is not None else validation.trip, event_types)
+    result = (validation, schedule, trip, key)
+    state.checked_trip = (form, event_types, result)
+    return result
+
+def schedule_notes(schedule, limit=5):
+    """Show a trip's schedule conflicts, and the times and dates that could not be read"""
+    if schedule is None:
+        return
+    for issues, show in ((schedule.conflicts, st.warning), (schedule.warnings, st.caption)):
+        if not issues:
+            continue
+        lines = [f"- {message}" for _, message in issues[:limit]]
+        if len(issues) > limit:
+            lines.append(f"- ...and {len(issues) - limit} more")
+        heading = "⚠️ **Schedule conflicts:**" if show is st.warning else "Could not place in the schedule:"
+        show(heading + "\n" + "\n".join(lines))
+
+def submit_render(trip_data):
+    """Queue a render of the trip on the shared worker pool (raises QueueFull)"""
+    # Rendered with custom colors, in memory (nothing is written to disk), off the
+    # script thread so the page stays responsive
+    cache = get_render_cache()
+    renderer = st.session_state.renderer
+    return get_render_service().submit(
+        trip_data,
+        dict(st.session_state.custom_event_types),
+        renderer=lambda trip, types: cache.render(trip, types, renderer=renderer.render)
+    )
+
+# How often the Generate section checks the form for edits (with fragments)
+GENERATE_POLL_SECONDS = 0.5
+
+def generate_section():
+    """
+    Generate button, render progress and the download buttons
+
+    Everything here is derived from the current form: a render of a trip
+    that has since been edited is cancelled, and only downloads of the trip
+    as it is now are offered.
+    """
+    trip_title = st.session_state.get('trip_title', '')
+    validation, schedule, trip_data, trip_key = check_trip()
+
+    # A render of data that has since been edited is no longer wanted
+    job = st.session_state.render_job
+    if job is not None and st.session_state.render_key != trip_key:
+        job.cancel()
+        st.session_state.render_job = job = None
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        # Clashes are reported before rendering; they do not stop the PDF
+        schedule_notes(schedule)
+        
+        output_filename = st.text_input(
+            "PDF Filename",
+            value="my_trip_itinerary.pdf",
+            help="Name for your PDF file"
+        )
+        
+        if st.button("🚀 Generate PDF", type="primary", use_container_width=True):
+            preview = st.session_state.preview_job
+            if not trip_title:
+                st.error("❌ Please enter a trip name!")
+            elif not validation.ok:
+                for path, message in validation.errors:
+                    st.error(f"❌ {path}: {message}")
+            elif preview is not None and st.session_state.preview_key == trip_key and not preview.cancelled():
+                # The live preview has already rendered this trip (or is rendering it)
+                if job is not None and job is not preview:
+                    job.cancel()
+                st.session_state.render_job = job = preview
+                st.session_state.render_key = trip_key
+            else:
+                if job is not None:
+                    job.cancel()
+                try:
+                    job = submit_render(trip_data)
+                except QueueFull:
+                    job = None
+                    st.warning("⏳ The server is busy rendering other itineraries. Please try again in a moment.")
+                st.session_state.render_job = job
+                st.session_state.render_key = trip_key
+        
+        if job is not None:
+            if not job.done():
+                st.info("⏳ Generating your PDF...")
+                if st.button("✖️ Cancel", use_container_width=True):
+                    # A live preview render keeps going; only this download is dropped
+                    if job is not st.session_state.preview_job:
+                        job.cancel()
+                    st.session_state.render_job = None
+                    st.rerun()
+            elif job.cancelled():
+                st.session_state.render_job = None
+            elif job.exception() is not None:
+                st.error(f"❌ Error generating PDF: {str(job.exception())}")
+            else:
                 st.success(f"✅ PDF generated successfully: {output_filename}")
                 
                 # Provide download button
-                if os.path.exists(output_filename):
-                    with open(output_filename, "rb") as file:
-                        st.download_button(
-                            label="📥 Download PDF",
-                            data=file,
-                            file_name=output_filename,
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
-                
-            except Exception as e:
-                st.error(f"❌ Error generating PDF: {str(e)}")
+                st.download_button(
+                    label="📥 Download PDF",
+                    data=job.result(),
+                    file_name=output_filename,
+                    mime="application/pdf",
+                    use_container_width=True
+                )
+        
+        # The same itinerary for an email body or a chat message; these formats
+        # render in microseconds, so they are always ready
+        if trip_title and validation.ok:
+            st.caption("Or download it as:")
+            text_trip = check_schedule(
+                validate_trip(build_trip_data(), st.session_state.custom_event_types, escape=False).trip).trip
+            file_base = os.path.splitext(output_filename)[0] or "my_trip_itinerary"
+            formats = (("🌐 HTML", 'html', {'standalone': True}), ("📝 Markdown", 'markdown', {}), ("📄 Text", 'text', {}))
+            for column, (label, output_format, options) in zip(st.columns(len(formats)), formats):
+                renderer = get_renderer(output_format, st.session_state.custom_event_types, **options)
+                with column:
+                    st.download_button(
+                        label=label,
+                        data=renderer.render(text_trip),
+                        file_name=file_base + renderer.extension,
+                        mime=renderer.media_type,
+                        key=f"download_{output_format}",
+                        use_container_width=True
+                    )
+
+# Day edits only rerun their own fragment, so with fragments this section
+# rechecks the form on a timer instead of waiting for a full rerun
+if fragment is not None:
+    fragment(generate_section, run_every=GENERATE_POLL_SECONDS)()
+else:
+    generate_section()
+
+st.markdown("---")
+
+# Live Preview Section
+st.header("👀 Preview")
+
+PREVIEW_PAGES = 4
+# The trip must stay unchanged this long before a preview render starts
+PREVIEW_DEBOUNCE_SECONDS = 0.75
+# How often the preview fragment checks the form for edits
+PREVIEW_POLL_SECONDS = 0.5
+
+def live_preview(debounce_seconds=PREVIEW_DEBOUNCE_SECONDS):
+    """
+    Pre-render the trip in the background and show thumbnails of its pages
+
+    A render starts once the trip has been unchanged for debounce_seconds.
+    Returns True while a preview render is still due or running.
+    """
+    state = st.session_state
+    validation, schedule, trip, key = check_trip()
+    now = time.monotonic()
+    if key != state.preview_seen_key:
+        # Still being edited; wait for the trip to stop changing
+        state.preview_seen_key = key
+        state.preview_seen_at = now
+    
+    # A render of data that has since been edited is no longer wanted
+    job = state.preview_job
+    if job is not None and (state.preview_key != key or job.cancelled()):
+        job.cancel()
+        state.preview_job = job = None
+    
+    if (job is None and validation.ok and state.preview_pdf_key != key
+            and now - state.preview_seen_at >= debounce_seconds):
+        try:
+            state.preview_job = job = submit_render(trip)
+            state.preview_key = key
+        except QueueFull:
+            # The pool is busy; retried on the next poll
+            pass
+    
+    failed = job is not None and job.done() and job.exception() is not None
+    if job is not None and job.done() and not failed:
+        state.preview_pdf = job.result()
+        state.preview_pdf_key = key
+    
+    if not validation.ok:
+        st.warning(f"⚠️ Preview paused until the trip is fixed: {validation.message()}")
+    elif failed:
+        st.error(f"❌ Preview failed: {job.exception()}")
+    elif state.preview_pdf_key != key:
+        st.caption("⏳ Updating preview...")
+    
+    # The last finished preview stays up while the next one renders
+    if state.preview_pdf is not None:
+        if thumbnail_backend() is None:
+            st.caption(f"Preview rendered ({len(state.preview_pdf) // 1024 + 1} KB). "
+                       "Install pypdfium2 to see its pages here.")
+        else:
+            images, pages = preview_thumbnails(state.preview_pdf, PREVIEW_PAGES)
+            for column, (page_number, image) in zip(st.columns(PREVIEW_PAGES), enumerate(images, 1)):
+                with column:
+                    st.image(image, caption=f"Page {page_number} of {pages}")
+            if pages > len(images):
+                st.caption(f"Showing the first {len(images)} of {pages} pages.")
+    
+    return validation.ok and state.preview_pdf_key != key and not failed
+
+# With fragments the preview checks for edits on its own timer, so it also sees
+# edits made in the day fragments. Without them a timer would rerun the whole
+# page, so the preview starts on the rerun that applies an edit (days are saved
+# as a whole, so there is no typing to wait out) and is shown on the next one.
+if st.toggle("Live preview", value=True, key="live_preview",
+             help="Render the PDF in the background as you edit, so Generate is instant"):
+    if fragment is not None:
+        fragment(live_preview, run_every=PREVIEW_POLL_SECONDS)()
+    elif live_preview(debounce_seconds=0):
+        st.button("🔄 Show Updated Preview", key="refresh_preview")
 
 # Sidebar with tips
 with st.sidebar:
@@ -408,24 +697,21 @@ with st.sidebar:
     # Download example PDF button
     example_pdf_path = "sample_trip_itinerary.pdf"
     if os.path.exists(example_pdf_path):
-        with open(example_pdf_path, "rb") as file:
-            st.download_button(
-                label="📥 Download Example PDF",
-                data=file,
-                file_name="example_trip_itinerary.pdf",
-                mime="application/pdf",
-                use_container_width=True,
-                help="Download a sample PDF to see what your itinerary will look like"
-            )
+        st.download_button(
+            label="📥 Download Example PDF",
+            data=load_example_pdf(example_pdf_path, os.path.getmtime(example_pdf_path)),
+            file_name="example_trip_itinerary.pdf",
+            mime="application/pdf",
+            use_container_width=True,
+            help="Download a sample PDF to see what your itinerary will look like"
+        )
     
     st.markdown("---")
     st.header("💡 Tips")
     
     # Show current event type colors
     st.markdown("**Your Event Types:**")
-    for event_type, color in st.session_state.custom_event_types.items():
-        color_icon = f'<span style="display:inline-block; width:12px; height:12px; background-color:{color}; border-radius:2px; margin-right:5px;"></span>'
-        st.markdown(f'{color_icon}**{event_type.replace("_", " ").title()}**', unsafe_allow_html=True)
+    st.markdown(event_type_legend(tuple(st.session_state.custom_event_types.items())), unsafe_allow_html=True)
     
     st.markdown("")
     st.markdown("""
@@ -435,7 +721,7 @@ with st.sidebar:
     - Use consistent time formats (e.g., "10:00 AM")
     - Include addresses for easy navigation
     - Add notes for important reminders
-    - Keep events in chronological order
+    - Events are sorted by time, and clashing bookings are flagged above the Generate button
     
     **Quick Start:**
     1. Enter trip name (required)
@@ -449,3 +735,9 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("Made with ❤️ using Streamlit")
 
+# Poll a running render once the whole page has been drawn (the Generate
+# fragment polls itself)
+render_job = st.session_state.render_job
+if fragment is None and render_job is not None and not render_job.done():
+    time.sleep(0.3)
+    st.rerun()
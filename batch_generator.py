@@ -0,0 +1,321 @@
+"""
+Batch Trip Itinerary PDF Generator
+Render many trip itineraries in parallel across a process pool
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from render_cache import DiskCacheBackend, RenderCache
+from trip_model import InvalidTrip, Trip
+from trip_pdf_generator import generate_pdf_from_data, warm_up
+from trip_validation import validate_trip
+
+# One render cache per cache directory, per worker process
+_render_caches = {}
+
+
+class BatchResult:
+    """Outcome of rendering a single trip in a batch"""
+
+    __slots__ = ('index', 'path', 'bytes', 'duration', 'error')
+
+    def __init__(self, index, path, bytes=0, duration=0.0, error=None):
+        self.index = index
+        self.path = path
+        self.bytes = bytes
+        self.duration = duration
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'path': self.path,
+            'bytes': self.bytes,
+            'duration': round(self.duration, 6),
+            'error': self.error,
+        }
+
+    def __repr__(self):
+        status = 'ok' if self.ok else 'error'
+        return f"BatchResult(index={self.index}, path={self.path!r}, {status})"
+
+
+class InvalidRecord:
+    """Stand-in for an input record that could not be parsed"""
+
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def default_filename(index, trip_data):
+    """Build a stable, filesystem-safe file name for a trip"""
+    title = ''
+    if isinstance(trip_data, Mapping):
+        title = str(trip_data.get('title') or '')
+    slug = re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_')[:60]
+    if slug:
+        return f"{index:06d}_{slug}.pdf"
+    return f"{index:06d}.pdf"
+
+
+def _describe_error(exc):
+    """One-line description of a render failure"""
+    message = ' '.join(str(exc).split())
+    return f"{type(exc).__name__}: {message}" if message else type(exc).__name__
+
+
+def _get_render_cache(cache_dir):
+    cache = _render_caches.get(cache_dir)
+    if cache is None:
+        cache = _render_caches[cache_dir] = RenderCache(DiskCacheBackend(cache_dir))
+    return cache
+
+
+def _render_one(index, trip_data, path, custom_event_types, cache_dir=None, qr_codes=False):
+    """Render one trip, capturing any failure in the result (runs in a worker)"""
+    start = time.perf_counter()
+    try:
+        if cache_dir:
+            options = {'qr_codes': True} if qr_codes else None
+            pdf_bytes = _get_render_cache(cache_dir).render(trip_data, custom_event_types, options=options)
+            with open(path, 'wb') as f:
+                f.write(pdf_bytes)
+            size = len(pdf_bytes)
+        else:
+            # Streaming keeps worker memory flat on very long trips
+            generate_pdf_from_data(trip_data, path, custom_event_types, verbose=False, stream=True,
+                                   qr_codes=qr_codes)
+            size = os.path.getsize(path)
+    except Exception as e:
+        return BatchResult(index, path, duration=time.perf_counter() - start,
+                           error=_describe_error(e))
+    return BatchResult(index, path, size, time.perf_counter() - start)
+
+
+def generate_pdfs(trips, out_dir, workers=None, custom_event_types=None,
+                  ordered=True, max_in_flight=None, filename_func=default_filename,
+                  cache_dir=None, qr_codes=False):
+    """
+    Render an iterable of trip data dictionaries (or Trip records) to PDFs in out_dir
+
+    Trips are consumed lazily; at most max_in_flight renders are queued at
+    any time, so arbitrarily large (or unbounded) iterables are fine.
+
+    Args:
+        trips: Iterable of trip data dictionaries or Trip records
+        out_dir: Directory the PDFs are written to (created if missing)
+        workers: Number of worker processes (defaults to the CPU count);
+            1 renders in the current process
+        custom_event_types: Optional dictionary mapping event type names to color hex codes
+        ordered: Yield results in input order; otherwise as soon as they finish
+        max_in_flight: Maximum number of queued renders (defaults to 4 * workers)
+        filename_func: Callable (index, trip_data) -> file name within out_dir
+        cache_dir: Optional render cache directory shared by all workers;
+            trips rendered before are copied from it instead of re-rendered
+        qr_codes: Add QR codes below events (see qr_codes); each worker
+            encodes a place or confirmation once, however many trips share it
+
+    Yields:
+        BatchResult for every trip, including failed ones
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or 4 * workers, 1)
+
+    def jobs():
+        for index, trip_data in enumerate(trips):
+            # Reject malformed records here instead of shipping them to a worker
+            if isinstance(trip_data, InvalidRecord):
+                yield index, trip_data, None, trip_data.error
+                continue
+            report = validate_trip(trip_data, custom_event_types)
+            if not report.ok:
+                yield index, trip_data, None, report.message()
+                continue
+            try:
+                path = os.path.join(out_dir, filename_func(index, trip_data))
+            except Exception as e:
+                yield index, trip_data, None, _describe_error(e)
+                continue
+            # Render the normalized (escaped, coerced) trip
+            yield index, report.trip, path, None
+
+    if workers == 1:
+        # No pool: simplest path for debugging and tiny batches
+        for index, trip_data, path, error in jobs():
+            if error:
+                yield BatchResult(index, path, error=error)
+            else:
+                yield _render_one(index, trip_data, path, custom_event_types, cache_dir, qr_codes)
+        return
+
+    # Each worker imports ReportLab and builds the styles as it starts, in parallel
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_up) as pool:
+        pending = deque() if ordered else set()
+        for index, trip_data, path, error in jobs():
+            if error:
+                # Not rendered; report straight away (in order, if asked)
+                if ordered and pending:
+                    pending.append(BatchResult(index, path, error=error))
+                else:
+                    yield BatchResult(index, path, error=error)
+                continue
+
+            future = pool.submit(_render_one, index, trip_data, path,
+                                 custom_event_types, cache_dir, qr_codes)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+
+            # Bounded in-flight work: drain before submitting more
+            while len(pending) >= max_in_flight:
+                yield from _drain(pending, ordered)
+
+        while pending:
+            yield from _drain(pending, ordered)
+
+
+def _drain(pending, ordered):
+    """Yield at least one finished result from the pending futures"""
+    if ordered:
+        item = pending.popleft()
+        yield item if isinstance(item, BatchResult) else item.result()
+        # Flush results that are already available without blocking
+        while pending and (isinstance(pending[0], BatchResult) or pending[0].done()):
+            item = pending.popleft()
+            yield item if isinstance(item, BatchResult) else item.result()
+    else:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            yield future.result()
+
+
+def trip_record(data):
+    """
+    Parsed trip JSON as a compact Trip record
+
+    Data without the trip/day/event structure is returned as it is, so
+    that validate_trip reports everything wrong with it.
+    """
+    try:
+        return Trip.from_dict(data)
+    except InvalidTrip:
+        return data
+
+
+def iter_jsonl(stream):
+    """
+    Lazily parse one trip per line of a JSONL/NDJSON stream into Trip records
+
+    Blank lines are skipped; a line that is not valid JSON yields an
+    InvalidRecord so it is reported like any other failed trip.
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield InvalidRecord(f"line {line_number}: invalid JSON: {e}")
+        else:
+            yield trip_record(data)
+
+
+def iter_trip_file(path):
+    """Stream trips from a JSONL file (or stdin for '-'), or load a JSON file"""
+    if path == '-':
+        yield from iter_jsonl(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8'))
+    elif path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            yield from iter_jsonl(f)
+    else:
+        yield from load_trips(path)
+
+
+def load_trips(path):
+    """
+    Load a JSON file holding a single trip or a list of trips as Trip records
+
+    The whole file is held in memory until the batch finishes, so the trips
+    are kept as records rather than nested dictionaries.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [data]
+    if isinstance(data, list):
+        # In place, so each dictionary can be freed as soon as it is converted
+        for index, trip in enumerate(data):
+            data[index] = trip_record(trip)
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render many trip itineraries to PDF in parallel")
+    parser.add_argument('inputs', nargs='+',
+                        help="JSON files holding a trip or a list of trips, "
+                             "JSONL/NDJSON files with one trip per line, or - for JSONL on stdin")
+    parser.add_argument('-o', '--out-dir', default='itineraries', help="Output directory (default: itineraries)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--event-types', help="JSON file mapping event type names to color hex codes")
+    parser.add_argument('--unordered', action='store_true', help="Report results as they finish")
+    parser.add_argument('--max-in-flight', type=int, default=None, help="Maximum queued renders")
+    parser.add_argument('--cache-dir', help="Reuse renders of unchanged trips from this directory")
+    parser.add_argument('--qr-codes', action='store_true', help="Add QR codes for addresses and confirmations")
+    parser.add_argument('--json', action='store_true',
+                        help="Print one JSON result line per trip (index, path, bytes, duration, error)")
+    args = parser.parse_args(argv)
+
+    custom_event_types = None
+    if args.event_types:
+        with open(args.event_types, encoding='utf-8') as f:
+            custom_event_types = json.load(f)
+
+    def trips():
+        for path in args.inputs:
+            yield from iter_trip_file(path)
+
+    failed = total = 0
+    start = time.perf_counter()
+    for result in generate_pdfs(trips(), args.out_dir, workers=args.workers,
+                                custom_event_types=custom_event_types,
+                                ordered=not args.unordered,
+                                max_in_flight=args.max_in_flight,
+                                cache_dir=args.cache_dir,
+                                qr_codes=args.qr_codes):
+        total += 1
+        if not result.ok:
+            failed += 1
+        if args.json:
+            print(json.dumps(result.to_dict(), ensure_ascii=False), flush=True)
+        elif result.ok:
+            print(f"✅ {result.path} ({result.bytes} bytes, {result.duration:.2f}s)")
+        else:
+            print(f"❌ trip #{result.index}: {result.error}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    # Keep stdout machine-readable in --json mode
+    print(f"Rendered {total - failed}/{total} trips in {elapsed:.2f}s",
+          file=sys.stderr if args.json else sys.stdout)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+"""
+Trip Itinerary PDF Benchmarks
+Time story construction and layout on synthetic trips, and record the results
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from io import BytesIO
+
+from reportlab import Version as REPORTLAB_VERSION
+
+from font_registry import get_font_registry
+from trip_pdf_generator import LAYOUTS, RENDER_VERSION, TripPDFGenerator, get_theme, load_theme
+from trip_schedule import check_schedule
+
+EVENT_TYPES = ['flight', 'hotel', 'activity', 'restaurant', 'transport', 'other']
+DETAIL_FIELDS = ['name', 'address', 'confirmation', 'notes', 'phone', 'guide',
+                 'meeting_point', 'check_in', 'check_out', 'reservation', 'duration', 'seat']
+WORDS = ['museum', 'tour', 'river', 'old', 'town', 'market', 'station', 'harbor', 'gallery',
+         'bridge', 'plaza', 'terminal', 'garden', 'castle', 'cathedral', 'street', 'avenue']
+# Mixed into the text with --unicode: words the standard PDF fonts cannot draw
+UNICODE_WORDS = ['Ακρόπολη', 'Αθήνα', 'Москва', 'вокзал', 'القاهرة', 'Δελφοί', 'Эрмитаж', 'Plaça']
+# --font choices: Helvetica only, Helvetica with a Unicode fallback, or a Unicode font throughout
+FONT_SETUPS = ('default', 'fallback', 'unicode')
+# Modules timed by --import-time: what the web UI, CLIs and render workers import first
+IMPORT_MODULES = ('trip_pdf_generator', 'trip_validation', 'render_cache', 'render_service',
+                  'incremental_renderer', 'pdf_thumbnails')
+
+# Run in a fresh interpreter: import a module, then (unless mode is 'import')
+# render the sample trip, after warm_up() when mode is 'warm'
+_COLD_START_SCRIPT = """
+import importlib, json, sys, time
+module, mode = sys.argv[1:3]
+start = time.perf_counter()
+importlib.import_module(module)
+result = {'import_seconds': time.perf_counter() - start,
+          'loads_reportlab': 'reportlab.platypus' in sys.modules}
+if mode != 'import':
+    import trip_pdf_generator
+    if mode == 'warm':
+        start = time.perf_counter()
+        trip_pdf_generator.warm_up()
+        result['warm_up_seconds'] = time.perf_counter() - start
+    start = time.perf_counter()
+    trip_pdf_generator.render_pdf_bytes(trip_pdf_generator.create_sample_trip())
+    result['first_render_seconds'] = time.perf_counter() - start
+print(json.dumps(result))
+"""
+
+
+def synthesize_trip(days=3, events_per_day=4, detail_fields=4, text_length=40, seed=0, unicode=False):
+    """
+    Build a deterministic synthetic trip
+
+    Args:
+        days: Number of days
+        events_per_day: Events on each day
+        detail_fields: Detail fields per event (besides type and time)
+        text_length: Approximate length in characters of each detail value
+        seed: Random seed, so the same parameters always give the same trip
+        unicode: Mix Greek, Cyrillic and Arabic words into the text
+    """
+    rng = random.Random(seed)
+    words_pool = WORDS + UNICODE_WORDS if unicode else WORDS
+    fields = [DETAIL_FIELDS[i % len(DETAIL_FIELDS)] + ('' if i < len(DETAIL_FIELDS) else f'_{i}')
+              for i in range(detail_fields)]
+
+    def text():
+        words = []
+        length = 0
+        while length < text_length:
+            word = rng.choice(words_pool)
+            words.append(word)
+            length += len(word) + 1
+        return ' '.join(words).capitalize()
+
+    return {
+        'title': f'Synthetic Trip {days}x{events_per_day}',
+        'destination': 'Benchmark City',
+        'dates': f'{days} days',
+        'days': [
+            {
+                'day_number': day + 1,
+                'date': f'Day {day + 1}',
+                'events': [
+                    dict(
+                        {'type': EVENT_TYPES[(day + event) % len(EVENT_TYPES)],
+                         'time': f'{(event % 12) + 1}:00 {"AM" if event < 12 else "PM"}'},
+                        **{field: text() for field in fields}
+                    )
+                    for event in range(events_per_day)
+                ],
+            }
+            for day in range(days)
+        ],
+    }
+
+
+def font_theme(setup):
+    """Theme for a --font setup; registers the Unicode font on first use"""
+    if setup == 'default':
+        return get_theme()
+    family = get_font_registry().register_unicode_family()
+    if family is None:
+        raise SystemExit(f"--font {setup} needs one of the fonts in font_registry.UNICODE_FONTS")
+    if setup == 'fallback':
+        return get_theme('Helvetica', (family,))
+    return get_theme(family)
+
+
+def _render_once(trip_data, layout='cards', theme=None, optimize=False, qr_codes=False):
+    """Render a trip in memory, returning (story seconds, build seconds, flowables, pages, bytes)"""
+    buffer = BytesIO()
+
+    start = time.perf_counter()
+    generator = TripPDFGenerator(buffer, theme=theme, layout=layout, optimize=optimize, qr_codes=qr_codes)
+    generator.add_title(trip_data['title'], trip_data.get('destination'), trip_data.get('dates'))
+    for day in trip_data['days']:
+        generator.add_day(day['day_number'], day['date'], day['events'])
+    story_seconds = time.perf_counter() - start
+    flowables = len(generator.story)
+
+    start = time.perf_counter()
+    generator.generate(verbose=False)
+    build_seconds = time.perf_counter() - start
+
+    return story_seconds, build_seconds, flowables, generator.doc.page, len(buffer.getvalue())
+
+
+def run_case(days, events_per_day, detail_fields, text_length, repeat=3, layout='cards',
+             font='default', unicode=False, optimize=False, theme_file=None, qr_codes=False):
+    """
+    Benchmark one parameter combination
+
+    With optimize, the trip is also rendered once without it, and the
+    difference in size is reported as bytes_saved. With theme_file, every
+    render is passed the theme file's path, as a server selecting a theme
+    per request would, so looking the compiled theme up is timed too.
+    With qr_codes, the warm-up render encodes every code, so the timed
+    renders measure drawing and embedding them, as later renders in a
+    worker would. The schedule check the web UI runs before rendering
+    (sorting each day and finding overlaps) is timed on its own.
+    """
+    trip_data = synthesize_trip(days, events_per_day, detail_fields, text_length, unicode=unicode)
+    theme = theme_file or font_theme(font)
+    fonts = get_font_registry()
+
+    # Warm-up render so one-time setup is not attributed to the first sample
+    default_size = _render_once(trip_data, layout, theme, qr_codes=qr_codes)[-1]
+    if optimize:
+        _render_once(trip_data, layout, theme, optimize, qr_codes)
+
+    story_times = []
+    build_times = []
+    lookups, lookup_seconds = fonts.lookups, fonts.lookup_seconds
+    for _ in range(repeat):
+        story_seconds, build_seconds, flowables, pages, size = _render_once(trip_data, layout, theme, optimize,
+                                                                            qr_codes)
+        story_times.append(story_seconds)
+        build_times.append(build_seconds)
+    lookups = (fonts.lookups - lookups) // repeat
+    lookup_seconds = (fonts.lookup_seconds - lookup_seconds) / repeat
+
+    schedule_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        check_schedule(trip_data)
+        schedule_times.append(time.perf_counter() - start)
+
+    # Memory is sampled in a separate run: tracemalloc slows everything down
+    tracemalloc.start()
+    try:
+        _render_once(trip_data, layout, theme, optimize, qr_codes)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    name = f'days={days},events={events_per_day},fields={detail_fields},text={text_length}'
+    if layout != 'cards':
+        name += f',layout={layout}'
+    if font != 'default':
+        name += f',font={font}'
+    if theme_file:
+        name += f',theme={os.path.splitext(os.path.basename(theme_file))[0]}'
+    if unicode:
+        name += ',unicode'
+    if optimize:
+        name += ',optimized'
+    if qr_codes:
+        name += ',qr'
+    return {
+        'name': name,
+        'params': {
+            'days': days,
+            'events_per_day': events_per_day,
+            'detail_fields': detail_fields,
+            'text_length': text_length,
+            'layout': layout,
+            'font': font,
+            'theme': theme_file,
+            'unicode': unicode,
+            'optimize': optimize,
+            'qr_codes': qr_codes,
+        },
+        'repeat': repeat,
+        'story_seconds': _summary(story_times),
+        'build_seconds': _summary(build_times),
+        'total_seconds': _summary([s + b for s, b in zip(story_times, build_times)]),
+        'schedule_seconds': _summary(schedule_times),
+        'flowables': flowables,
+        'pages': pages,
+        'output_bytes': size,
+        # Against the same render without optimize
+        'bytes_saved': default_size - size,
+        # Per render: text runs checked for glyph fallback, and the time spent on it
+        'font_lookups': lookups,
+        'font_lookup_seconds': lookup_seconds,
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def run_cold_start(modules=IMPORT_MODULES, repeat=5):
+    """
+    Time module imports, and the first render after them, in fresh interpreters
+
+    Every sample starts a new Python process, so nothing is already imported
+    or cached. The first render is timed cold and after warm_up(), which
+    shows how much of the deferred import work warm_up() takes off it.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def sample(module, mode):
+        process = subprocess.run([sys.executable, '-c', _COLD_START_SCRIPT, module, mode],
+                                 cwd=directory, capture_output=True, text=True, check=True)
+        return json.loads(process.stdout)
+
+    imports = []
+    for module in modules:
+        samples = [sample(module, 'import') for _ in range(repeat)]
+        imports.append({
+            'module': module,
+            'import_seconds': _summary([s['import_seconds'] for s in samples]),
+            'loads_reportlab': samples[0]['loads_reportlab'],
+        })
+
+    first_render = {}
+    for mode in ('cold', 'warm'):
+        samples = [sample('trip_pdf_generator', mode) for _ in range(repeat)]
+        first_render[mode] = {
+            'first_render_seconds': _summary([s['first_render_seconds'] for s in samples]),
+        }
+        if mode == 'warm':
+            first_render[mode]['warm_up_seconds'] = _summary([s['warm_up_seconds'] for s in samples])
+    return {'repeat': repeat, 'imports': imports, 'first_render': first_render}
+
+
+def _summary(samples):
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+    }
+
+
+def environment():
+    """Versions and platform details stored alongside the results"""
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'reportlab': REPORTLAB_VERSION,
+        'render_version': RENDER_VERSION,
+        # Parsing and registering TrueType fonts, paid once per process
+        'font_registration_seconds': get_font_registry().registration_seconds,
+    }
+
+
+def compare(baseline, results, threshold=0.10):
+    """
+    Compare two result files case by case on the fastest total time
+
+    The minimum is the least noisy statistic for a deterministic workload.
+
+    Returns a list of (case name, baseline seconds, current seconds, ratio,
+    flag), where flag is 'slower' or 'faster' beyond the threshold.
+    """
+    previous = {case['name']: case for case in baseline['cases']}
+    rows = []
+    for case in results['cases']:
+        old = previous.get(case['name'])
+        if old is None:
+            continue
+        before = old['total_seconds']['min']
+        after = case['total_seconds']['min']
+        ratio = after / before if before else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'slower'
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        rows.append((case['name'], before, after, ratio, flag))
+    return rows
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the trip itinerary rendering pipeline")
+    parser.add_argument('--days', type=_int_list, default=[3, 30], help="Comma-separated day counts")
+    parser.add_argument('--events', type=_int_list, default=[4, 10], help="Comma-separated events per day")
+    parser.add_argument('--fields', type=_int_list, default=[4], help="Comma-separated detail field counts")
+    parser.add_argument('--text', type=_int_list, default=[40], help="Comma-separated detail text lengths")
+    parser.add_argument('--layout', default='cards',
+                        help=f"Comma-separated layouts ({', '.join(LAYOUTS)})")
+    parser.add_argument('--font', default='default',
+                        help=f"Comma-separated font setups ({', '.join(FONT_SETUPS)})")
+    parser.add_argument('--theme', default='default',
+                        help="Comma-separated theme files (see trip_pdf_generator.load_theme); "
+                             "'default' is the built-in theme with each --font setup")
+    parser.add_argument('--unicode', action='store_true', help="Mix non-Latin words into the text")
+    parser.add_argument('--optimize', action='store_true',
+                        help="Render with optimized output and report the bytes saved")
+    parser.add_argument('--qr-codes', action='store_true', help="Add QR codes for addresses and confirmations")
+    parser.add_argument('--import-time', action='store_true',
+                        help="Time module imports and the first render in fresh interpreters instead")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="Machine-readable results file")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative change reported as a regression or improvement")
+    args = parser.parse_args(argv)
+
+    if args.import_time:
+        results = run_cold_start(repeat=max(args.repeat, 5))
+        for entry in results['imports']:
+            print(f"import {entry['module']:<28} {entry['import_seconds']['median'] * 1000:8.1f} ms"
+                  + ("  (loads ReportLab)" if entry['loads_reportlab'] else ''))
+        for mode, entry in results['first_render'].items():
+            print(f"first render, {mode:<22} {entry['first_render_seconds']['median'] * 1000:8.1f} ms"
+                  + (f"  after warm_up {entry['warm_up_seconds']['median'] * 1000:.1f} ms"
+                     if 'warm_up_seconds' in entry else ''))
+        results['environment'] = environment()
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+        return 0
+
+    results = {'cases': []}
+    layouts = [layout for layout in args.layout.split(',') if layout]
+    font_setups = [font for font in args.font.split(',') if font]
+    # Theme files set their own fonts, so they run with the default setup only
+    setups = []
+    for theme_file in (theme for theme in args.theme.split(',') if theme):
+        if theme_file == 'default':
+            setups.extend((font, None) for font in font_setups)
+        else:
+            load_theme(theme_file)  # Report a bad theme file before any timing
+            setups.append(('default', theme_file))
+    for (font, theme_file), layout, days, events, fields, text in itertools.product(
+            setups, layouts, args.days, args.events, args.fields, args.text):
+        case = run_case(days, events, fields, text, repeat=args.repeat, layout=layout,
+                        font=font, unicode=args.unicode, optimize=args.optimize, theme_file=theme_file,
+                        qr_codes=args.qr_codes)
+        results['cases'].append(case)
+        print(f"{case['name']:<60} story {case['story_seconds']['median'] * 1000:8.1f} ms  "
+              f"build {case['build_seconds']['median'] * 1000:8.1f} ms  "
+              f"schedule {case['schedule_seconds']['median'] * 1000:6.1f} ms  "
+              f"{case['pages']:4d} pages  {case['output_bytes'] / 1024:8.1f} KiB  "
+              f"peak {case['peak_memory_bytes'] / 1024 / 1024:6.1f} MiB"
+              + (f"  saved {case['bytes_saved'] / 1024:6.1f} KiB "
+                 f"({case['bytes_saved'] / (case['output_bytes'] + case['bytes_saved']):.0%})"
+                 if args.optimize else '')
+              + (f"  fonts {case['font_lookup_seconds'] * 1000:6.2f} ms" if font != 'default' else ''))
+    results['environment'] = environment()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = 0
+        for name, before, after, ratio, flag in compare(baseline, results, args.threshold):
+            regressions += flag == 'slower'
+            print(f"{name:<60} {before * 1000:8.1f} ms -> {after * 1000:8.1f} ms  x{ratio:.2f} {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
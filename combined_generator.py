@@ -0,0 +1,267 @@
+"""
+Combined Trip Itinerary PDF Generator
+Render many trips into one PDF with bookmarks and a table of contents
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+from trip_pdf_generator import TripPDFGenerator, hex_color
+
+# Table of contents layout (points)
+TOC_HEADING = 'Contents'
+TOC_HEADING_SIZE = 20
+TOC_HEADING_SPACE = 48
+TOC_FONT = 'Helvetica'
+TOC_FONT_SIZE = 11
+TOC_ROW_HEIGHT = 18
+TOC_PAGE_NUMBER_WIDTH = 40
+
+
+class _CombinedDocTemplate(SimpleDocTemplate):
+    """Records outline entries and trip start pages as flowables are laid out"""
+
+    def __init__(self, *args, **kwargs):
+        SimpleDocTemplate.__init__(self, *args, **kwargs)
+        self.trip_pages = []
+
+    def afterFlowable(self, flowable):
+        outline = getattr(flowable, '_outline', None)
+        if outline is None:
+            return
+        key, level = outline
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(flowable.getPlainText(), key, level=level, closed=True)
+        if level == 0:
+            self.trip_pages.append(self.page)
+
+
+class _TOCForms(Flowable):
+    """
+    Zero-size flowable placed last in the story
+
+    When drawn, every trip has been laid out, so it defines the form
+    XObjects that the reserved table of contents pages already refer to.
+    """
+
+    def __init__(self, generator):
+        Flowable.__init__(self)
+        self.generator = generator
+
+    def wrap(self, availWidth, availHeight):
+        return (0, 0)
+
+    def draw(self):
+        self.generator._draw_toc_forms(self.canv)
+
+
+class CombinedPDFGenerator(TripPDFGenerator):
+    """
+    Generate one PDF holding many trips
+
+    Each trip starts on a new page and gets an outline (bookmark) entry with
+    its days nested below. All trips share one document, so styles and fonts
+    are set up and embedded once.
+
+    The table of contents is laid out in a single pass: its pages are
+    reserved up front (the number of entries is known) and drawn from form
+    XObjects that are only defined once the last trip has been laid out,
+    so no second layout pass (multiBuild) is needed.
+    """
+
+    doc_template_class = _CombinedDocTemplate
+
+    def __init__(self, output_filename="combined_itineraries.pdf", theme=None, toc=True, qr_codes=False):
+        TripPDFGenerator.__init__(self, output_filename, theme=theme, qr_codes=qr_codes)
+        self.toc = toc
+        self.trip_titles = []
+
+    def add_trip(self, trip_data):
+        """Add a whole trip, starting on a new page"""
+        if self.trip_titles:
+            self.story.append(PageBreak())
+
+        key = f"trip-{len(self.trip_titles)}"
+        start = len(self.story)
+        title = trip_data.get('title', 'Trip Itinerary')
+        self.add_title(title, trip_data.get('destination'), trip_data.get('dates'))
+        for flowable in self.story[start:]:
+            if isinstance(flowable, Paragraph) and flowable.style.name == 'TripTitle':
+                flowable._outline = (key, 0)
+                break
+        self.trip_titles.append(flowable.getPlainText())
+
+        for day_idx, day in enumerate(trip_data.get('days', [])):
+            flowables = self.day_flowables(
+                day.get('day_number'),
+                day.get('date'),
+                day.get('events', [])
+            )
+            # The first flowable is the day header
+            flowables[0]._outline = (f"{key}-day-{day_idx}", 1)
+            self.story.extend(flowables)
+
+    def _toc_rows(self):
+        """Number of table of contents rows on the first and on later pages"""
+        frame_height = self.doc.height
+        first = int((frame_height - TOC_HEADING_SPACE) // TOC_ROW_HEIGHT)
+        later = int(frame_height // TOC_ROW_HEIGHT)
+        return max(first, 1), max(later, 1)
+
+    def _toc_layout(self):
+        """List of (page index, [(trip index, row)]) for the table of contents"""
+        first, later = self._toc_rows()
+        pages = []
+        index = 0
+        count = len(self.trip_titles)
+        while index < count or not pages:
+            rows = first if not pages else later
+            entries = [(i, row) for row, i in enumerate(range(index, min(index + rows, count)))]
+            pages.append(entries)
+            index += rows
+        return pages
+
+    def _row_top(self, page_idx, row):
+        top = self.doc.bottomMargin + self.doc.height
+        if page_idx == 0:
+            top -= TOC_HEADING_SPACE
+        return top - row * TOC_ROW_HEIGHT
+
+    def _on_page(self, canvas, doc):
+        page_idx = doc.page - 1
+        if page_idx >= len(self._toc_pages):
+            return
+        canvas.doForm(f"toc-{page_idx}")
+        left = doc.leftMargin
+        right = doc.leftMargin + doc.width
+        for trip_idx, row in self._toc_pages[page_idx]:
+            top = self._row_top(page_idx, row)
+            # Destinations are resolved when the document is saved
+            canvas.linkRect('', f"trip-{trip_idx}",
+                            (left, top - TOC_ROW_HEIGHT, right, top), relative=1)
+
+    def _draw_toc_forms(self, canvas):
+        left = self.doc.leftMargin
+        right = self.doc.leftMargin + self.doc.width
+        title_width = self.doc.width - TOC_PAGE_NUMBER_WIDTH
+        pages = self.doc.trip_pages
+        for page_idx, entries in enumerate(self._toc_pages):
+            canvas.beginForm(f"toc-{page_idx}")
+            if page_idx == 0:
+                canvas.setFont('Helvetica-Bold', TOC_HEADING_SIZE)
+                canvas.setFillColor(self.styles['TripTitle'].textColor)
+                canvas.drawString(left, self.doc.bottomMargin + self.doc.height - TOC_HEADING_SIZE,
+                                  TOC_HEADING)
+            canvas.setFont(TOC_FONT, TOC_FONT_SIZE)
+            canvas.setFillColor(self.styles['EventDetails'].textColor)
+            canvas.setStrokeColor(hex_color('#cccccc'))
+            canvas.setLineWidth(0.5)
+            canvas.setDash(1, 2)
+            for trip_idx, row in entries:
+                baseline = self._row_top(page_idx, row) - TOC_ROW_HEIGHT + 5
+                title = _fit_text(self.trip_titles[trip_idx], title_width - 12)
+                page_number = str(pages[trip_idx]) if trip_idx < len(pages) else ''
+                canvas.drawString(left, baseline, title)
+                canvas.drawRightString(right, baseline, page_number)
+                title_end = left + stringWidth(title, TOC_FONT, TOC_FONT_SIZE) + 6
+                number_start = right - stringWidth(page_number, TOC_FONT, TOC_FONT_SIZE) - 6
+                if number_start > title_end:
+                    canvas.line(title_end, baseline, number_start, baseline)
+            canvas.endForm()
+
+    def generate(self, verbose=True):
+        """Generate the combined PDF file"""
+        story = []
+        self._toc_pages = []
+        if self.toc:
+            self._toc_pages = self._toc_layout()
+            for _ in self._toc_pages:
+                story.extend([Spacer(1, 1), PageBreak()])
+        story.extend(self.story)
+        if self.toc:
+            story.append(_TOCForms(self))
+        self.doc.build(story, onFirstPage=self._on_page, onLaterPages=self._on_page)
+        if verbose and not hasattr(self.output_filename, 'write'):
+            print(f"✅ PDF generated successfully: {self.output_filename}")
+
+
+def _fit_text(text, width):
+    """Truncate text with an ellipsis so it fits in width points"""
+    if stringWidth(text, TOC_FONT, TOC_FONT_SIZE) <= width:
+        return text
+    while text and stringWidth(text + '…', TOC_FONT, TOC_FONT_SIZE) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def generate_combined_pdf(trips, output_filename="combined_itineraries.pdf",
+                          custom_event_types=None, toc=True, verbose=True, qr_codes=False):
+    """
+    Generate a single PDF holding several trips
+
+    Args:
+        trips: Iterable of trip data dictionaries
+        output_filename: Name of output PDF file, or a writable binary stream
+        custom_event_types: Optional dictionary mapping event type names to color hex codes
+        toc: Start the document with a table of contents
+        verbose: Print a confirmation line once the PDF is written
+        qr_codes: Add QR codes below events (see qr_codes); a place or
+            confirmation shared by several trips is embedded once
+    """
+
+    generator = CombinedPDFGenerator(output_filename, toc=toc, qr_codes=qr_codes)
+    if custom_event_types:
+        generator.color_map = {k.upper(): v for k, v in custom_event_types.items()}
+
+    for trip_data in trips:
+        generator.add_trip(trip_data)
+
+    generator.generate(verbose=verbose)
+    return generator
+
+
+def main(argv=None):
+    from batch_generator import InvalidRecord, iter_trip_file
+    from trip_validation import validate_trip
+
+    parser = argparse.ArgumentParser(description="Render many trip itineraries into one PDF")
+    parser.add_argument('inputs', nargs='+',
+                        help="JSON files holding a trip or a list of trips, "
+                             "JSONL/NDJSON files with one trip per line, or - for JSONL on stdin")
+    parser.add_argument('-o', '--output', default='combined_itineraries.pdf', help="Output PDF file")
+    parser.add_argument('--event-types', help="JSON file mapping event type names to color hex codes")
+    parser.add_argument('--no-toc', action='store_true', help="Leave out the table of contents")
+    parser.add_argument('--qr-codes', action='store_true', help="Add QR codes for addresses and confirmations")
+    args = parser.parse_args(argv)
+
+    custom_event_types = None
+    if args.event_types:
+        with open(args.event_types, encoding='utf-8') as f:
+            custom_event_types = json.load(f)
+
+    def trips():
+        for path in args.inputs:
+            for index, trip_data in enumerate(iter_trip_file(path)):
+                if isinstance(trip_data, InvalidRecord):
+                    print(f"❌ {path} trip #{index}: {trip_data.error}", file=sys.stderr)
+                    continue
+                report = validate_trip(trip_data, custom_event_types)
+                if not report.ok:
+                    print(f"❌ {path} trip #{index}: {report.message()}", file=sys.stderr)
+                    continue
+                yield report.trip
+
+    start = time.perf_counter()
+    generator = generate_combined_pdf(trips(), args.output, custom_event_types, toc=not args.no_toc,
+                                      qr_codes=args.qr_codes)
+    print(f"Combined {len(generator.trip_titles)} trips in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
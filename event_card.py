@@ -0,0 +1,296 @@
+"""
+Event Card Flowable
+Draw an event card straight onto the canvas for the compact layout
+"""
+
+import re
+
+from reportlab import rl_config
+from reportlab.lib.fonts import ps2tt, tt2ps
+from reportlab.pdfbase.pdfmetrics import getAscent, stringWidth
+from reportlab.platypus import Flowable, Paragraph
+
+# Text that only the Paragraph parser handles the same way: markup, entities
+# and whitespace other than plain spaces
+_NEEDS_PARAGRAPH = re.compile(r'[<&]|[^\S ]')
+
+# Default cell padding as (top, bottom, left, right), matching the card layout
+# tables; themes set their own (see trip_pdf_generator.DEFAULT_THEME)
+HEADER_PADDING = (8, 8, 12, 12)
+DETAIL_PADDING = (4, 4, 12, 12)
+
+
+def bold_font(font_name):
+    """Bold variant of a font, as <b> markup would pick it"""
+    try:
+        family, _, italic = ps2tt(font_name)
+        return tt2ps(family, 1, italic)
+    except ValueError:
+        return font_name
+
+
+def _wrap_words(text, font_name, font_size, width, space_shrinkage=0):
+    """
+    Greedy word wrap, as Paragraph does for plain text
+
+    Like Paragraph, a line may overrun width by space_shrinkage of a space
+    for every word already on it. Returns a list of (line, overrun) pairs,
+    or None when a single word is wider than the column; Paragraph splits
+    such words, so those cells fall back to a real Paragraph.
+    """
+    words = text.split(' ')
+    space = stringWidth(' ', font_name, font_size)
+    shrink = space * space_shrinkage
+    lines = []
+    line = []
+    line_width = 0
+    for word in words:
+        if not word:
+            continue
+        word_width = stringWidth(word, font_name, font_size)
+        if word_width > width:
+            return None
+        if line and line_width + space + word_width > width + shrink * len(line):
+            lines.append((' '.join(line), max(line_width - width, 0)))
+            line = [word]
+            line_width = word_width
+        else:
+            line_width += (space if line else 0) + word_width
+            line.append(word)
+    if line:
+        lines.append((' '.join(line), max(line_width - width, 0)))
+    return lines
+
+
+class _TextCell:
+    """Pre-wrapped plain text drawn with drawString"""
+
+    __slots__ = ('lines', 'font_name', 'font_size', 'leading', 'color', 'align', 'width', 'height')
+
+    def __init__(self, lines, font_name, font_size, leading, color, align, width):
+        self.lines = lines
+        self.font_name = font_name
+        self.font_size = font_size
+        self.leading = leading
+        self.color = color
+        self.align = align
+        self.width = width
+        self.height = len(lines) * leading
+
+    def draw(self, canv, x, top, state=None):
+        """
+        Draw with the first line's top at top
+
+        state, when given, is a [font, color] list holding what the canvas
+        is already set to; font and color are then only set when they change.
+        """
+        if not self.lines:
+            return
+        font = (self.font_name, self.font_size)
+        if state is None or state[0] != font:
+            canv.setFont(self.font_name, self.font_size)
+            if state is not None:
+                state[0] = font
+        if state is None or state[1] != self.color:
+            canv.setFillColor(self.color)
+            if state is not None:
+                state[1] = self.color
+        if rl_config.paraFontSizeHeightOffset:
+            y = top - self.font_size
+        else:
+            y = top - getAscent(self.font_name, self.font_size)
+        for line, overrun in self.lines:
+            # Lines that overrun the column have their spaces squeezed, as in Paragraph
+            word_space = -overrun / line.count(' ') if overrun and ' ' in line else None
+            if self.align == 'right':
+                canv.drawRightString(x + self.width, y, line, wordSpace=word_space)
+            else:
+                canv.drawString(x, y, line, wordSpace=word_space)
+            y -= self.leading
+
+
+class _ParagraphCell:
+    """Fallback for text that needs the Paragraph parser (markup, entities, long words)"""
+
+    __slots__ = ('paragraph', 'height')
+
+    def __init__(self, paragraph, width):
+        self.paragraph = paragraph
+        self.height = paragraph.wrap(width, 1e6)[1]
+
+    def draw(self, canv, x, top, state=None):
+        # drawOn saves and restores the graphics state, so state stays valid
+        self.paragraph.drawOn(canv, x, top - self.height)
+
+
+def make_cell(text, style, width, bold=False, align='left', markup=None):
+    """
+    Build a cell for text in style, drawn directly when it is plain text
+
+    Args:
+        text: Cell text
+        style: ParagraphStyle giving font, size, leading and color
+        width: Available width in points (column width minus padding)
+        bold: Draw in the bold variant of the style's font
+        align: 'left' or 'right'
+        markup: Paragraph markup to fall back to; defaults to text
+    """
+    text = str(text)
+    font_name = bold_font(style.fontName) if bold else style.fontName
+    if not _NEEDS_PARAGRAPH.search(text):
+        lines = _wrap_words(text, font_name, style.fontSize, width, style.spaceShrinkage)
+        if lines is not None:
+            return _TextCell(lines, font_name, style.fontSize, style.leading,
+                             style.textColor, align, width)
+    return _ParagraphCell(Paragraph(markup if markup is not None else text, style), width)
+
+
+class EventCard(Flowable):
+    """
+    An event card (colored header row plus detail rows) drawn on the canvas
+
+    Looks like the card layout's header and details tables, but each cell is
+    drawn with a few canvas calls instead of being parsed and laid out as a
+    Paragraph inside a Table. Splits between rows across pages, as the
+    tables do.
+    """
+
+    def __init__(self, width, rows, header_color, details_color, line_color, rule=True,
+                 header_padding=HEADER_PADDING, detail_padding=DETAIL_PADDING, rule_width=0.5):
+        Flowable.__init__(self)
+        self.hAlign = 'CENTER'
+        self.width = width
+        # rows: list of (is_header, height, [(x, cell)])
+        self.rows = rows
+        self.header_color = header_color
+        self.details_color = details_color
+        self.line_color = line_color
+        # Draw the rule below the last detail row (only the final split part does)
+        self.rule = rule
+        self.header_padding = header_padding
+        self.detail_padding = detail_padding
+        self.rule_width = rule_width
+        self.height = sum(row[1] for row in rows)
+
+    @classmethod
+    def build(cls, header_cells, detail_cells, header_widths, detail_widths,
+              header_color, details_color, line_color, header_padding=HEADER_PADDING,
+              detail_padding=DETAIL_PADDING, rule_width=0.5):
+        """
+        Lay out a card from its cells
+
+        Args:
+            header_cells: (type cell, time cell)
+            detail_cells: List of (label cell, value cell)
+            header_widths: Column widths of the header row
+            detail_widths: Column widths of the detail rows
+            header_padding, detail_padding: Cell padding as (top, bottom, left, right)
+            rule_width: Line width of the rule below the detail rows
+        """
+        rows = []
+        top, bottom = header_padding[:2]
+        height = max(cell.height for cell in header_cells) + top + bottom
+        rows.append((True, height, [(0, header_cells[0]), (header_widths[0], header_cells[1])]))
+
+        top, bottom = detail_padding[:2]
+        for label, value in detail_cells:
+            height = max(label.height, value.height) + top + bottom
+            rows.append((False, height, [(0, label), (detail_widths[0], value)]))
+
+        return cls(sum(header_widths), rows, header_color, details_color, line_color,
+                   rule=bool(detail_cells), header_padding=header_padding,
+                   detail_padding=detail_padding, rule_width=rule_width)
+
+    def wrap(self, availWidth, availHeight):
+        return (self.width, self.height)
+
+    def split(self, availWidth, availHeight):
+        used = 0
+        count = 0
+        for row in self.rows:
+            if used + row[1] > availHeight:
+                break
+            used += row[1]
+            count += 1
+        if count == 0 or count == len(self.rows):
+            return []
+        layout = {'header_padding': self.header_padding, 'detail_padding': self.detail_padding,
+                  'rule_width': self.rule_width}
+        return [
+            EventCard(self.width, self.rows[:count], self.header_color, self.details_color,
+                      self.line_color, rule=False, **layout),
+            EventCard(self.width, self.rows[count:], self.header_color, self.details_color,
+                      self.line_color, rule=self.rule, **layout),
+        ]
+
+    def draw(self):
+        canv = self.canv
+        if getattr(canv, 'optimized', False):
+            self._draw_optimized(canv)
+            return
+        y = self.height
+        for is_header, height, cells in self.rows:
+            bottom = y - height
+            canv.setFillColor(self.header_color if is_header else self.details_color)
+            canv.rect(0, bottom, self.width, height, stroke=0, fill=1)
+
+            pad_top, pad_bottom, pad_left, _ = self.header_padding if is_header else self.detail_padding
+            if is_header:
+                # Header cells sit at the bottom of the row (Table's default VALIGN)
+                for x, cell in cells:
+                    cell.draw(canv, x + pad_left, bottom + pad_bottom + cell.height)
+            else:
+                for x, cell in cells:
+                    cell.draw(canv, x + pad_left, y - pad_top)
+            y = bottom
+
+        if self.rule:
+            canv.setStrokeColor(self.line_color)
+            canv.setLineWidth(self.rule_width)
+            canv.setLineCap(1)
+            canv.line(0, y, self.width, y)
+
+    def _draw_optimized(self, canv):
+        """
+        Draw on an OptimizedCanvas with fewer operators
+
+        The detail rows get one background rectangle and are drawn a column
+        at a time, so the label and value fonts and colors are each set once
+        per card rather than once per row; the header's time reuses the
+        font and color of its type label.
+        """
+        y = self.height
+        rows = self.rows
+        state = [None, None]
+
+        if rows[0][0]:
+            _, height, cells = rows[0]
+            y -= height
+            canv.setFillColor(self.header_color)
+            canv.rect(0, y, self.width, height, stroke=0, fill=1)
+            state[1] = self.header_color
+            pad_bottom, pad_left = self.header_padding[1], self.header_padding[2]
+            for x, cell in cells:
+                cell.draw(canv, x + pad_left, y + pad_bottom + cell.height, state)
+            rows = rows[1:]
+
+        if rows:
+            details_height = sum(row[1] for row in rows)
+            canv.setFillColor(self.details_color)
+            state[1] = self.details_color
+            canv.rect(0, y - details_height, self.width, details_height, stroke=0, fill=1)
+
+            pad_top, pad_left = self.detail_padding[0], self.detail_padding[2]
+            for column in (0, 1):
+                top = y
+                for _, height, cells in rows:
+                    x, cell = cells[column]
+                    cell.draw(canv, x + pad_left, top - pad_top, state)
+                    top -= height
+            y -= details_height
+
+        if self.rule:
+            canv.setStrokeColor(self.line_color)
+            canv.setLineWidth(self.rule_width)
+            canv.setLineCap(1)
+            canv.line(0, y, self.width, y)
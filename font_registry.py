@@ -0,0 +1,271 @@
+"""
+Trip Itinerary Font Registry
+Register TrueType fonts once per process and pick a font for each run of text
+"""
+
+import os
+from functools import lru_cache
+from threading import Lock
+from time import perf_counter
+
+import reportlab
+from reportlab.lib.fonts import addMapping
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# Extra font directories, separated by os.pathsep; searched before the system ones
+FONT_PATH_ENV = 'TRIP_PDF_FONT_PATH'
+
+SYSTEM_FONT_DIRS = (
+    '/usr/share/fonts',
+    '/usr/local/share/fonts',
+    os.path.expanduser('~/.fonts'),
+    os.path.expanduser('~/.local/share/fonts'),
+    '/Library/Fonts',
+    '/System/Library/Fonts',
+    os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts'),
+    os.path.join(os.path.dirname(reportlab.__file__), 'fonts'),
+)
+
+# Widely installed TrueType families with broad Unicode coverage, in order of
+# preference: (family name, regular, bold, italic, bold italic) file names
+UNICODE_FONTS = (
+    ('DejaVuSans', 'DejaVuSans.ttf', 'DejaVuSans-Bold.ttf',
+     'DejaVuSans-Oblique.ttf', 'DejaVuSans-BoldOblique.ttf'),
+    ('NotoSans', 'NotoSans-Regular.ttf', 'NotoSans-Bold.ttf',
+     'NotoSans-Italic.ttf', 'NotoSans-BoldItalic.ttf'),
+    ('ArialUnicode', 'Arial Unicode.ttf', None, None, None),
+)
+
+
+class FontFamily:
+    """A registered font family and the characters it can draw"""
+
+    __slots__ = ('name', 'regular', 'bold', 'italic', 'bold_italic', '_glyphs', '_encoding')
+
+    def __init__(self, name, regular, bold, italic, bold_italic, glyphs=None, encoding=None):
+        self.name = name
+        self.regular = regular
+        self.bold = bold
+        self.italic = italic
+        self.bold_italic = bold_italic
+        # TrueType fonts: code points with a glyph; standard fonts: their text encoding
+        self._glyphs = glyphs
+        self._encoding = encoding
+
+    def covers(self, char):
+        if self._glyphs is not None:
+            return ord(char) in self._glyphs
+        try:
+            char.encode(self._encoding)
+        except UnicodeEncodeError:
+            return False
+        return True
+
+    def __repr__(self):
+        return f"<FontFamily {self.name}>"
+
+
+class FontRegistry:
+    """
+    Process-wide registry of font families
+
+    Each TrueType file is parsed and registered with ReportLab once per
+    process, however many documents or themes use it. ReportLab embeds
+    TrueType fonts as subsets holding only the glyphs a document uses, so
+    a large Unicode font adds little to each PDF.
+
+    Use get_font_registry() rather than creating instances.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._fonts = {}
+        self._file_index = None
+        self._runs = {}
+        self._lock = Lock()
+        self.registration_seconds = 0.0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        # The base-14 fonts the default styles use; they only cover the WinAnsi character set
+        for name, regular, bold, italic, bold_italic in (
+                ('Helvetica', 'Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique', 'Helvetica-BoldOblique'),
+                ('Times-Roman', 'Times-Roman', 'Times-Bold', 'Times-Italic', 'Times-BoldItalic'),
+                ('Courier', 'Courier', 'Courier-Bold', 'Courier-Oblique', 'Courier-BoldOblique')):
+            self._families[name] = FontFamily(name, regular, bold, italic, bold_italic, encoding='cp1252')
+
+    def family(self, name):
+        """The registered family called name (KeyError if there is none)"""
+        return self._families[name]
+
+    def __contains__(self, name):
+        return name in self._families
+
+    def find_font_file(self, filename):
+        """Full path of a font file in the font directories, or None"""
+        if os.path.isabs(filename):
+            return filename if os.path.exists(filename) else None
+        with self._lock:
+            if self._file_index is None:
+                self._file_index = _index_font_dirs()
+            return self._file_index.get(filename.lower())
+
+    def register_family(self, name, regular, bold=None, italic=None, bold_italic=None):
+        """
+        Register a TrueType family, or return it if already registered
+
+        Args:
+            name: Family name, also used as the regular font's name
+            regular: Path or file name (searched in the font directories) of the regular face
+            bold, italic, bold_italic: Optional other faces; missing ones
+                fall back to the regular (or bold) face
+
+        Raises:
+            FileNotFoundError: a font file could not be found
+        """
+        with self._lock:
+            family = self._families.get(name)
+        if family is not None:
+            return family
+
+        start = perf_counter()
+        faces = {}
+        for style, filename in (('regular', regular), ('bold', bold),
+                                ('italic', italic), ('bold_italic', bold_italic)):
+            if filename is None:
+                continue
+            path = self.find_font_file(filename)
+            if path is None:
+                raise FileNotFoundError(f"Font file {filename!r} not found in {_font_dirs()}")
+            font_name = name if style == 'regular' else f"{name}-{style.replace('_', '').title()}"
+            faces[style] = self._load(font_name, path)
+
+        regular_font = faces['regular']
+        bold_font = faces.get('bold', regular_font)
+        italic_font = faces.get('italic', regular_font)
+        bold_italic_font = faces.get('bold_italic', bold_font)
+        # Lets <b> and <i> inside Paragraph text pick the matching face
+        addMapping(name, 0, 0, regular_font.fontName)
+        addMapping(name, 1, 0, bold_font.fontName)
+        addMapping(name, 0, 1, italic_font.fontName)
+        addMapping(name, 1, 1, bold_italic_font.fontName)
+
+        family = FontFamily(name, regular_font.fontName, bold_font.fontName,
+                            italic_font.fontName, bold_italic_font.fontName,
+                            glyphs=frozenset(regular_font.face.charToGlyph))
+        with self._lock:
+            family = self._families.setdefault(name, family)
+            self.registration_seconds += perf_counter() - start
+        return family
+
+    def _load(self, font_name, path):
+        """Parse and register one TrueType file, once per process"""
+        key = (font_name, os.path.realpath(path))
+        font = self._fonts.get(key)
+        if font is None:
+            font = TTFont(font_name, path)
+            pdfmetrics.registerFont(font)
+            self._fonts[key] = font
+        return font
+
+    def register_unicode_family(self, family=None):
+        """
+        Register the first available family from UNICODE_FONTS, or the one called family
+
+        Returns:
+            The family name, or None when none of them is installed
+        """
+        for name, *files in UNICODE_FONTS:
+            if family is not None and name != family:
+                continue
+            if name in self._families:
+                return name
+            if self.find_font_file(files[0]) is None:
+                continue
+            available = [f if f and self.find_font_file(f) else None for f in files]
+            self.register_family(name, *available)
+            return name
+        return None
+
+    def runs(self, text, family, fallbacks=()):
+        """
+        Split text into (family, text) runs
+
+        Each character goes to the first of family and fallbacks that has a
+        glyph for it (or to family when none does).
+        """
+        chain = (self._families[family],) + tuple(self._families[name] for name in fallbacks)
+        primary = chain[0]
+        runs = []
+        current = None
+        start = 0
+        for index, char in enumerate(text):
+            if char.isascii():
+                chosen = primary
+            else:
+                key = (family, fallbacks, char)
+                chosen = self._runs.get(key)
+                if chosen is None:
+                    chosen = next((f for f in chain if f.covers(char)), primary)
+                    self._runs[key] = chosen
+            if chosen is not current:
+                if current is not None:
+                    runs.append((current, text[start:index]))
+                current = chosen
+                start = index
+        if current is not None:
+            runs.append((current, text[start:]))
+        return runs
+
+    def apply_fallback(self, text, family, fallbacks=()):
+        """
+        Paragraph markup for text with each run in a font that can draw it
+
+        Characters family lacks are wrapped in <font name=...> tags naming
+        the first fallback that has them; text family can draw entirely is
+        returned unchanged.
+        """
+        if not fallbacks or text.isascii():
+            return text
+        start = perf_counter()
+        parts = []
+        for run_family, run in self.runs(text, family, fallbacks):
+            if run_family.name == family:
+                parts.append(run)
+            else:
+                parts.append(f'<font name="{run_family.name}">{run}</font>')
+        # Counters are approximate under concurrent use; they only feed benchmarks
+        self.lookups += 1
+        self.lookup_seconds += perf_counter() - start
+        return ''.join(parts)
+
+    def stats(self):
+        """Registered families, registration time and run lookup cost"""
+        return {
+            'families': sorted(self._families),
+            'registration_seconds': self.registration_seconds,
+            'lookups': self.lookups,
+            'lookup_seconds': self.lookup_seconds,
+        }
+
+
+def _font_dirs():
+    extra = [d for d in os.environ.get(FONT_PATH_ENV, '').split(os.pathsep) if d]
+    return extra + list(SYSTEM_FONT_DIRS)
+
+
+def _index_font_dirs():
+    """Map lower-case font file names to paths; earlier directories win"""
+    index = {}
+    for directory in _font_dirs():
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.lower().endswith('.ttf'):
+                    index.setdefault(filename.lower(), os.path.join(root, filename))
+    return index
+
+
+@lru_cache(maxsize=None)
+def get_font_registry():
+    """Return the process-wide font registry"""
+    return FontRegistry()
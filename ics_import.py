@@ -0,0 +1,399 @@
+"""
+Trip Itinerary Calendar Import
+Turn iCalendar (.ics) exports into trip data, reading them a line at a time
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+# Event type guesses, tried in order against the summary, categories and
+# location; the first type with a matching keyword wins
+EVENT_TYPE_KEYWORDS = (
+    ('flight', ('flight', 'flights', 'airline', 'airlines', 'airways', 'boarding', 'airport',
+                'layover')),
+    ('restaurant', ('restaurant', 'dinner', 'lunch', 'breakfast', 'brunch', 'cafe', 'café',
+                    'bistro', 'tasting', 'table for')),
+    ('hotel', ('hotel', 'hostel', 'motel', 'inn', 'resort', 'airbnb', 'lodge', 'lodging',
+               'accommodation', 'check-in', 'check in', 'check-out', 'check out', 'stay')),
+    ('transport', ('train', 'rail', 'bus', 'coach', 'ferry', 'taxi', 'shuttle', 'transfer',
+                   'car rental', 'rental car', 'uber', 'metro', 'pickup', 'pick-up', 'drive')),
+    ('activity', ('tour', 'museum', 'gallery', 'visit', 'tickets', 'ticket', 'concert', 'show',
+                  'hike', 'excursion', 'cruise', 'class', 'workshop', 'match', 'park')),
+)
+_TYPE_PATTERNS = tuple(
+    (event_type, re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in keywords) + r')\b', re.IGNORECASE))
+    for event_type, keywords in EVENT_TYPE_KEYWORDS
+)
+
+# "Confirmation: ABC123", "Booking ref # XY-9876", ... in an event description
+_CONFIRMATION = re.compile(
+    r'\b(?:confirmation|booking|reservation|record locator|pnr)'
+    r'(?:\s+(?:number|no\.?|code|ref(?:erence)?|id))?\s*[:#]\s*([A-Z0-9][A-Z0-9-]{3,})',
+    re.IGNORECASE)
+
+_TEXT_ESCAPE = re.compile(r'\\(.)')
+_TEXT_UNESCAPED = {'n': '\n', 'N': '\n'}
+
+_DATE_TIME = re.compile(r'(\d{4})(\d{2})(\d{2})(?:T(\d{2})(\d{2})(\d{2})?(Z)?)?$')
+
+
+class ICSImportError(ValueError):
+    """Raised when the input is not an iCalendar file"""
+
+
+def _unfold(lines):
+    """
+    Join folded content lines (continuations start with a space or tab)
+
+    Accepts str or bytes lines. Bytes are joined before decoding, since a
+    fold may split a multi-byte UTF-8 character.
+    """
+    parts = []
+    for raw in lines:
+        if isinstance(raw, bytes):
+            raw = raw.rstrip(b'\r\n')
+            folded = raw[:1] in (b' ', b'\t')
+        else:
+            raw = raw.rstrip('\r\n')
+            folded = raw[:1] in (' ', '\t')
+        if folded and parts:
+            parts.append(raw[1:])
+            continue
+        if parts:
+            yield _join(parts)
+        parts = [raw]
+    if parts:
+        yield _join(parts)
+
+
+def _join(parts):
+    if isinstance(parts[0], bytes):
+        return b''.join(parts).decode('utf-8', 'replace')
+    return ''.join(parts)
+
+
+def _parse_line(line):
+    """Split a content line into (NAME, {PARAM: value}, value)"""
+    if '"' in line:
+        # A quoted parameter value may contain ':' or ';'
+        quoted = False
+        for index, char in enumerate(line):
+            if char == '"':
+                quoted = not quoted
+            elif char == ':' and not quoted:
+                head, value = line[:index], line[index + 1:]
+                break
+        else:
+            return None
+    else:
+        head, colon, value = line.partition(':')
+        if not colon:
+            return None
+    name, *params = head.split(';')
+    parameters = {}
+    for param in params:
+        key, _, param_value = param.partition('=')
+        parameters[key.upper()] = param_value.strip('"')
+    return name.upper(), parameters, value
+
+
+def unescape_text(value):
+    """Decode an iCalendar TEXT value (\\n, \\, \\; and \\\\)"""
+    if '\\' not in value:
+        return value
+    return _TEXT_ESCAPE.sub(lambda m: _TEXT_UNESCAPED.get(m.group(1), m.group(1)), value)
+
+
+def iter_vevents(lines, calendar=None):
+    """
+    Yield each VEVENT as a dictionary of NAME -> (value, parameters)
+
+    Only the first occurrence of each property is kept, and properties of
+    nested components (such as VALARM reminders) are skipped. Nothing but
+    the event being read is held in memory.
+
+    Args:
+        lines: Iterable of str or bytes lines, e.g. an open file
+        calendar: Optional dictionary that receives the calendar's own
+            properties (such as X-WR-CALNAME)
+
+    Raises:
+        ICSImportError: the input does not start with BEGIN:VCALENDAR
+    """
+    components = []
+    event = None
+    started = False
+    for line in _unfold(lines):
+        if not line:
+            continue
+        parsed = _parse_line(line)
+        if parsed is None:
+            continue
+        name, params, value = parsed
+        if not components:
+            # Only calendars at the top level; anything after the last one is ignored
+            if (name, value.upper()) == ('BEGIN', 'VCALENDAR'):
+                components.append('VCALENDAR')
+                started = True
+            elif not started:
+                raise ICSImportError("not an iCalendar file (expected BEGIN:VCALENDAR)")
+            continue
+        if name == 'BEGIN':
+            components.append(value.upper())
+            if components[-1] == 'VEVENT':
+                event = {}
+        elif name == 'END':
+            if components and components.pop() == 'VEVENT' and event is not None:
+                yield event
+                event = None
+        elif components[-1] == 'VEVENT':
+            event.setdefault(name, (value, params))
+        elif calendar is not None and components[-1] == 'VCALENDAR':
+            calendar.setdefault(name, value)
+    if not started:
+        raise ICSImportError("not an iCalendar file (expected BEGIN:VCALENDAR)")
+
+
+def parse_ics_datetime(value, tz=None):
+    """
+    Parse a DATE or DATE-TIME value
+
+    Times with a TZID, or no zone at all, are kept as written: for an
+    itinerary the local time at the destination is what matters. UTC times
+    ("...Z") are converted to tz when it is given.
+
+    Returns:
+        (date or naive datetime, has_time), or None when value is not a date
+    """
+    match = _DATE_TIME.match(value.strip())
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, utc = match.groups()
+    try:
+        if hour is None:
+            return date(int(year), int(month), int(day)), False
+        moment = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
+    except ValueError:
+        return None
+    if utc and tz is not None:
+        moment = moment.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+    return moment, True
+
+
+def guess_event_type(*texts):
+    """Trip event type for an event's summary, categories, location, ...; 'other' if nothing matches"""
+    text = ' '.join(t for t in texts if t)
+    for event_type, pattern in _TYPE_PATTERNS:
+        if pattern.search(text):
+            return event_type
+    return 'other'
+
+
+def format_time(moment):
+    """'10:30 AM' style time, as in the sample trips"""
+    return f"{moment.hour % 12 or 12}:{moment.minute:02d} {'AM' if moment.hour < 12 else 'PM'}"
+
+
+def format_date(day):
+    """'Saturday, June 15' style day label"""
+    return f"{day:%A}, {day:%B} {day.day}"
+
+
+def format_date_range(first, last):
+    """'June 15-25, 2024' style range for the trip dates"""
+    if first == last:
+        return f"{first:%B} {first.day}, {first.year}"
+    if first.year != last.year:
+        return f"{first:%B} {first.day}, {first.year} - {last:%B} {last.day}, {last.year}"
+    if first.month != last.month:
+        return f"{first:%B} {first.day} - {last:%B} {last.day}, {last.year}"
+    return f"{first:%B} {first.day}-{last.day}, {last.year}"
+
+
+def _as_date(moment):
+    return moment.date() if isinstance(moment, datetime) else moment
+
+
+class ICSImporter:
+    """
+    Convert VEVENTs into the trip dictionary generate_pdf_from_data expects
+
+    Events are grouped into days by their start date, days are sorted by
+    date and events by start time (all-day events first). Each event is
+    read, converted and either kept or dropped before the next line is
+    read, so memory grows with the events in range, not with the file.
+
+    Recurring events are imported once, at their first occurrence;
+    cancelled events and events without a start date are skipped.
+
+    After read(), the counters say how many events were imported, were
+    outside the date range, or were skipped.
+    """
+
+    def __init__(self, start=None, end=None, tz=None):
+        # Optional inclusive date range of events to import
+        self.start = start
+        self.end = end
+        # Optional tzinfo that UTC times are converted to
+        self.tz = tz
+        self.imported = 0
+        self.out_of_range = 0
+        self.skipped = 0
+
+    def read(self, source, title=None):
+        """
+        Build a trip from an .ics file
+
+        Args:
+            source: Path of an .ics file, an open (text or binary) file, or
+                any iterable of lines
+            title: Trip title; defaults to the calendar's name
+
+        Raises:
+            ICSImportError: source is not an iCalendar file
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return self.read(f, title)
+
+        calendar = {}
+        days = {}
+        for properties in iter_vevents(source, calendar):
+            converted = self.convert(properties)
+            if converted is None:
+                continue
+            day, sort_key, event = converted
+            if (self.start is not None and day < self.start) or (self.end is not None and day > self.end):
+                self.out_of_range += 1
+                continue
+            days.setdefault(day, []).append((sort_key, self.imported, event))
+            self.imported += 1
+
+        dates = sorted(days)
+        trip = {
+            'title': title or unescape_text(calendar.get('X-WR-CALNAME', '')) or 'Imported Itinerary',
+            'dates': format_date_range(dates[0], dates[-1]) if dates else None,
+            'days': [
+                {
+                    'day_number': number,
+                    'date': format_date(day),
+                    'events': [event for _, _, event in sorted(days[day], key=lambda item: item[:2])],
+                }
+                for number, day in enumerate(dates, 1)
+            ],
+        }
+        return trip
+
+    def convert(self, properties):
+        """
+        One VEVENT as (start date, sort key, trip event), or None to skip it
+        """
+        if properties.get('STATUS', ('',))[0].upper() == 'CANCELLED':
+            self.skipped += 1
+            return None
+        start = parse_ics_datetime(properties.get('DTSTART', ('',))[0], self.tz)
+        if start is None:
+            self.skipped += 1
+            return None
+        start, timed = start
+        end = parse_ics_datetime(properties.get('DTEND', ('',))[0], self.tz)
+
+        summary = unescape_text(properties.get('SUMMARY', ('',))[0]).strip()
+        location = unescape_text(properties.get('LOCATION', ('',))[0]).strip()
+        description = unescape_text(properties.get('DESCRIPTION', ('',))[0]).strip()
+        categories = unescape_text(properties.get('CATEGORIES', ('',))[0])
+        event_type = guess_event_type(summary, categories, location)
+
+        event = {'type': event_type}
+        if timed:
+            event['time'] = format_time(start)
+        if summary:
+            event['name'] = summary
+        if location:
+            event['address'] = location
+        if end is not None:
+            end, end_timed = end
+            start_day = _as_date(start)
+            end_day = _as_date(end)
+            if not end_timed and end_day > start_day:
+                # All-day events end the day before DTEND (but a stay checks out on it)
+                if event_type != 'hotel':
+                    end_day -= timedelta(days=1)
+            if end_day > start_day:
+                if event_type == 'hotel':
+                    event['check_in'] = format_date(start_day)
+                    event['check_out'] = format_date(end_day)
+                else:
+                    event['until'] = format_date(end_day)
+            elif timed and end_timed and end > start:
+                event['ends'] = format_time(end)
+        if description:
+            match = _CONFIRMATION.search(description)
+            if match:
+                event['confirmation'] = match.group(1)
+            event['notes'] = description
+
+        sort_key = (start.hour, start.minute, start.second) if timed else (-1, 0, 0)
+        return _as_date(start), sort_key, event
+
+
+def import_ics(source, title=None, start=None, end=None, tz=None):
+    """
+    Build trip data from an iCalendar (.ics) file
+
+    Args:
+        source: Path, open file or iterable of lines
+        title: Trip title (defaults to the calendar's name)
+        start, end: Optional inclusive date range of events to import
+        tz: Optional tzinfo that UTC event times are converted to
+
+    Returns:
+        Trip data dictionary, ready for validate_trip/generate_pdf_from_data
+    """
+    return ICSImporter(start, end, tz).read(source, title)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import an iCalendar (.ics) file as trip data")
+    parser.add_argument('input', help="The .ics file, or - for stdin")
+    parser.add_argument('-o', '--output', help="Write the trip JSON here (default: stdout)")
+    parser.add_argument('--pdf', help="Also render the itinerary to this PDF file")
+    parser.add_argument('--title', help="Trip title (default: the calendar's name)")
+    parser.add_argument('--from', dest='start', type=date.fromisoformat,
+                        help="Only import events on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', type=date.fromisoformat,
+                        help="Only import events on or before this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    importer = ICSImporter(args.start, args.end)
+    source = sys.stdin.buffer if args.input == '-' else args.input
+    try:
+        trip = importer.read(source, args.title)
+    except (OSError, ICSImportError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(trip, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(trip, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    print(f"Imported {importer.imported} events on {len(trip['days'])} days "
+          f"({importer.out_of_range} outside the date range, {importer.skipped} skipped)",
+          file=sys.stderr)
+
+    if args.pdf:
+        from trip_pdf_generator import generate_pdf_from_data
+        from trip_validation import normalize_trip
+        generate_pdf_from_data(normalize_trip(trip), args.pdf, verbose=False)
+        print(f"✅ PDF generated successfully: {args.pdf}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
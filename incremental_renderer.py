@@ -0,0 +1,103 @@
+"""
+Incremental Trip Itinerary Renderer
+Re-render an edited trip while reusing the sections of days that did not change
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+
+from trip_model import to_json_value
+from trip_pdf_generator import RENDER_VERSION, TripPDFGenerator
+
+
+def day_fingerprint(day, color_map):
+    """Hash everything that affects how a day section is built"""
+    canonical = json.dumps(
+        [RENDER_VERSION, day.get('day_number'), day.get('date'), day.get('events', []), color_map],
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+        default=to_json_value,
+    )
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class IncrementalRenderer:
+    """
+    Render trips to PDF bytes, caching each day's parsed event cells
+
+    Only days whose fingerprint changed since an earlier render have their
+    events' Paragraphs parsed (or, in the compact layout, their cells
+    wrapped) again; the others reuse them (see
+    TripPDFGenerator._event_content). The Tables, cards and Spacers around
+    the cells are cheap and are built afresh for every render: ReportLab
+    changes those while laying them out (marking flowables pushed to the
+    next page as postponed, dropping keepWithNext), so one that has been
+    through doc.build() cannot be laid out again. Page layout still runs
+    over the whole document, because a change to one day can move every
+    page after it. Keep one renderer per editing session; renders on one
+    instance are serialized.
+    """
+
+    def __init__(self, max_cached_days=1024, layout='cards'):
+        self.max_cached_days = max_cached_days
+        self.layout = layout
+        self.days_built = 0
+        self.days_reused = 0
+        self._days = OrderedDict()
+        self._lock = Lock()
+
+    def render(self, trip_data, custom_event_types=None):
+        """
+        Render a trip to PDF bytes, rebuilding only the days that changed
+
+        Args:
+            trip_data: Dictionary containing trip information
+            custom_event_types: Optional dictionary mapping event type names to color hex codes
+
+        Returns:
+            The PDF document as bytes
+        """
+        with self._lock:
+            buffer = BytesIO()
+            generator = TripPDFGenerator(buffer, layout=self.layout)
+            if custom_event_types:
+                generator.color_map = {k.upper(): v for k, v in custom_event_types.items()}
+
+            generator.add_title(
+                trip_data.get('title', 'Trip Itinerary'),
+                trip_data.get('destination'),
+                trip_data.get('dates')
+            )
+
+            for day in trip_data.get('days', []):
+                events = day.get('events', [])
+                fingerprint = day_fingerprint(day, generator.color_map)
+                # Cells only, never laid-out flowables; see the class docstring
+                contents = self._days.get(fingerprint)
+                if contents is None:
+                    contents = [generator._event_content(event) for event in events]
+                    self._days[fingerprint] = contents
+                    self.days_built += 1
+                else:
+                    self.days_reused += 1
+                self._days.move_to_end(fingerprint)
+                generator.story.extend(generator.day_flowables(
+                    day.get('day_number'),
+                    day.get('date'),
+                    events,
+                    contents
+                ))
+
+            while len(self._days) > self.max_cached_days:
+                self._days.popitem(last=False)
+
+            generator.generate(verbose=False)
+            return buffer.getvalue()
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
@@ -0,0 +1,34 @@
+"""
+Trip Itinerary Optimized Canvas
+Canvas for smaller PDFs: compressed page streams written as binary
+"""
+
+from reportlab.pdfbase.pdfdoc import PDFStream, PDFZCompress
+from reportlab.pdfgen.canvas import Canvas
+
+
+class OptimizedCanvas(Canvas):
+    """
+    Canvas used by TripPDFGenerator(optimize=True)
+
+    ReportLab compresses page streams by default but then ASCII85-encodes
+    the compressed bytes, which makes them a quarter larger again. This
+    canvas always compresses and writes page streams as binary.
+
+    Flowables may check the optimized flag to draw with fewer operators
+    (see event_card.EventCard).
+    """
+
+    optimized = True
+
+    def __init__(self, *args, **kwargs):
+        kwargs['pageCompression'] = 1
+        Canvas.__init__(self, *args, **kwargs)
+
+    def showPage(self):
+        pages = self._doc.Pages.pages
+        Canvas.showPage(self)
+        page = pages[-1]
+        stream = PDFStream(content=page.stream, filters=[PDFZCompress])
+        stream.__Comment__ = "page stream"
+        page.Contents = stream
@@ -0,0 +1,89 @@
+"""
+Trip Itinerary PDF Thumbnails
+Rasterize the pages of an in-memory PDF to small PNG images for previews
+"""
+
+from functools import lru_cache
+from importlib.util import find_spec
+from io import BytesIO
+
+# Rasterizing needs PDFium (pip install pypdfium2) or MuPDF (pip install pymupdf);
+# without either, previews fall back to a page count. They are looked up here
+# but only imported when a page is first rasterized.
+BACKENDS = (('pypdfium2', 'pypdfium2'), ('pymupdf', 'fitz'))
+
+
+@lru_cache(maxsize=None)
+def thumbnail_backend():
+    """Name of the library used to rasterize pages, or None when none is installed"""
+    for name, module in BACKENDS:
+        if find_spec(module) is not None:
+            return name
+    return None
+
+
+def page_count(pdf_bytes):
+    """Number of pages in a PDF, or None when no rasterizer is installed"""
+    backend = thumbnail_backend()
+    if backend == 'pypdfium2':
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(pdf_bytes)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    if backend == 'pymupdf':
+        import fitz
+        with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+            return pdf.page_count
+    return None
+
+
+def render_thumbnails(pdf_bytes, max_pages=4, width=240):
+    """
+    Render the first pages of a PDF to PNG images
+
+    Args:
+        pdf_bytes: The PDF document as bytes
+        max_pages: Render at most this many pages
+        width: Width of each image in pixels; the height keeps the page's aspect ratio
+
+    Returns:
+        List of PNG images as bytes, one per page
+
+    Raises:
+        RuntimeError: neither pypdfium2 nor PyMuPDF is installed
+    """
+    backend = thumbnail_backend()
+    if backend == 'pypdfium2':
+        return _render_pdfium(pdf_bytes, max_pages, width)
+    if backend == 'pymupdf':
+        return _render_mupdf(pdf_bytes, max_pages, width)
+    raise RuntimeError("Page thumbnails need pypdfium2 or PyMuPDF (pip install pypdfium2)")
+
+
+def _render_pdfium(pdf_bytes, max_pages, width):
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(pdf_bytes)
+    try:
+        images = []
+        for index in range(min(max_pages, len(pdf))):
+            page = pdf[index]
+            bitmap = page.render(scale=width / page.get_width())
+            buffer = BytesIO()
+            bitmap.to_pil().save(buffer, format='PNG', optimize=True)
+            images.append(buffer.getvalue())
+        return images
+    finally:
+        pdf.close()
+
+
+def _render_mupdf(pdf_bytes, max_pages, width):
+    import fitz
+    with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+        images = []
+        for index in range(min(max_pages, pdf.page_count)):
+            page = pdf[index]
+            zoom = width / page.rect.width
+            images.append(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes('png'))
+        return images
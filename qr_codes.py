@@ -0,0 +1,160 @@
+"""
+Trip Itinerary QR Codes
+QR codes for event addresses and confirmations, encoded and embedded once
+"""
+
+import hashlib
+from functools import lru_cache
+from urllib.parse import quote_plus
+from xml.sax.saxutils import unescape
+
+from reportlab.graphics.barcode import qrencoder
+from reportlab.platypus import Flowable
+
+from trip_model import field_label
+
+# Link opened by location codes; {query} is the URL-encoded place
+MAPS_URL = 'https://www.google.com/maps/search/?api=1&query={query}'
+
+# Event fields that get a QR code, in the order the codes are drawn, and
+# what each encodes: 'map' opens the value as a place in a maps app, 'text'
+# is the value itself (a booking reference, or a link when it is one)
+QR_FIELDS = {
+    'address': 'map',
+    'meeting_point': 'map',
+    'from': 'map',
+    'to': 'map',
+    'confirmation': 'text',
+}
+
+# Light modules around every code, as scanners expect
+QUIET_ZONE = 4
+
+# Space between the codes of an event, and between a code and its caption
+CODE_GAP = 12
+CAPTION_GAP = 3
+
+
+def qr_text(key, value):
+    """
+    Text encoded for an event field, or None when the field gets no code
+
+    value is Paragraph markup, as all text reaching the PDF is, so entities
+    such as &amp; are decoded before encoding.
+    """
+    kind = QR_FIELDS.get(key)
+    if kind is None or not value:
+        return None
+    text = unescape(str(value)).strip()
+    if not text:
+        return None
+    if kind == 'map':
+        return MAPS_URL.format(query=quote_plus(text))
+    return text
+
+
+def event_qr_codes(event):
+    """(caption, text) for each of an event's fields that gets a QR code"""
+    codes = []
+    for key in QR_FIELDS:
+        text = qr_text(key, event.get(key))
+        if text is not None:
+            codes.append((field_label(key), text))
+    return codes
+
+
+@lru_cache(maxsize=4096)
+def encode_qr(text):
+    """
+    Encode text as a QR code, once per process
+
+    Hotels, airports and meeting points repeat across days and across the
+    trips a worker renders; each distinct text is encoded only once. The
+    code is kept as the PDF operators that draw it: a one-bit image mask,
+    a few hundred bytes, where rectangles for the dark modules would take
+    kilobytes and far longer to write out.
+
+    Returns:
+        (form name, side in modules including the quiet zone, PDF operators
+        drawing the code one unit per module), or None when text is too long
+        for the largest QR code (about 2,300 bytes); failures are cached too
+    """
+    qr = qrencoder.QRCode(None, qrencoder.QRErrorCorrectLevel.M)
+    qr.addData(text)
+    try:
+        qr.make()
+    except Exception:
+        return None
+    count = qr.getModuleCount()
+    padding = '0' * (-count % 8)
+    rows = []
+    for modules in qr.modules:
+        bits = ''.join('1' if module else '0' for module in modules) + padding
+        rows.append(int(bits, 2).to_bytes(len(bits) // 8, 'big').hex())
+    # Black where a sample is 1 (/D [1 0]); ASCIIHex keeps the content stream text
+    operators = (f"0 g {count} 0 0 {count} {QUIET_ZONE} {QUIET_ZONE} cm "
+                 f"BI /W {count} /H {count} /IM true /BPC 1 /D [1 0] /F /AHx ID {''.join(rows)}> EI")
+    # Named after the content, so equal codes share one form in a document
+    name = 'qr-' + hashlib.sha1(text.encode('utf-8')).hexdigest()[:20]
+    return name, count + 2 * QUIET_ZONE, operators
+
+
+class QRCodeStrip(Flowable):
+    """
+    A row of captioned QR codes below an event card
+
+    Each code is a form XObject named after its content. The first strip
+    drawing a code defines the form and every later one reuses it, so a
+    hotel that appears on five days (or in five trips of a combined PDF)
+    is embedded once per document. Texts too long for a QR code are left
+    out; the card above still shows them.
+    """
+
+    def __init__(self, codes, width, size, indent, caption_style):
+        """
+        Args:
+            codes: List of (caption, text), as from event_qr_codes()
+            width: Width of the strip (the card's width)
+            size: Side of each code in points, quiet zone included
+            indent: Distance of the first code from the left edge
+            caption_style: ParagraphStyle giving the captions' font, size and color
+        """
+        Flowable.__init__(self)
+        self.hAlign = 'CENTER'
+        encoded = ((caption, encode_qr(text)) for caption, text in codes)
+        self.codes = [(caption, code) for caption, code in encoded if code is not None]
+        self.width = width
+        self.size = size
+        self.indent = indent
+        self.caption_style = caption_style
+        self.height = size + CAPTION_GAP + caption_style.fontSize
+
+    def wrap(self, availWidth, availHeight):
+        return (self.width, self.height)
+
+    def draw(self):
+        canv = self.canv
+        style = self.caption_style
+        size = self.size
+        bottom = self.height - size
+        x = self.indent
+        for caption, (name, modules, operators) in self.codes:
+            if not canv.hasForm(name):
+                canv.beginForm(name, 0, 0, modules, modules)
+                canv.addLiteral(operators)
+                canv.endForm()
+            canv.saveState()
+            canv.translate(x, bottom)
+            canv.scale(size / modules, size / modules)
+            canv.doForm(name)
+            canv.restoreState()
+            x += size + CODE_GAP
+
+        # Captions last, so font and color are set once per strip
+        canv.setFont(style.fontName, style.fontSize)
+        canv.setFillColor(style.textColor)
+        x = self.indent + size / 2
+        baseline = bottom - CAPTION_GAP - style.fontSize * 0.8
+        for caption, _ in self.codes:
+            canv.drawCentredString(x, baseline, caption)
+            x += size + CODE_GAP
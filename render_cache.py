@@ -0,0 +1,242 @@
+"""
+Trip Itinerary Render Cache
+Content-addressed cache of rendered itinerary PDFs
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+
+from reportlab import Version as REPORTLAB_VERSION
+
+from trip_model import to_json_value
+from trip_pdf_generator import RENDER_VERSION, render_pdf_bytes, resolve_theme
+
+
+def cache_key(trip_data, custom_event_types=None, options=None):
+    """
+    Hash a canonical form of everything that affects the rendered PDF
+
+    Dictionary ordering and JSON formatting do not change the key; any change
+    to the trip, the event type colors, the render options or the renderer
+    version does. Without options, keys are the same as before options
+    existed, so existing caches stay valid. A theme option (a Theme or a
+    theme file path) is keyed by its merged spec, so an edited theme file
+    gets a new key and equal themes share one.
+    """
+    event_types = None
+    if custom_event_types:
+        # Mirrors generate_pdf_from_data, which upper-cases the type names
+        event_types = {k.upper(): v for k, v in custom_event_types.items()}
+    key = {
+        'trip': trip_data,
+        'event_types': event_types,
+        'version': [RENDER_VERSION, REPORTLAB_VERSION],
+    }
+    if options:
+        key['options'] = {name: _option_key(name, value) for name, value in options.items()}
+    canonical = json.dumps(
+        key,
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+        default=to_json_value,
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _option_key(name, value):
+    """A render option as it goes into cache_key"""
+    if name == 'theme' and value is not None:
+        # Not the Theme's repr (it holds a memory address) or the file's path
+        # (its contents can change); load_theme reloads an edited file
+        return {'spec': resolve_theme(value).spec}
+    return value
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache bounded by the total size of the stored PDFs"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self._entries[key] = value
+            self.total_bytes += len(value)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCacheBackend:
+    """
+    On-disk cache directory with size-based eviction of least recently used files
+
+    Safe to share between processes: entries are written atomically, and a
+    file removed by another process is simply treated as a miss.
+    """
+
+    suffix = '.pdf'
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _scan(self):
+        """(mtime, path, size) for every cache entry"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            # Recency for eviction is tracked through the modification time
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            # An entry being overwritten no longer counts towards the total
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            self.total_bytes += len(value) - replaced
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove the oldest entries until the directory fits the byte budget"""
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for _, path, _ in self._scan():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._scan())
+
+
+class RenderCache:
+    """Return stored PDF bytes for trips that have been rendered before"""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def render(self, trip_data, custom_event_types=None, renderer=render_pdf_bytes, options=None):
+        """
+        Render a trip to PDF bytes, reusing a previous render when possible
+
+        Args:
+            trip_data: Dictionary containing trip information
+            custom_event_types: Optional dictionary mapping event type names to color hex codes
+            renderer: Callable (trip_data, custom_event_types, **options) -> bytes used on a miss
+            options: Optional dictionary of keyword arguments for renderer
+                (e.g. {'qr_codes': True}); they are part of the cache key, so
+                renders with different options are cached separately
+
+        Returns:
+            The PDF document as bytes
+        """
+        key = cache_key(trip_data, custom_event_types, options)
+        pdf_bytes = self.backend.get(key)
+        with self._lock:
+            if pdf_bytes is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if pdf_bytes is None:
+            pdf_bytes = renderer(trip_data, custom_event_types, **(options or {}))
+            self.backend.set(key, pdf_bytes)
+        return pdf_bytes
+
+    def stats(self):
+        """Hit/miss counters and current size of the cache"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'entries': len(self.backend),
+            'bytes': self.backend.total_bytes,
+        }
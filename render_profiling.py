@@ -0,0 +1,110 @@
+"""
+Trip Itinerary Render Profiling
+Timing collectors and opt-in profilers for TripPDFGenerator
+"""
+
+import cProfile
+import os
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+
+class RenderTimings:
+    """
+    Observer that records every timing a TripPDFGenerator emits
+
+    Pass an instance as observer= to TripPDFGenerator or
+    generate_pdf_from_data. Each call appends a record dict holding the
+    phase name, its duration in seconds and the phase-specific details:
+
+        setup   - document template and theme
+        title   - title block (flowables)
+        event   - one event (day_number, type, flowables)
+        day     - one day, including its events (day_number, events, flowables)
+        page    - one page, as layout finishes it (page)
+        build   - ReportLab layout and PDF output (flowables, pages)
+
+    With stream=True, day and event records arrive during the build, as
+    layout reaches each day.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, phase, seconds, **info):
+        info['phase'] = phase
+        info['seconds'] = seconds
+        self.records.append(info)
+
+    def total(self, phase):
+        """Total seconds spent in a phase"""
+        return sum(r['seconds'] for r in self.records if r['phase'] == phase)
+
+    def summary(self):
+        """Per-phase totals and counts, plus the flowable and page counts"""
+        phases = {}
+        for record in self.records:
+            entry = phases.setdefault(record['phase'], {'seconds': 0.0, 'count': 0})
+            entry['seconds'] += record['seconds']
+            entry['count'] += 1
+        summary = {'phases': phases}
+        for record in self.records:
+            if record['phase'] == 'build':
+                summary['flowables'] = record.get('flowables')
+                summary['pages'] = record.get('pages')
+        return summary
+
+    def slowest(self, phase='event', count=5):
+        """The slowest records of a phase, slowest first"""
+        records = [r for r in self.records if r['phase'] == phase]
+        return sorted(records, key=lambda r: r['seconds'], reverse=True)[:count]
+
+
+def profile_path(base, mode):
+    """File a profile of the given mode is written to, next to base"""
+    if mode == 'cprofile':
+        return base + '.prof'
+    return base + '.tracemalloc.txt'
+
+
+@contextmanager
+def capture_profile(mode, base):
+    """
+    Profile the enclosed block and write the result next to base
+
+    Args:
+        mode: 'cprofile' (writes base.prof, readable with pstats/snakeviz)
+            or 'tracemalloc' (writes base.tracemalloc.txt with the top
+            allocation sites and the peak traced memory)
+        base: Path the profile file name is derived from
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {mode!r}; expected one of {PROFILE_MODES}")
+    path = profile_path(os.fspath(base), mode)
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+        return
+
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start(10)
+    try:
+        yield path
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Peak traced memory: {peak} bytes\n\n")
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f"{stat}\n")
@@ -0,0 +1,284 @@
+"""
+Trip Itinerary Render Server
+Local HTTP service that turns trip JSON into PDFs on warm worker processes
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from urllib.parse import parse_qs, urlsplit
+
+from render_service import QueueFull, RenderService
+from trip_pdf_generator import LAYOUTS, load_theme, render_pdf_bytes, warm_up
+from trip_renderers import FORMATS, get_renderer
+from trip_validation import validate_trip
+
+
+# Theme names allowed in ?theme=, so a name can never leave the themes directory
+_THEME_NAME = re.compile(r'[A-Za-z0-9_-]+')
+
+
+def _ready():
+    return True
+
+
+def find_themes(directory):
+    """Theme files in a directory by name (the file name without .json), checked up front"""
+    themes = {}
+    for entry in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(entry)
+        if extension == '.json' and _THEME_NAME.fullmatch(name):
+            path = os.path.abspath(os.path.join(directory, entry))
+            load_theme(path)  # Raises ValueError for a broken theme
+            themes[name] = path
+    return themes
+
+
+class LatencyMetrics:
+    """Request counters and a rolling window of successful render latencies"""
+
+    def __init__(self, window=1000):
+        self.started = time.time()
+        self.requests = 0
+        self.statuses = {}
+        self._latencies = deque(maxlen=window)
+        self._lock = Lock()
+
+    def record(self, path, status, seconds):
+        with self._lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if path == '/render' and status == 200:
+                self._latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snapshot = {
+                'uptime_seconds': time.time() - self.started,
+                'requests': self.requests,
+                'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+            }
+        render = {'count': len(latencies)}
+        if latencies:
+            render.update({
+                'mean': statistics.fmean(latencies),
+                'p50': latencies[len(latencies) // 2],
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'max': latencies[-1],
+            })
+        snapshot['render_latency_seconds'] = render
+        return snapshot
+
+
+class RenderServer(ThreadingHTTPServer):
+    """
+    HTTP server rendering trips on a pool of pre-started worker processes
+
+    Every worker imports ReportLab and builds the shared styles once at
+    startup and then serves many renders. At most max_pending renders are
+    queued or running; further POST /render requests get 503 right away.
+
+    themes maps names to theme files, selectable per request with
+    ?theme=name; workers compile each theme once at startup.
+    """
+
+    daemon_threads = True
+    # Set True to skip the per-request access log
+    quiet = False
+
+    def __init__(self, address=('127.0.0.1', 8000), workers=2, max_pending=8,
+                 timeout=60, max_body_bytes=4 * 1024 * 1024, themes=None):
+        self.workers = workers
+        self.render_timeout = timeout
+        self.max_body_bytes = max_body_bytes
+        self.themes = dict(themes or {})
+        self.metrics = LatencyMetrics()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up,
+                                       initargs=tuple(self.themes.values()))
+        self.service = RenderService(max_pending=max_pending, executor=executor)
+        # The pool starts its workers on first use; start (and warm) them now
+        executor.submit(_ready).result()
+        ThreadingHTTPServer.__init__(self, address, RenderRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.service.shutdown()
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes:
+
+        POST /render[?layout=compact][&optimize=1][&theme=name][&qr=1]
+                                       trip JSON (or {"trip": ..., "event_types": ...}) -> PDF
+        POST /render?format=html|markdown|text
+                                       the same trip JSON -> HTML, Markdown or plain text
+        GET  /health                   liveness and queue depth
+        GET  /metrics                  request counts and render latencies
+    """
+
+    server_version = 'TripRenderServer/1'
+
+    def do_GET(self):
+        start = time.perf_counter()
+        path = urlsplit(self.path).path
+        if path == '/health':
+            stats = self.server.service.stats()
+            status = self._send_json(200, {'status': 'ok', 'workers': self.server.workers, **stats})
+        elif path == '/metrics':
+            metrics = self.server.metrics.snapshot()
+            metrics['service'] = self.server.service.stats()
+            status = self._send_json(200, metrics)
+        else:
+            status = self._send_json(404, {'error': f"no route for GET {path}"})
+        self.server.metrics.record(path, status, time.perf_counter() - start)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        if url.path == '/render':
+            status = self._render(parse_qs(url.query), start)
+        else:
+            status = self._send_json(404, {'error': f"no route for POST {url.path}"})
+        self.server.metrics.record(url.path, status, time.perf_counter() - start)
+
+    def _render(self, query, start):
+        output_format = query.get('format', ['pdf'])[-1]
+        if output_format not in FORMATS:
+            return self._send_json(400, {'error': f"unknown format {output_format!r}"})
+        layout = query.get('layout', ['cards'])[-1]
+        if layout not in LAYOUTS:
+            return self._send_json(400, {'error': f"unknown layout {layout!r}"})
+        optimize = query.get('optimize', ['0'])[-1].lower() in ('1', 'true', 'yes')
+        qr_codes = query.get('qr', ['0'])[-1].lower() in ('1', 'true', 'yes')
+        theme = None
+        if 'theme' in query:
+            theme = self.server.themes.get(query['theme'][-1])
+            if theme is None:
+                return self._send_json(400, {'error': f"unknown theme {query['theme'][-1]!r}"})
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            return self._send_json(400, {'error': "invalid Content-Length"})
+        if length > self.server.max_body_bytes:
+            return self._send_json(413, {'error': f"request body over {self.server.max_body_bytes} bytes"})
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return self._send_json(400, {'error': f"invalid JSON: {e}"})
+
+        custom_event_types = None
+        if isinstance(payload, dict) and 'trip' in payload:
+            custom_event_types = payload.get('event_types')
+            payload = payload['trip']
+        if custom_event_types is not None and not isinstance(custom_event_types, dict):
+            return self._send_json(400, {'error': "'event_types' must be an object"})
+        # Only the PDF reads Paragraph markup; the other formats take text as typed
+        report = validate_trip(payload, custom_event_types, escape=output_format == 'pdf')
+        if not report.ok:
+            return self._send_json(400, {
+                'error': report.message(),
+                'errors': [{'path': path, 'message': message} for path, message in report.errors],
+            })
+        payload = report.trip
+
+        if output_format != 'pdf':
+            # Text formats render in microseconds, so they skip the worker pool
+            renderer = get_renderer(output_format, custom_event_types)
+            data = renderer.render(payload).encode('utf-8')
+            elapsed = time.perf_counter() - start
+            return self._send(200, data, f"{renderer.media_type}; charset=utf-8",
+                              {'Server-Timing': f'render;dur={elapsed * 1000:.1f}'})
+
+        try:
+            job = self.server.service.submit(payload, custom_event_types,
+                                             renderer=partial(render_pdf_bytes, layout=layout,
+                                                              theme=theme, optimize=optimize,
+                                                              qr_codes=qr_codes))
+        except QueueFull as e:
+            return self._send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+        try:
+            pdf_bytes = job.result(timeout=self.server.render_timeout)
+        except TimeoutError:
+            job.cancel()
+            return self._send_json(504, {'error': f"render took over {self.server.render_timeout}s"})
+        except CancelledError:
+            return self._send_json(503, {'error': "render cancelled"})
+        except Exception as e:
+            return self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+
+        elapsed = time.perf_counter() - start
+        return self._send(200, pdf_bytes, 'application/pdf',
+                          {'Server-Timing': f'render;dur={elapsed * 1000:.1f}'})
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        return self._send(status, data, 'application/json', headers)
+
+    def _send(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        return status
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve trip itinerary PDF rendering over HTTP")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on (0 picks a free port)")
+    parser.add_argument('-w', '--workers', type=int, default=2, help="Worker processes")
+    parser.add_argument('--max-pending', type=int, default=8,
+                        help="Renders queued or running before requests get 503")
+    parser.add_argument('--timeout', type=float, default=60, help="Seconds before a render gets 504")
+    parser.add_argument('--themes', help="Directory of JSON theme files, selected with ?theme=<file name>")
+    parser.add_argument('--quiet', action='store_true', help="Do not log every request")
+    args = parser.parse_args(argv)
+
+    themes = None
+    if args.themes:
+        try:
+            themes = find_themes(args.themes)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+
+    server = RenderServer((args.host, args.port), workers=args.workers,
+                          max_pending=args.max_pending, timeout=args.timeout, themes=themes)
+    server.quiet = args.quiet
+    print(f"Serving trip renders on {server.url} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
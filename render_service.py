@@ -0,0 +1,178 @@
+"""
+Trip Itinerary Render Service
+Queue PDF renders on a bounded worker pool and hand back job handles
+"""
+
+import itertools
+from concurrent.futures import CancelledError, Future, InvalidStateError, ThreadPoolExecutor
+from threading import Lock
+
+from trip_pdf_generator import render_pdf_bytes
+
+
+class QueueFull(RuntimeError):
+    """Raised by RenderService.submit when max_pending jobs are already queued or running"""
+
+
+class RenderJob:
+    """
+    Handle for one queued render
+
+    Poll it with done()/status, block on result(), or await it from a
+    coroutine. cancel() always takes effect for the caller: a job that has
+    not started is dropped from the queue, and a job that is already
+    rendering finishes in the background with its result discarded.
+    """
+
+    def __init__(self, job_id, inner):
+        self.id = job_id
+        # Caller-facing future; settled from the worker's future, or cancelled early
+        self.future = Future()
+        self._inner = inner
+
+    @property
+    def status(self):
+        """'queued', 'running', 'done', 'failed' or 'cancelled'"""
+        if self.future.cancelled():
+            return 'cancelled'
+        if self.future.done():
+            return 'failed' if self.future.exception() is not None else 'done'
+        return 'running' if self._inner.running() else 'queued'
+
+    def done(self):
+        return self.future.done()
+
+    def cancelled(self):
+        return self.future.cancelled()
+
+    def cancel(self):
+        """Cancel the job; returns False only when it had already finished"""
+        self._inner.cancel()
+        return self.future.cancel()
+
+    def result(self, timeout=None):
+        """PDF bytes; raises the render's exception, CancelledError or TimeoutError"""
+        return self.future.result(timeout)
+
+    def exception(self, timeout=None):
+        return self.future.exception(timeout)
+
+    def __await__(self):
+        # asyncio is only imported by code awaiting jobs, where it is loaded already
+        import asyncio
+        return asyncio.wrap_future(self.future).__await__()
+
+    def _settle(self, inner):
+        try:
+            if inner.cancelled():
+                self.future.cancel()
+            elif inner.exception() is not None:
+                self.future.set_exception(inner.exception())
+            else:
+                self.future.set_result(inner.result())
+        except InvalidStateError:
+            # Cancelled by the caller while it was running
+            pass
+
+    def __repr__(self):
+        return f"<RenderJob {self.id} {self.status}>"
+
+
+class RenderService:
+    """
+    Render trips off the calling thread, with backpressure
+
+    At most max_pending jobs may be queued or running at once; submit()
+    raises QueueFull beyond that instead of letting the backlog grow.
+
+    Renders run on a thread pool by default, so renderers may share
+    in-process state such as a RenderCache or an IncrementalRenderer. Pass
+    executor=ProcessPoolExecutor(...) to render in parallel across CPUs; the
+    renderer and its arguments must then be picklable.
+    """
+
+    def __init__(self, workers=2, max_pending=8, executor=None):
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.max_pending = max_pending
+        self._executor = executor if executor is not None else ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='render')
+        self._pending = 0
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    @property
+    def pending(self):
+        """Jobs queued or running (including cancelled jobs still rendering)"""
+        with self._lock:
+            return self._pending
+
+    def submit(self, trip_data, custom_event_types=None, renderer=render_pdf_bytes):
+        """
+        Queue a render and return its RenderJob
+
+        Args:
+            trip_data: Dictionary containing trip information
+            custom_event_types: Optional dictionary mapping event type names to color hex codes
+            renderer: Callable (trip_data, custom_event_types) -> bytes, e.g.
+                RenderCache(...).render or IncrementalRenderer().render
+
+        Raises:
+            QueueFull: max_pending jobs are already queued or running
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"{self._pending} renders already pending (limit {self.max_pending})")
+            self._pending += 1
+            self.submitted += 1
+        try:
+            inner = self._executor.submit(renderer, trip_data, custom_event_types)
+        except BaseException:
+            self._release(None)
+            raise
+        job = RenderJob(next(self._ids), inner)
+        inner.add_done_callback(self._release)
+        inner.add_done_callback(job._settle)
+        return job
+
+    async def render(self, trip_data, custom_event_types=None, renderer=render_pdf_bytes):
+        """
+        Render a trip from a coroutine without blocking the event loop
+
+        Cancelling the awaiting task cancels the job.
+        """
+        import asyncio
+
+        job = self.submit(trip_data, custom_event_types, renderer)
+        try:
+            return await job
+        except (CancelledError, asyncio.CancelledError):
+            job.cancel()
+            raise
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self):
+        """Pending, submitted and rejected job counts"""
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self, wait=True):
+        """Cancel queued jobs and stop the workers"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
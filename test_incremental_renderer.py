@@ -0,0 +1,53 @@
+"""
+Regression tests for IncrementalRenderer: repeated renders must match a fresh render
+"""
+
+import copy
+import re
+
+import pytest
+from reportlab import rl_config
+
+from benchmark import synthesize_trip
+from incremental_renderer import IncrementalRenderer
+from trip_pdf_generator import create_sample_trip, render_pdf_bytes
+
+
+@pytest.fixture(autouse=True)
+def invariant_pdfs(monkeypatch):
+    # No timestamps or random document IDs, so renders can be compared byte for byte
+    monkeypatch.setattr(rl_config, 'invariant', 1)
+
+
+def long_sample_trip(days=12):
+    """The sample trip's days repeated until it runs over many pages"""
+    trip = create_sample_trip()
+    sample_days = trip['days']
+    trip['days'] = [dict(copy.deepcopy(sample_days[i % len(sample_days)]), day_number=i + 1)
+                    for i in range(days)]
+    return trip
+
+
+@pytest.mark.parametrize('layout', ['cards', 'compact'])
+@pytest.mark.parametrize('trip', [synthesize_trip(), long_sample_trip()], ids=['synthetic', 'sample-12-days'])
+def test_multi_page_trip_renders_twice(trip, layout):
+    expected = render_pdf_bytes(trip, layout=layout)
+    # Flowables carried over to a second page are where reuse used to break
+    assert int(re.search(rb'/Count (\d+)', expected).group(1)) > 1
+
+    renderer = IncrementalRenderer(layout=layout)
+    assert renderer.render(trip) == expected
+    assert renderer.render(trip) == expected
+    assert renderer.days_reused == len(trip['days'])
+
+
+@pytest.mark.parametrize('layout', ['cards', 'compact'])
+def test_edited_day_matches_fresh_render(layout):
+    trip = long_sample_trip()
+    types = {'flight': '#123456'}
+    renderer = IncrementalRenderer(layout=layout)
+    renderer.render(trip, types)
+
+    trip['days'][4]['events'][0]['time'] = '11:00 AM'
+    assert renderer.render(trip, types) == render_pdf_bytes(trip, types, layout=layout)
+    assert renderer.days_built == len(trip['days']) + 1
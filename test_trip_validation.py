@@ -0,0 +1,42 @@
+"""
+Regression tests for validate_trip: detail field names with markup characters
+"""
+
+from io import BytesIO
+
+import pytest
+
+from trip_pdf_generator import TripPDFGenerator
+from trip_renderers import render_trip
+from trip_validation import validate_trip
+
+TRIP = {
+    'title': 'Research Trip',
+    'days': [{'day_number': 1, 'events': [
+        {'type': 'activity', 'time': '9:00 AM', 'r&d': 'Lab tour', 'a<b>': 'x < y'},
+    ]}],
+}
+
+
+def label_text(cell):
+    """Plain text of a label cell from either layout"""
+    paragraph = getattr(cell, 'paragraph', cell)
+    return paragraph.getPlainText()
+
+
+@pytest.mark.parametrize('layout', ['cards', 'compact'])
+def test_field_names_with_markup_characters_in_pdf(layout):
+    trip = validate_trip(TRIP).trip
+    event = trip['days'][0]['events'][0]
+    assert list(event) == ['type', 'time', 'r&d', 'a<b>']
+
+    generator = TripPDFGenerator(BytesIO(), layout=layout)
+    _, _, detail_cells = generator._event_content(event)
+    assert [label_text(label) for label, _ in detail_cells] == ['R&D:', 'A<B>:']
+    assert label_text(detail_cells[1][1]) == 'x < y'
+
+
+def test_field_names_with_markup_characters_in_text():
+    text = render_trip(TRIP, 'text')
+    assert 'R&D: Lab tour' in text
+    assert 'A<B>: x < y' in text
@@ -0,0 +1,238 @@
+"""
+Trip Itinerary Data Model
+Compact, read-only Trip/Day/Event records that behave like the trip dictionaries
+"""
+
+import sys
+from collections.abc import Mapping
+from functools import lru_cache
+
+# Field layouts (tuples of keys) shared between records; bounded so that
+# arbitrary input cannot grow it without limit
+_KEY_LAYOUTS = {}
+_MAX_KEY_LAYOUTS = 4096
+
+
+class InvalidTrip(ValueError):
+    """Raised when trip data does not have the trip/day/event structure"""
+
+
+@lru_cache(maxsize=4096)
+def field_label(key):
+    """Display label for an event field name, e.g. 'check_in' -> 'Check In'"""
+    return sys.intern(key.replace('_', ' ').title())
+
+
+def _key_layout(keys):
+    """Shared, interned tuple for a sequence of field names"""
+    keys = tuple(sys.intern(key) for key in keys)
+    layout = _KEY_LAYOUTS.get(keys)
+    if layout is not None:
+        return layout
+    if len(_KEY_LAYOUTS) < _MAX_KEY_LAYOUTS:
+        _KEY_LAYOUTS[keys] = keys
+    return keys
+
+
+def _check_mapping(value, path, what):
+    if not isinstance(value, Mapping):
+        raise InvalidTrip(f"{path} must be {what}, got {type(value).__name__}")
+    for key in value:
+        if not isinstance(key, str):
+            raise InvalidTrip(f"{path} has a non-string key {key!r}")
+
+
+def _check_list(value, path):
+    if not isinstance(value, (list, tuple)):
+        raise InvalidTrip(f"{path} must be a list, got {type(value).__name__}")
+
+
+class _Record(Mapping):
+    """
+    Read-only mapping stored as a shared key tuple plus a value tuple
+
+    Records with the same fields in the same order share one key tuple, so
+    each record costs one small object and one tuple of values instead of
+    a dict. Values are the very objects taken from the source dictionary.
+    """
+
+    __slots__ = ('_keys', '_values')
+
+    def __init__(self, keys, values):
+        self._keys = _key_layout(keys)
+        self._values = tuple(values)
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        keys = self._keys
+        if key in keys:
+            return self._values[keys.index(key)]
+        return default
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        if isinstance(other, _Record):
+            other = other.to_dict()
+        # Compare as dictionaries: nested tuples equal the lists they came from
+        return self.to_dict() == dict(other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (_restore, (type(self), self._keys, self._values))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Equivalent trip dictionary (nested records become dicts and lists)"""
+        return {key: _to_plain(value) for key, value in zip(self._keys, self._values)}
+
+
+def _restore(cls, keys, values):
+    record = cls.__new__(cls)
+    _Record.__init__(record, keys, values)
+    return record
+
+
+def _to_plain(value):
+    if isinstance(value, _Record):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_to_plain(item) for item in value]
+    return value
+
+
+class Event(_Record):
+    """One event: its type, time and detail fields"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data, path='event'):
+        _check_mapping(data, path, 'an object')
+        keys = tuple(data)
+        values = []
+        for key, value in data.items():
+            # Types and times repeat across events; share one string object
+            if key in ('type', 'time') and isinstance(value, str):
+                value = sys.intern(value)
+            values.append(value)
+        return cls(keys, values)
+
+    @property
+    def type(self):
+        return self.get('type', 'Event')
+
+    @property
+    def time(self):
+        return self.get('time', '')
+
+    def details(self):
+        """(label, value) pairs for the non-empty detail fields, in order"""
+        return [(field_label(key), value) for key, value in zip(self._keys, self._values)
+                if key != 'type' and key != 'time' and value]
+
+
+class Day(_Record):
+    """One day of a trip; 'events' holds a tuple of Event"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data, path='day'):
+        _check_mapping(data, path, 'an object')
+        values = []
+        for key, value in data.items():
+            if key == 'events':
+                _check_list(value, f"{path}.events")
+                value = tuple(event if isinstance(event, Event)
+                              else Event.from_dict(event, f"{path}.events[{index}]")
+                              for index, event in enumerate(value))
+            values.append(value)
+        return cls(tuple(data), values)
+
+    @property
+    def day_number(self):
+        return self.get('day_number')
+
+    @property
+    def date(self):
+        return self.get('date')
+
+    @property
+    def events(self):
+        return self.get('events', ())
+
+
+class Trip(_Record):
+    """
+    A whole trip; 'days' holds a tuple of Day
+
+    Trip, Day and Event are read-only Mappings, so they can be passed
+    anywhere a trip dictionary is accepted (generate_pdf_from_data,
+    render_pdf_bytes, the render cache, ...). Build them with
+    Trip.from_dict, which checks the structure, and convert back with
+    to_dict.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data, path='trip'):
+        """
+        Build a Trip from a trip dictionary
+
+        Raises:
+            InvalidTrip: data, a day or an event is not an object, or
+                'days'/'events' is not a list
+        """
+        if isinstance(data, Trip):
+            return data
+        _check_mapping(data, path, 'an object')
+        values = []
+        for key, value in data.items():
+            if key == 'days':
+                _check_list(value, 'days')
+                value = tuple(day if isinstance(day, Day) else Day.from_dict(day, f"days[{index}]")
+                              for index, day in enumerate(value))
+            values.append(value)
+        return cls(tuple(data), values)
+
+    @property
+    def title(self):
+        return self.get('title', 'Trip Itinerary')
+
+    @property
+    def destination(self):
+        return self.get('destination')
+
+    @property
+    def dates(self):
+        return self.get('dates')
+
+    @property
+    def days(self):
+        return self.get('days', ())
+
+
+def to_json_value(value):
+    """json.dumps default= hook that serializes trip records like dictionaries"""
+    if isinstance(value, _Record):
+        return value.to_dict()
+    return str(value)
@@ -3,227 +3,903 @@ Trip Itinerary PDF Generator
 A minimalist tool to create beautiful trip itinerary PDFs
 """
 
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
-from reportlab.lib import colors
+import json
+import os
 from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+from threading import Lock
+from time import perf_counter
+
+from trip_model import Event, field_label
+
+# ReportLab, and the modules built on it (event_card, font_registry,
+# optimized_canvas), take about 150 ms to import. They are imported by the
+# functions that use them, so importing this module (for DEFAULT_COLOR_MAP,
+# say) stays cheap and the cost moves to the first render; warm_up() pays it
+# ahead of time.
+
+
+# Bump whenever layout or styling changes the rendered output; render caches key on it
+RENDER_VERSION = 1
+
+# Event layouts supported by TripPDFGenerator
+LAYOUTS = ('cards', 'compact')
+
+# Default event type colors (keys are upper-case event types)
+DEFAULT_COLOR_MAP = {
+    'FLIGHT': '#3498db',
+    'HOTEL': '#e74c3c',
+    'ACTIVITY': '#2ecc71',
+    'RESTAURANT': '#f39c12',
+    'TRANSPORT': '#9b59b6',
+    'OTHER': '#95a5a6'
+}
+
+# Everything about how a PDF looks, as a declarative theme. Theme files (see
+# load_theme) override any subset of it. Lengths are points or strings with a
+# unit ('0.75in', '2cm', '18mm'); margins and paddings are one length or
+# (top, bottom, left, right); colors are hex codes. page_size names a size in
+# reportlab.lib.pagesizes ('letter', 'A4', ...) or gives [width, height].
+DEFAULT_THEME = {
+    'name': 'default',
+    'page_size': 'letter',
+    'landscape': False,
+    'margins': '0.75in',
+    'fonts': {
+        'family': 'Helvetica',
+        'fallbacks': [],
+        # TrueType files for families not yet registered: family name ->
+        # [regular, bold, italic, bold italic] file names or paths, bold and
+        # italic faces optional
+        'files': {},
+    },
+    'font_sizes': {
+        'title': 28,
+        'subtitle': 12,
+        'day_header': 18,
+        'event_type': 11,
+        'details': 10,
+        'label': 9,
+    },
+    'leading': {
+        'details': 14,
+        'label': 12,
+    },
+    'colors': {
+        'title': '#1a1a1a',
+        'subtitle': '#666666',
+        'day_header': '#2c3e50',
+        'event_type': '#ffffff',
+        'details': '#333333',
+        'label': '#888888',
+        'details_background': '#f8f9fa',
+        'rule': '#e0e0e0',
+    },
+    # Event header colors by type, merged over these; custom_event_types
+    # passed to a render still replace them all
+    'event_types': DEFAULT_COLOR_MAP,
+    'spacing': {
+        'title_top': '0.3in',
+        'after_title': 20,
+        'after_subtitle': 30,
+        'before_day': 24,
+        'after_day_header': 12,
+        'after_day': '0.15in',
+    },
+    'card': {
+        'header_columns': ['5in', '1.5in'],
+        'detail_columns': ['1.2in', '5.3in'],
+        'header_padding': [8, 8, 12, 12],
+        'detail_padding': [4, 4, 12, 12],
+        'rule_width': 0.5,
+        'space_after': '0.2in',
+        # Side of each QR code with qr_codes=True, quiet zone included
+        'qr_size': '0.8in',
+    },
+}
+
+
+def walk_trip(trip_data, title, day):
+    """
+    Visit a trip in output order: the title block, then each day
+
+    This is the traversal every output format shares (see trip_renderers).
+    title(trip_name, destination, dates) and day(day_number, date, events)
+    each return a list of parts (flowables for the PDF), which are yielded
+    one at a time.
+    """
+    yield from title(
+        trip_data.get('title', 'Trip Itinerary'),
+        trip_data.get('destination'),
+        trip_data.get('dates')
+    )
+    for day_data in trip_data.get('days', []):
+        yield from day(
+            day_data.get('day_number'),
+            day_data.get('date'),
+            day_data.get('events', [])
+        )
+
+
+def subtitle_text(destination=None, dates=None):
+    """Subtitle under the trip name, e.g. 'Paris → Rome • June 15-25', or None"""
+    parts = [part for part in (destination, dates) if part]
+    return " • ".join(parts) if parts else None
+
+
+def day_heading(day_number, date=None):
+    """Day header text, e.g. 'Day 1 • Saturday, June 15'"""
+    heading = f"Day {day_number}"
+    if date:
+        heading += f" • {date}"
+    return heading
+
+
+def event_fields(event, color_map=DEFAULT_COLOR_MAP):
+    """
+    Event type label, time, header color and (label, value) detail pairs
+
+    Shared by every output format, so an event shows the same fields in
+    the same order whichever one renders it.
+    """
+    event_type = event.get('type', 'Event').upper()
+    time = event.get('time', '')
+    bg_hex = color_map.get(event_type, color_map.get('OTHER', '#95a5a6'))
+    
+    # Add all detail fields
+    if isinstance(event, Event):
+        details = event.details()
+    else:
+        details = []
+        for key, value in event.items():
+            if key not in ['type', 'time'] and value:
+                details.append((field_label(key), value))
+    
+    return event_type, time, bg_hex, details
+
+
+@lru_cache(maxsize=1024)
+def hex_color(value):
+    """Memoized colors.HexColor; Color objects are never mutated, so sharing is safe"""
+    from reportlab.lib import colors
+    return colors.HexColor(value)
+
+
+def _theme_length(value, setting):
+    """A theme length in points: a number, or a string with a unit such as '0.75in'"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        from reportlab.lib.units import toLength
+        try:
+            return toLength(value.strip())
+        except ValueError:
+            pass
+    raise ValueError(f"Theme setting {setting!r}: {value!r} is not a length")
+
+
+def _theme_size(value, setting):
+    """A font size or leading in points: a positive number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+        return value
+    raise ValueError(f"Theme setting {setting!r}: {value!r} is not a positive number")
+
+
+def _theme_edges(value, setting):
+    """Margins or padding as (top, bottom, left, right) from one length or four"""
+    if isinstance(value, (list, tuple)):
+        if len(value) != 4:
+            raise ValueError(f"Theme setting {setting!r}: expected one length or four (top, bottom, left, right)")
+        return tuple(_theme_length(v, setting) for v in value)
+    return (_theme_length(value, setting),) * 4
+
+
+def _theme_columns(value, setting):
+    """Two column widths in points"""
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"Theme setting {setting!r}: expected two column widths")
+    return tuple(_theme_length(v, setting) for v in value)
+
+
+def _theme_color(value, setting):
+    """A validated hex color code"""
+    try:
+        hex_color(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Theme setting {setting!r}: {value!r} is not a hex color") from None
+    return value
+
+
+def _theme_page_size(value, landscape):
+    """Page size in points from a reportlab.lib.pagesizes name or [width, height]"""
+    from reportlab.lib import pagesizes
+    if isinstance(value, str):
+        for name in (value, value.upper(), value.lower()):
+            size = getattr(pagesizes, name, None)
+            if isinstance(size, tuple):
+                break
+        else:
+            raise ValueError(f"Theme setting 'page_size': unknown page size {value!r}")
+    elif isinstance(value, (list, tuple)) and len(value) == 2:
+        size = tuple(_theme_length(v, 'page_size') for v in value)
+    else:
+        raise ValueError(f"Theme setting 'page_size': expected a name or [width, height], got {value!r}")
+    return pagesizes.landscape(size) if landscape else size
+
+
+def _theme_font_family(fonts, name, files):
+    """
+    The registered font family called name, registering it on first use
+    
+    Families not registered yet are loaded from the theme's fonts.files, or
+    are one of font_registry.UNICODE_FONTS when installed.
+    """
+    if name in fonts:
+        return fonts.family(name)
+    faces = files.get(name)
+    if faces is not None:
+        if isinstance(faces, str):
+            faces = [faces]
+        if (not isinstance(faces, list) or not 1 <= len(faces) <= 4
+                or not all(face is None or isinstance(face, str) for face in faces) or faces[0] is None):
+            raise ValueError(f"Theme setting 'fonts.files.{name}': expected a font file or a list of "
+                             f"up to four (regular, bold, italic, bold italic)")
+        from reportlab.pdfbase.ttfonts import TTFError
+        try:
+            return fonts.register_family(name, *faces)
+        except (OSError, ValueError, TTFError) as e:
+            raise ValueError(f"Theme setting 'fonts.files.{name}': {e}") from None
+    if fonts.register_unicode_family(name) is not None:
+        return fonts.family(name)
+    raise ValueError(f"Font family {name!r} is not registered; list its files in the theme's "
+                     f"fonts.files or register it with font_registry.get_font_registry()")
+
+
+def merge_theme(spec, defaults=DEFAULT_THEME, _prefix=''):
+    """
+    A complete theme spec: spec's settings over defaults
+
+    Sections (fonts, colors, card, ...) are merged setting by setting, so a
+    theme only lists what it changes. Unknown settings raise ValueError, so
+    a misspelt one is not silently ignored.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"Theme {_prefix.rstrip('.') or 'spec'!r} must be an object")
+    merged = dict(defaults)
+    for key, value in spec.items():
+        if key not in defaults:
+            raise ValueError(f"Unknown theme setting {_prefix + key!r}")
+        if key == 'event_types' and not _prefix:
+            if not isinstance(value, dict):
+                raise ValueError("Theme setting 'event_types' must be an object")
+            value = dict(defaults[key], **{k.upper(): v for k, v in value.items()})
+        elif key == 'files' and _prefix == 'fonts.':
+            # Keyed by family name, so any key is allowed
+            if not isinstance(value, dict):
+                raise ValueError("Theme setting 'fonts.files' must be an object")
+            value = dict(defaults[key], **value)
+        elif isinstance(defaults[key], dict):
+            value = merge_theme(value, defaults[key], f"{_prefix}{key}.")
+        merged[key] = value
+    return merged
+
+
+def _build_stylesheet(font='Helvetica', bold_font='Helvetica-Bold', spec=DEFAULT_THEME):
+    """Create the sample stylesheet extended with the custom minimalist styles of a merged theme spec"""
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    
+    sizes = spec['font_sizes']
+    leading = spec['leading']
+    palette = spec['colors']
+    spacing = spec['spacing']
+    styles = getSampleStyleSheet()
+    
+    # Title style
+    styles.add(ParagraphStyle(
+        name='TripTitle',
+        parent=styles['Heading1'],
+        fontSize=sizes['title'],
+        textColor=hex_color(palette['title']),
+        spaceAfter=_theme_length(spacing['after_title'], 'spacing.after_title'),
+        alignment=TA_CENTER,
+        fontName=bold_font
+    ))
+    
+    # Subtitle style
+    styles.add(ParagraphStyle(
+        name='TripSubtitle',
+        parent=styles['Normal'],
+        fontSize=sizes['subtitle'],
+        textColor=hex_color(palette['subtitle']),
+        spaceAfter=_theme_length(spacing['after_subtitle'], 'spacing.after_subtitle'),
+        alignment=TA_CENTER,
+        fontName=font
+    ))
+    
+    # Day header style
+    styles.add(ParagraphStyle(
+        name='DayHeader',
+        parent=styles['Heading2'],
+        fontSize=sizes['day_header'],
+        textColor=hex_color(palette['day_header']),
+        spaceBefore=_theme_length(spacing['before_day'], 'spacing.before_day'),
+        spaceAfter=_theme_length(spacing['after_day_header'], 'spacing.after_day_header'),
+        fontName=bold_font,
+        borderWidth=0,
+        borderPadding=0,
+        borderColor=hex_color(palette['rule']),
+        borderRadius=None,
+        backColor=None
+    ))
+    
+    # Event type style
+    styles.add(ParagraphStyle(
+        name='EventType',
+        parent=styles['Normal'],
+        fontSize=sizes['event_type'],
+        textColor=hex_color(palette['event_type']),
+        fontName=bold_font,
+        leftIndent=0,
+        rightIndent=0
+    ))
+    
+    # Event details style
+    styles.add(ParagraphStyle(
+        name='EventDetails',
+        parent=styles['Normal'],
+        fontSize=sizes['details'],
+        textColor=hex_color(palette['details']),
+        fontName=font,
+        leading=leading['details']
+    ))
+    
+    # Event label style
+    styles.add(ParagraphStyle(
+        name='EventLabel',
+        parent=styles['Normal'],
+        fontSize=sizes['label'],
+        textColor=hex_color(palette['label']),
+        fontName=font,
+        leading=leading['label']
+    ))
+    
+    return styles
+
+
+class Theme:
+    """
+    Precompiled styles, table styles and layout, built once and shared by every generator
+    
+    Treat a theme as read-only: it is shared across documents (and threads).
+    
+    A theme is compiled from a declarative spec (any subset of
+    DEFAULT_THEME, see merge_theme): lengths become points, colors are
+    checked, and the stylesheet and table styles are built here, so
+    rendering with a theme costs no more than rendering with the default.
+    
+    The fonts' family names a family in the font registry (see
+    font_registry), registered here from fonts.files or UNICODE_FONTS if
+    need be; text runs it has no glyphs for are drawn in the first of its
+    fallbacks that has them.
+    """
+    
+    __slots__ = ('spec', 'name', 'styles', 'details_table_style', 'font_family', 'fallback_fonts',
+                 'page_size', 'margins', 'color_map', 'details_color', 'rule_color', 'header_widths',
+                 'detail_widths', 'header_padding', 'detail_padding', 'rule_width', 'event_spacing',
+                 'qr_size', 'title_spacing', 'day_spacing', '_bold_font', '_header_table_styles', '_lock')
+    
+    def __init__(self, spec=None):
+        from font_registry import get_font_registry
+        from reportlab.platypus import TableStyle
+        
+        spec = merge_theme({} if spec is None else spec)
+        self.spec = spec
+        self.name = spec['name']
+        
+        fonts = get_font_registry()
+        font_family = spec['fonts']['family']
+        fallback_fonts = tuple(spec['fonts']['fallbacks'])
+        family = _theme_font_family(fonts, font_family, spec['fonts']['files'])
+        for name in fallback_fonts:
+            _theme_font_family(fonts, name, spec['fonts']['files'])
+        self.font_family = font_family
+        self.fallback_fonts = fallback_fonts
+        self._bold_font = family.bold
+        
+        for section in ('font_sizes', 'leading'):
+            for key, value in spec[section].items():
+                _theme_size(value, f'{section}.{key}')
+        for key, value in spec['colors'].items():
+            _theme_color(value, f'colors.{key}')
+        self.color_map = {key: _theme_color(value, f'event_types.{key}')
+                          for key, value in spec['event_types'].items()}
+        self.details_color = hex_color(spec['colors']['details_background'])
+        self.rule_color = hex_color(spec['colors']['rule'])
+        
+        self.page_size = _theme_page_size(spec['page_size'], spec['landscape'])
+        self.margins = _theme_edges(spec['margins'], 'margins')
+        
+        card = spec['card']
+        self.header_widths = _theme_columns(card['header_columns'], 'card.header_columns')
+        self.detail_widths = _theme_columns(card['detail_columns'], 'card.detail_columns')
+        self.header_padding = _theme_edges(card['header_padding'], 'card.header_padding')
+        self.detail_padding = _theme_edges(card['detail_padding'], 'card.detail_padding')
+        self.rule_width = _theme_length(card['rule_width'], 'card.rule_width')
+        self.event_spacing = _theme_length(card['space_after'], 'card.space_after')
+        self.qr_size = _theme_length(card['qr_size'], 'card.qr_size')
+        self.title_spacing = _theme_length(spec['spacing']['title_top'], 'spacing.title_top')
+        self.day_spacing = _theme_length(spec['spacing']['after_day'], 'spacing.after_day')
+        
+        self.styles = _build_stylesheet(family.regular, family.bold, spec)
+        
+        # Event details table style is identical for every event
+        top, bottom, left, right = self.detail_padding
+        self.details_table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), top),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), bottom),
+            ('LEFTPADDING', (0, 0), (-1, -1), left),
+            ('RIGHTPADDING', (0, 0), (-1, -1), right),
+            ('BACKGROUND', (0, 0), (-1, -1), self.details_color),
+            ('LINEBELOW', (0, -1), (-1, -1), self.rule_width, self.rule_color),
+        ])
+        
+        # Event header table styles only vary by background color
+        self._header_table_styles = {}
+        self._lock = Lock()
+    
+    def header_table_style(self, hex_value):
+        """Event header table style for a background color, built once per color"""
+        table_style = self._header_table_styles.get(hex_value)
+        if table_style is None:
+            with self._lock:
+                table_style = self._header_table_styles.get(hex_value)
+                if table_style is None:
+                    from reportlab.platypus import TableStyle
+                    type_style = self.styles['EventType']
+                    top, bottom, left, right = self.header_padding
+                    table_style = TableStyle([
+                        ('BACKGROUND', (0, 0), (-1, 0), hex_color(hex_value)),
+                        ('TEXTCOLOR', (0, 0), (-1, 0), type_style.textColor),
+                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                        ('FONTNAME', (0, 0), (-1, 0), self._bold_font),
+                        ('FONTSIZE', (0, 0), (-1, 0), type_style.fontSize),
+                        ('TOPPADDING', (0, 0), (-1, -1), top),
+                        ('BOTTOMPADDING', (0, 0), (-1, -1), bottom),
+                        ('LEFTPADDING', (0, 0), (-1, -1), left),
+                        ('RIGHTPADDING', (0, 0), (-1, -1), right),
+                    ])
+                    self._header_table_styles[hex_value] = table_style
+        return table_style
+    
+    def fallback(self, text):
+        """text as Paragraph markup, switching to a fallback font where needed"""
+        if not self.fallback_fonts:
+            return text
+        from font_registry import get_font_registry
+        return get_font_registry().apply_fallback(str(text), self.font_family, self.fallback_fonts)
+
+
+@lru_cache(maxsize=None)
+def get_theme(font_family='Helvetica', fallback_fonts=()):
+    """Return the process-wide theme for a font family and fallbacks, building it on first use"""
+    return Theme({'fonts': {'family': font_family, 'fallbacks': list(fallback_fonts)}})
+
+
+# Themes compiled from files, by absolute path: (file version, Theme)
+_loaded_themes = {}
+_loaded_themes_lock = Lock()
+
+
+def _resolve_font_files(spec, directory):
+    """Point fonts.files names that exist next to a theme file at that file"""
+    fonts = spec.get('fonts') if isinstance(spec, dict) else None
+    files = fonts.get('files') if isinstance(fonts, dict) else None
+    if not isinstance(files, dict):
+        return
+    for name, faces in files.items():
+        if isinstance(faces, list):
+            files[name] = [os.path.join(directory, face)
+                           if isinstance(face, str) and os.path.isfile(os.path.join(directory, face)) else face
+                           for face in faces]
+        elif isinstance(faces, str) and os.path.isfile(os.path.join(directory, faces)):
+            files[name] = os.path.join(directory, faces)
+
+
+def load_theme(path):
+    """
+    Return the theme defined in a JSON theme file, compiling it on first use
+    
+    The file holds an object with any subset of DEFAULT_THEME's settings;
+    'name' defaults to the file name without its extension, and font files
+    in fonts.files are looked for next to the theme file first. Compiled themes
+    are kept per path and only recompiled when the file changes, so passing
+    the same path to every render costs a stat() rather than a parse.
+    
+    Raises:
+        OSError: the file cannot be read
+        ValueError: the file is not valid JSON or not a valid theme
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _loaded_themes.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    with _loaded_themes_lock:
+        cached = _loaded_themes.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        try:
+            with open(path, encoding='utf-8') as f:
+                spec = json.load(f)
+            if isinstance(spec, dict) and 'name' not in spec:
+                spec['name'] = os.path.splitext(os.path.basename(path))[0]
+            _resolve_font_files(spec, os.path.dirname(path))
+            theme = Theme(spec)
+        except (json.JSONDecodeError, ValueError) as e:
+            raise ValueError(f"{path}: {e}") from None
+        _loaded_themes[path] = (version, theme)
+        return theme
+
+
+def resolve_theme(theme=None):
+    """A Theme for a theme argument: None for the default, a Theme, or a theme file path"""
+    if theme is None:
+        return get_default_theme()
+    if isinstance(theme, (str, os.PathLike)):
+        return load_theme(theme)
+    return theme
+
+
+def get_default_theme():
+    """Return the process-wide default theme, building it on first use"""
+    return get_theme()
+
+
+def warm_up(*themes):
+    """
+    Import ReportLab and precompile styles ahead of the first render
+
+    Meant as a worker pool initializer (or a background thread at startup),
+    so the first real render does not pay for imports, stylesheet building
+    and font metric loading. Safe to call more than once.
+
+    Args:
+        themes: Themes (or theme file paths) to prepare besides the default one
+    """
+    import optimized_canvas  # Used by optimize=True renders
+    import qr_codes  # Used by qr_codes=True renders
+
+    sample = create_sample_trip()
+    for theme in (get_default_theme(),) + tuple(resolve_theme(theme) for theme in themes):
+        for hex_value in theme.color_map.values():
+            theme.header_table_style(hex_value)
+        # Lay out a small trip once per layout, loading everything a render touches
+        for layout in LAYOUTS:
+            render_pdf_bytes(sample, layout=layout, theme=theme)
+
+
+class LazyStory(list):
+    """
+    Story list that pulls flowables from an iterable as layout consumes them
+    
+    doc.build() takes flowables off the front of the story and checks its
+    length before each one, so refilling in __len__ keeps only a window of
+    flowables alive instead of the whole document. The window must be longer
+    than any run of keepWithNext flowables (day headers keep with one event).
+    """
+    
+    def __init__(self, flowables, window=64):
+        list.__init__(self)
+        self._source = iter(flowables)
+        self.window = window
+        # Flowables taken from the source so far
+        self.pulled = 0
+    
+    def __len__(self):
+        length = list.__len__(self)
+        if length < self.window and self._source is not None:
+            for flowable in self._source:
+                self.append(flowable)
+                self.pulled += 1
+                length += 1
+                if length >= 2 * self.window:
+                    break
+            else:
+                self._source = None
+        return length
 
 
 class TripPDFGenerator:
     """Generate minimalist trip itinerary PDFs"""
     
-    def __init__(self, output_filename="trip_itinerary.pdf"):
+    # Event type colors; instances start with their theme's and may override them
+    color_map = DEFAULT_COLOR_MAP
+    
+    # Subclasses may lay out the story with a different document template;
+    # None means ReportLab's SimpleDocTemplate
+    doc_template_class = None
+    
+    def __init__(self, output_filename="trip_itinerary.pdf", theme=None, observer=None, layout='cards',
+                 optimize=False, qr_codes=False):
+        from reportlab.platypus import SimpleDocTemplate
+        
+        # Optional callable observer(phase, seconds, **info); see render_profiling.RenderTimings
+        self.observer = observer
+        
+        # 'cards' lays out each event as Paragraphs in two Tables; 'compact'
+        # draws the same card directly on the canvas (see event_card.EventCard)
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout!r}; expected one of {LAYOUTS}")
+        self.layout = layout
+        
+        # Write smaller PDFs (see optimized_canvas.OptimizedCanvas)
+        self.optimize = optimize
+        
+        # Add QR codes for addresses and confirmations below each event (see qr_codes)
+        self.qr_codes = qr_codes
+        start = perf_counter()
+        
+        # theme may be a Theme or a theme file path (see load_theme)
+        self.theme = resolve_theme(theme)
+        self.styles = self.theme.styles
+        self.color_map = self.theme.color_map
+        
+        # output_filename may also be a writable binary stream (e.g. BytesIO)
         self.output_filename = output_filename
-        self.doc = SimpleDocTemplate(
+        top, bottom, left, right = self.theme.margins
+        self.doc = (self.doc_template_class or SimpleDocTemplate)(
             output_filename,
-            pagesize=letter,
-            rightMargin=0.75*inch,
-            leftMargin=0.75*inch,
-            topMargin=0.75*inch,
-            bottomMargin=0.75*inch
+            pagesize=self.theme.page_size,
+            rightMargin=right,
+            leftMargin=left,
+            topMargin=top,
+            bottomMargin=bottom
         )
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
         self.story = []
-    
-    def _setup_custom_styles(self):
-        """Create custom minimalist styles"""
-        
-        # Title style
-        self.styles.add(ParagraphStyle(
-            name='TripTitle',
-            parent=self.styles['Heading1'],
-            fontSize=28,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Subtitle style
-        self.styles.add(ParagraphStyle(
-            name='TripSubtitle',
-            parent=self.styles['Normal'],
-            fontSize=12,
-            textColor=colors.HexColor('#666666'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        ))
-        
-        # Day header style
-        self.styles.add(ParagraphStyle(
-            name='DayHeader',
-            parent=self.styles['Heading2'],
-            fontSize=18,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceBefore=24,
-            spaceAfter=12,
-            fontName='Helvetica-Bold',
-            borderWidth=0,
-            borderPadding=0,
-            borderColor=colors.HexColor('#e0e0e0'),
-            borderRadius=None,
-            backColor=None
-        ))
-        
-        # Event type style
-        self.styles.add(ParagraphStyle(
-            name='EventType',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            textColor=colors.HexColor('#ffffff'),
-            fontName='Helvetica-Bold',
-            leftIndent=0,
-            rightIndent=0
-        ))
-        
-        # Event details style
-        self.styles.add(ParagraphStyle(
-            name='EventDetails',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#333333'),
-            fontName='Helvetica',
-            leading=14
-        ))
-        
-        # Event label style
-        self.styles.add(ParagraphStyle(
-            name='EventLabel',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#888888'),
-            fontName='Helvetica',
-            leading=12
-        ))
+        
+        if observer is not None:
+            observer('setup', perf_counter() - start)
     
     def add_title(self, trip_name, destination=None, dates=None):
         """Add trip title and basic info"""
-        self.story.append(Spacer(1, 0.3*inch))
+        self.story.extend(self.title_flowables(trip_name, destination, dates))
+    
+    def title_flowables(self, trip_name, destination=None, dates=None):
+        """Build the flowables for the title block without adding them to the story"""
+        from reportlab.platypus import Paragraph, Spacer
+        
+        start = perf_counter()
+        flowables = [Spacer(1, self.theme.title_spacing)]
+        
+        fallback = self.theme.fallback
         
         # Trip name
-        title = Paragraph(trip_name, self.styles['TripTitle'])
-        self.story.append(title)
+        title = Paragraph(fallback(trip_name), self.styles['TripTitle'])
+        flowables.append(title)
         
         # Subtitle with destination and dates
-        subtitle_parts = []
-        if destination:
-            subtitle_parts.append(destination)
-        if dates:
-            subtitle_parts.append(dates)
-        
-        if subtitle_parts:
-            subtitle = Paragraph(" • ".join(subtitle_parts), self.styles['TripSubtitle'])
-            self.story.append(subtitle)
+        subtitle_line = subtitle_text(destination, dates)
+        
+        if subtitle_line:
+            subtitle = Paragraph(fallback(subtitle_line), self.styles['TripSubtitle'])
+            flowables.append(subtitle)
         else:
-            self.story.append(Spacer(1, 0.3*inch))
+            flowables.append(Spacer(1, self.theme.title_spacing))
+        
+        if self.observer is not None:
+            self.observer('title', perf_counter() - start, flowables=len(flowables))
+        return flowables
+    
+    def trip_flowables(self, trip_data):
+        """Yield the flowables for a whole trip, one day at a time"""
+        return walk_trip(trip_data, self.title_flowables, self.day_flowables)
     
     def add_day(self, day_number, date, events):
         """Add a day section with events"""
+        self.story.extend(self.day_flowables(day_number, date, events))
+    
+    def day_flowables(self, day_number, date, events, contents=None):
+        """
+        Build the flowables for a day section without adding them to the story
         
-        # Day header
-        day_header = f"Day {day_number}"
-        if date:
-            day_header += f" • {date}"
+        contents may give each event's _event_content(), e.g. kept from an
+        earlier render; it is built here otherwise.
+        """
+        from reportlab.platypus import Paragraph, Spacer
         
-        header = Paragraph(day_header, self.styles['DayHeader'])
-        self.story.append(header)
+        start = perf_counter()
+        flowables = []
+        
+        # Day header
+        header = Paragraph(self.theme.fallback(day_heading(day_number, date)), self.styles['DayHeader'])
+        flowables.append(header)
         
         # Add each event
-        for event in events:
-            self._add_event(event)
+        observer = self.observer
+        for index, event in enumerate(events):
+            content = contents[index] if contents is not None else None
+            if observer is None:
+                flowables.extend(self._event_flowables(event, content))
+            else:
+                event_start = perf_counter()
+                event_flowables = self._event_flowables(event, content)
+                flowables.extend(event_flowables)
+                observer('event', perf_counter() - event_start, day_number=day_number,
+                         type=event.get('type'), flowables=len(event_flowables))
+        
+        flowables.append(Spacer(1, self.theme.day_spacing))
         
-        self.story.append(Spacer(1, 0.15*inch))
+        if observer is not None:
+            observer('day', perf_counter() - start, day_number=day_number,
+                     events=len(events), flowables=len(flowables))
+        return flowables
     
     def _add_event(self, event):
         """Add a single event (flight, hotel, activity, etc.)"""
+        self.story.extend(self._event_flowables(event))
+    
+    def _event_fields(self, event):
+        """Event type label, time, header color and (label, value) detail pairs"""
+        # trip_validation imports this module, so it is imported here
+        from trip_validation import escape_markup
         
-        event_type = event.get('type', 'Event').upper()
-        time = event.get('time', '')
+        event_type, time, bg_hex, details = event_fields(event, self.color_map)
+        # Labels are built from raw field names (field_label title-cases them), so
+        # they are escaped here; values arrive escaped by validate_trip
+        details = [(escape_markup(label), value) for label, value in details]
         
-        # Use custom color map if available, otherwise use defaults
-        if hasattr(self, 'color_map'):
-            color_map = self.color_map
-        else:
-            color_map = {
-                'FLIGHT': '#3498db',
-                'HOTEL': '#e74c3c',
-                'ACTIVITY': '#2ecc71',
-                'RESTAURANT': '#f39c12',
-                'TRANSPORT': '#9b59b6',
-                'OTHER': '#95a5a6'
-            }
+        if self.theme.fallback_fonts:
+            fallback = self.theme.fallback
+            event_type = fallback(event_type)
+            time = fallback(time)
+            details = [(fallback(label), fallback(value)) for label, value in details]
         
-        bg_color = colors.HexColor(color_map.get(event_type, color_map.get('OTHER', '#95a5a6')))
+        return event_type, time, bg_hex, details
+    
+    def _event_flowables(self, event, content=None):
+        """Build the flowables for a single event, from its _event_content() if given"""
+        if content is None:
+            content = self._event_content(event)
+        return self._event_layout(event, content)
+    
+    def _event_content(self, event):
+        """
+        The cells of an event: (header color, (type cell, time cell), [(label cell, value cell)])
         
-        # Create event table
-        data = []
+        Cells are Paragraphs, or pre-wrapped event_card cells in the compact
+        layout. Parsing and wrapping them is most of the work of building a
+        story, and page layout never changes them (unlike the Tables, cards
+        and Spacers that place them), so they can be kept and reused by
+        later renders; see incremental_renderer.
+        """
+        event_type, time, bg_hex, details = self._event_fields(event)
         
         # Header row with event type and time
         header_text = f"<para align=left><b>{event_type}</b></para>"
         time_text = f"<para align=right>{time}</para>" if time else ""
         
-        header_row = [
-            Paragraph(header_text, self.styles['EventType']),
-            Paragraph(time_text, self.styles['EventType'])
-        ]
-        data.append(header_row)
+        if self.layout == 'compact':
+            from event_card import make_cell
+            
+            theme = self.theme
+            header_widths = theme.header_widths
+            detail_widths = theme.detail_widths
+            padding = theme.header_padding[2] + theme.header_padding[3]
+            
+            type_style = self.styles['EventType']
+            header_cells = (
+                make_cell(event_type, type_style, header_widths[0] - padding, bold=True, markup=header_text),
+                make_cell(time, type_style, header_widths[1] - padding, align='right', markup=time_text),
+            )
+            
+            padding = theme.detail_padding[2] + theme.detail_padding[3]
+            detail_cells = [
+                (make_cell(f"{label}:", self.styles['EventLabel'], detail_widths[0] - padding, bold=True,
+                           markup=f"<b>{label}:</b>"),
+                 make_cell(value, self.styles['EventDetails'], detail_widths[1] - padding))
+                for label, value in details
+            ]
+            return bg_hex, header_cells, detail_cells
         
-        # Create the table
-        table = Table(data, colWidths=[5*inch, 1.5*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), bg_color),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LEFTPADDING', (0, 0), (-1, -1), 12),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ]))
+        from reportlab.platypus import Paragraph
         
-        self.story.append(table)
+        header_cells = (
+            Paragraph(header_text, self.styles['EventType']),
+            Paragraph(time_text, self.styles['EventType'])
+        )
         
         # Event details
-        details_data = []
+        detail_cells = [
+            (Paragraph(f"<b>{label}:</b>", self.styles['EventLabel']),
+             Paragraph(str(value), self.styles['EventDetails']))
+            for label, value in details
+        ]
+        return bg_hex, header_cells, detail_cells
+    
+    def _event_layout(self, event, content):
+        """The flowables placing an event's cells (from _event_content) on the page"""
+        from reportlab.platypus import Spacer, Table
         
-        # Add all detail fields
-        for key, value in event.items():
-            if key not in ['type', 'time'] and value:
-                label = key.replace('_', ' ').title()
-                
-                # Format the detail row
-                label_para = Paragraph(f"<b>{label}:</b>", self.styles['EventLabel'])
-                value_para = Paragraph(str(value), self.styles['EventDetails'])
-                
-                details_data.append([label_para, value_para])
-        
-        if details_data:
-            details_table = Table(details_data, colWidths=[1.2*inch, 5.3*inch])
-            details_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-                ('LEFTPADDING', (0, 0), (-1, -1), 12),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
-                ('LINEBELOW', (0, -1), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),
-            ]))
+        theme = self.theme
+        bg_hex, header_cells, detail_cells = content
+        
+        if self.layout == 'compact':
+            from event_card import EventCard
+            
+            flowables = [EventCard.build(header_cells, detail_cells, theme.header_widths, theme.detail_widths,
+                                         hex_color(bg_hex), theme.details_color, theme.rule_color,
+                                         theme.header_padding, theme.detail_padding, theme.rule_width)]
+        else:
+            # Create the table
+            table = Table([list(header_cells)], colWidths=list(theme.header_widths))
+            table.setStyle(theme.header_table_style(bg_hex))
+            flowables = [table]
             
-            self.story.append(details_table)
+            if detail_cells:
+                details_table = Table([list(row) for row in detail_cells], colWidths=list(theme.detail_widths))
+                details_table.setStyle(theme.details_table_style)
+                flowables.append(details_table)
+        
+        if self.qr_codes:
+            flowables.extend(self._qr_flowables(event))
+        flowables.append(Spacer(1, theme.event_spacing))
+        return flowables
+    
+    def _qr_flowables(self, event):
+        """The strip of QR codes for an event's addresses and confirmation, if it has any"""
+        from qr_codes import QRCodeStrip, event_qr_codes
         
-        self.story.append(Spacer(1, 0.2*inch))
+        codes = event_qr_codes(event)
+        if not codes:
+            return []
+        theme = self.theme
+        strip = QRCodeStrip(codes, sum(theme.header_widths), theme.qr_size, theme.detail_padding[2],
+                            self.styles['EventLabel'])
+        # Empty when every text was too long to encode
+        return [strip] if strip.codes else []
     
-    def generate(self):
+    def generate(self, verbose=True):
         """Generate the PDF file"""
-        self.doc.build(self.story)
-        print(f"✅ PDF generated successfully: {self.output_filename}")
+        start = perf_counter()
+        lazy = isinstance(self.story, LazyStory)
+        flowable_count = None if lazy else len(self.story)
+        if self.observer is not None:
+            self.doc.setProgressCallBack(self._page_progress(start))
+        if self.optimize:
+            from optimized_canvas import OptimizedCanvas
+            self.doc.build(self.story, canvasmaker=OptimizedCanvas)
+        else:
+            self.doc.build(self.story)
+        if lazy:
+            flowable_count = self.story.pulled
+        if self.observer is not None:
+            self.observer('build', perf_counter() - start, flowables=flowable_count, pages=self.doc.page)
+        if verbose and not hasattr(self.output_filename, 'write'):
+            print(f"✅ PDF generated successfully: {self.output_filename}")
+    
+    def _page_progress(self, start):
+        """ReportLab progress callback reporting a 'page' timing as each page is finished"""
+        observer = self.observer
+        page_start = start
+        page = 0
+        
+        def progress(kind, value):
+            nonlocal page_start, page
+            # 'PAGE' arrives as a page begins, so the previous page is complete
+            if kind == 'PAGE' or (kind == 'FINISHED' and page):
+                now = perf_counter()
+                if page:
+                    observer('page', now - page_start, page=page)
+                page_start = now
+                page = value if kind == 'PAGE' else 0
+        
+        return progress
 
 
 def create_sample_trip():
@@ -317,39 +993,102 @@ def create_sample_trip():
     return trip_data
 
 
-def generate_pdf_from_data(trip_data, output_filename="trip_itinerary.pdf", custom_event_types=None):
+def _build_generator(trip_data, output, custom_event_types=None, observer=None, layout='cards', theme=None,
+                     stream=False, optimize=False, qr_codes=False):
+    """Create a generator for output with the whole trip added to its story"""
+    
+    generator = TripPDFGenerator(output, theme=theme, observer=observer, layout=layout, optimize=optimize,
+                                 qr_codes=qr_codes)
+    
+    # Set custom color map if provided
+    if custom_event_types:
+        generator.color_map = {k.upper(): v for k, v in custom_event_types.items()}
+    
+    if stream:
+        # Flowables are built as layout reaches them
+        generator.story = LazyStory(generator.trip_flowables(trip_data))
+        return generator
+    
+    # Add the title and each day
+    generator.story.extend(generator.trip_flowables(trip_data))
+    
+    return generator
+
+
+def generate_pdf_from_data(trip_data, output_filename="trip_itinerary.pdf", custom_event_types=None, verbose=True,
+                           observer=None, profile=None, profile_base=None, layout='cards', theme=None,
+                           stream=False, optimize=False, qr_codes=False):
     """
     Generate a PDF from trip data dictionary
     
     Args:
-        trip_data: Dictionary containing trip information
-        output_filename: Name of output PDF file
+        trip_data: Dictionary containing trip information (or a trip_model.Trip)
+        output_filename: Name of output PDF file, or a writable binary stream
         custom_event_types: Optional dictionary mapping event type names to color hex codes
+        verbose: Print a confirmation line once the PDF is written
+        observer: Optional callable observer(phase, seconds, **info) receiving
+            per-phase, per-day and per-event timings (see render_profiling.RenderTimings)
+        profile: Optional 'cprofile' or 'tracemalloc' to profile the whole render
+        profile_base: Path the profile file name is derived from; defaults to
+            output_filename (required when rendering to a stream)
+        layout: 'cards' (default) or 'compact', which lays out each event as a
+            card drawn directly on the canvas and is much faster on large trips
+        theme: Optional Theme (from get_theme or load_theme) or theme file path
+            selecting page size, margins, fonts, colors and card layout
+        stream: Build each day's flowables only when layout reaches it, so
+            memory stays flat however long the trip is; the output is the same
+        optimize: Write a smaller PDF that looks the same: page streams are
+            stored as compressed binary, and the compact layout also drops
+            redundant font and color changes (see optimized_canvas)
+        qr_codes: Add QR codes below each event for its address, meeting
+            point, from/to places (opening a map) and confirmation (see qr_codes)
     """
     
-    generator = TripPDFGenerator(output_filename)
+    if profile is None:
+        generator = _build_generator(trip_data, output_filename, custom_event_types, observer, layout, theme,
+                                     stream, optimize, qr_codes)
+        
+        # Generate the PDF
+        generator.generate(verbose=verbose)
+        return
     
-    # Set custom color map if provided
-    if custom_event_types:
-        generator.color_map = {k.upper(): v for k, v in custom_event_types.items()}
+    from render_profiling import capture_profile
     
-    # Add title
-    generator.add_title(
-        trip_data.get('title', 'Trip Itinerary'),
-        trip_data.get('destination'),
-        trip_data.get('dates')
-    )
+    if profile_base is None:
+        if hasattr(output_filename, 'write'):
+            raise ValueError("profile_base is required when rendering to a stream")
+        profile_base = output_filename
     
-    # Add each day
-    for day in trip_data.get('days', []):
-        generator.add_day(
-            day.get('day_number'),
-            day.get('date'),
-            day.get('events', [])
-        )
+    with capture_profile(profile, profile_base) as path:
+        generator = _build_generator(trip_data, output_filename, custom_event_types, observer, layout, theme,
+                                     stream, optimize, qr_codes)
+        generator.generate(verbose=verbose)
+    if verbose:
+        print(f"📊 Profile written: {path}")
+
+
+def render_pdf_bytes(trip_data, custom_event_types=None, observer=None, layout='cards', theme=None,
+                     optimize=False, qr_codes=False):
+    """
+    Render a PDF from trip data dictionary entirely in memory
+    
+    Args:
+        trip_data: Dictionary containing trip information
+        custom_event_types: Optional dictionary mapping event type names to color hex codes
+        observer: Optional timing observer, as for generate_pdf_from_data
+        layout: 'cards' or 'compact', as for generate_pdf_from_data
+        theme: Optional Theme or theme file path, as for generate_pdf_from_data
+        optimize: Write a smaller PDF, as for generate_pdf_from_data
+        qr_codes: Add QR codes below events, as for generate_pdf_from_data
+    
+    Returns:
+        The PDF document as bytes
+    """
     
-    # Generate the PDF
-    generator.generate()
+    buffer = BytesIO()
+    generate_pdf_from_data(trip_data, buffer, custom_event_types, verbose=False, observer=observer,
+                           layout=layout, theme=theme, optimize=optimize, qr_codes=qr_codes)
+    return buffer.getvalue()
 
 
 if __name__ == "__main__":
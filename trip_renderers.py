@@ -0,0 +1,317 @@
+"""
+Trip Itinerary Renderers
+Render trips as PDF, HTML, Markdown or plain text through one traversal
+"""
+
+import argparse
+import json
+import sys
+from html import escape as escape_html
+
+from trip_pdf_generator import DEFAULT_COLOR_MAP, LAYOUTS, day_heading, event_fields, load_theme, \
+    render_pdf_bytes, subtitle_text, walk_trip
+from trip_validation import is_hex_color
+
+# Backslash-escapes for characters Markdown would otherwise read as formatting inside a line
+_MARKDOWN_ESCAPES = str.maketrans({char: '\\' + char for char in '\\`*_[]<>~'})
+
+
+class TripRenderer:
+    """
+    Base class for output formats
+
+    render() walks a trip with walk_trip(), the traversal TripPDFGenerator
+    builds its story with: the title block, then each day's header and its
+    events in order. Every event goes through event_fields(), so all formats
+    show the same labels, colors and detail rows. Subclasses turn each
+    part into output and join the parts in finish().
+
+    Text formats take trip values as typed: validate trips for them with
+    validate_trip(..., escape=False). Only the PDF expects Paragraph markup
+    (paragraph_markup), with '&', '<' and '>' escaped.
+    """
+
+    # Name used by get_renderer(), the CLI and the render server
+    format = None
+    media_type = 'text/plain'
+    extension = '.txt'
+    paragraph_markup = False
+
+    def __init__(self, custom_event_types=None):
+        self.custom_event_types = custom_event_types
+        if custom_event_types:
+            self.color_map = {k.upper(): v for k, v in custom_event_types.items()}
+        else:
+            self.color_map = DEFAULT_COLOR_MAP
+
+    def render(self, trip_data):
+        """Render a trip; returns str, or bytes for binary formats"""
+        return self.finish(list(walk_trip(trip_data, self.title, self.day)))
+
+    def day(self, day_number, date, events):
+        """Parts for a day: its header, then one part per event"""
+        parts = [self.day_header(day_number, date)]
+        color_map = self.color_map
+        for event in events:
+            parts.append(self.event(*event_fields(event, color_map)))
+        return parts
+
+    def title(self, trip_name, destination, dates):
+        """Parts for the title block"""
+        raise NotImplementedError
+
+    def day_header(self, day_number, date):
+        raise NotImplementedError
+
+    def event(self, event_type, time, color, details):
+        """Part for one event, from event_fields()"""
+        raise NotImplementedError
+
+    def finish(self, parts):
+        return ''.join(parts)
+
+
+class TextRenderer(TripRenderer):
+    """Plain text, e.g. for SMS, chat messages or the text part of an email"""
+
+    format = 'text'
+
+    def title(self, trip_name, destination, dates):
+        trip_name = str(trip_name)
+        parts = [f"{trip_name}\n{'=' * len(trip_name)}\n"]
+        subtitle = subtitle_text(destination, dates)
+        if subtitle:
+            parts.append(f"{subtitle}\n")
+        return parts
+
+    def day_header(self, day_number, date):
+        heading = day_heading(day_number, date)
+        return f"\n{heading}\n{'-' * len(heading)}\n"
+
+    def event(self, event_type, time, color, details):
+        lines = [f"{event_type} · {time}" if time else event_type]
+        for label, value in details:
+            # Continuation lines of multi-line values stay indented under the label
+            lines.append(f"  {label}: " + str(value).replace('\n', '\n    '))
+        return '\n'.join(lines) + '\n\n'
+
+    def finish(self, parts):
+        return ''.join(parts).rstrip('\n') + '\n'
+
+
+class MarkdownRenderer(TripRenderer):
+    """Markdown, e.g. for chat messages, issue trackers or notes apps"""
+
+    format = 'markdown'
+    media_type = 'text/markdown'
+    extension = '.md'
+
+    @staticmethod
+    def _text(value):
+        return str(value).translate(_MARKDOWN_ESCAPES)
+
+    def title(self, trip_name, destination, dates):
+        parts = [f"# {self._text(trip_name)}\n"]
+        subtitle = subtitle_text(destination, dates)
+        if subtitle:
+            parts.append(f"\n*{self._text(subtitle)}*\n")
+        return parts
+
+    def day_header(self, day_number, date):
+        return f"\n## {self._text(day_heading(day_number, date))}\n"
+
+    def event(self, event_type, time, color, details):
+        text = self._text
+        lines = [f"\n**{text(event_type)}**" + (f" · {text(time)}" if time else '')]
+        if details:
+            lines.append('')
+        for label, value in details:
+            # A hard line break keeps multi-line values inside their list item
+            lines.append(f"- **{text(label)}:** " + text(value).replace('\n', '  \n  '))
+        return '\n'.join(lines) + '\n'
+
+
+class HTMLRenderer(TripRenderer):
+    """
+    HTML with inline styles, in the PDF's colors
+
+    Inline styles survive email clients, which drop <style> blocks. By
+    default the output is a fragment for embedding in an email body or a
+    page; standalone=True wraps it in a complete document.
+    """
+
+    format = 'html'
+    media_type = 'text/html'
+    extension = '.html'
+
+    def __init__(self, custom_event_types=None, standalone=False):
+        TripRenderer.__init__(self, custom_event_types)
+        self.standalone = standalone
+
+    @staticmethod
+    def _text(value):
+        return escape_html(str(value), quote=False).replace('\n', '<br>')
+
+    def title(self, trip_name, destination, dates):
+        parts = [
+            '<div style="font-family:Helvetica,Arial,sans-serif;color:#333333;max-width:680px;margin:0 auto">\n',
+            '<h1 style="font-size:28px;color:#1a1a1a;text-align:center;margin:24px 0 12px">'
+            f'{self._text(trip_name)}</h1>\n',
+        ]
+        subtitle = subtitle_text(destination, dates)
+        if subtitle:
+            parts.append('<p style="font-size:14px;color:#666666;text-align:center;margin:0 0 24px">'
+                         f'{self._text(subtitle)}</p>\n')
+        return parts
+
+    def day_header(self, day_number, date):
+        return ('<h2 style="font-size:20px;color:#2c3e50;margin:28px 0 12px">'
+                f'{self._text(day_heading(day_number, date))}</h2>\n')
+
+    def event(self, event_type, time, color, details):
+        text = self._text
+        # The color goes into a style attribute, so nothing but '#rrggbb' may reach it
+        if not is_hex_color(color):
+            color = DEFAULT_COLOR_MAP['OTHER']
+        rows = [
+            '<table role="presentation" style="width:100%;border-collapse:collapse;margin:0 0 14px;'
+            'border-bottom:1px solid #e0e0e0">\n',
+            f'<tr><th style="background:{color};color:#ffffff;text-align:left;padding:8px 12px;font-size:14px">'
+            f'{text(event_type)}</th>'
+            f'<th style="background:{color};color:#ffffff;text-align:right;padding:8px 12px;font-size:14px;'
+            f'font-weight:normal">{text(time)}</th></tr>\n',
+        ]
+        for label, value in details:
+            rows.append(
+                '<tr><td style="background:#f8f9fa;color:#888888;font-size:12px;font-weight:bold;'
+                f'padding:4px 12px;width:20%;vertical-align:top">{text(label)}:</td>'
+                '<td style="background:#f8f9fa;color:#333333;font-size:13px;padding:4px 12px">'
+                f'{text(value)}</td></tr>\n')
+        rows.append('</table>\n')
+        return ''.join(rows)
+
+    def finish(self, parts):
+        body = ''.join(parts) + '</div>\n'
+        if not self.standalone:
+            return body
+        return ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+                '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+                '</head>\n<body>\n' + body + '</body>\n</html>\n')
+
+
+class PDFRenderer(TripRenderer):
+    """The PDF, laid out by TripPDFGenerator over the same traversal"""
+
+    format = 'pdf'
+    media_type = 'application/pdf'
+    extension = '.pdf'
+    paragraph_markup = True
+
+    def __init__(self, custom_event_types=None, layout='cards', theme=None, optimize=False, qr_codes=False):
+        TripRenderer.__init__(self, custom_event_types)
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout!r}; expected one of {LAYOUTS}")
+        self.layout = layout
+        self.theme = theme
+        self.optimize = optimize
+        self.qr_codes = qr_codes
+
+    def render(self, trip_data):
+        # TripPDFGenerator.trip_flowables walks the trip with walk_trip()
+        return render_pdf_bytes(trip_data, self.custom_event_types, layout=self.layout, theme=self.theme,
+                                optimize=self.optimize, qr_codes=self.qr_codes)
+
+
+# Output formats by name
+RENDERERS = {
+    'pdf': PDFRenderer,
+    'html': HTMLRenderer,
+    'markdown': MarkdownRenderer,
+    'text': TextRenderer,
+}
+FORMATS = tuple(RENDERERS)
+
+
+def get_renderer(format, custom_event_types=None, **options):
+    """
+    Renderer for an output format
+
+    Args:
+        format: One of FORMATS
+        custom_event_types: Optional dictionary mapping event type names to color hex codes
+        options: Format options, e.g. layout= for 'pdf' or standalone= for 'html'
+    """
+    try:
+        renderer_class = RENDERERS[format]
+    except KeyError:
+        raise ValueError(f"Unknown format {format!r}; expected one of {FORMATS}") from None
+    return renderer_class(custom_event_types, **options)
+
+
+def render_trip(trip_data, format='text', custom_event_types=None, **options):
+    """
+    Render a trip in any output format
+
+    Returns:
+        str for text formats, bytes for 'pdf'
+    """
+    return get_renderer(format, custom_event_types, **options).render(trip_data)
+
+
+def main(argv=None):
+    from batch_generator import InvalidRecord, iter_trip_file
+    from trip_validation import validate_trip
+
+    parser = argparse.ArgumentParser(description="Render a trip itinerary as PDF, HTML, Markdown or text")
+    parser.add_argument('input', help="JSON or JSONL file, or - for JSONL on stdin; the first trip is rendered")
+    parser.add_argument('-f', '--format', choices=FORMATS, default='text', help="Output format (default: text)")
+    parser.add_argument('-o', '--output', help="Output file (default: stdout; required for pdf)")
+    parser.add_argument('--event-types', help="JSON file mapping event type names to color hex codes")
+    parser.add_argument('--standalone', action='store_true', help="HTML: write a complete document")
+    parser.add_argument('--theme', help="PDF: JSON theme file (see trip_pdf_generator.load_theme)")
+    parser.add_argument('--qr-codes', action='store_true', help="PDF: add QR codes for addresses and confirmations")
+    args = parser.parse_args(argv)
+
+    if args.format == 'pdf' and not args.output:
+        parser.error("--output is required for pdf")
+
+    custom_event_types = None
+    if args.event_types:
+        with open(args.event_types, encoding='utf-8') as f:
+            custom_event_types = json.load(f)
+
+    options = {}
+    if args.standalone and args.format == 'html':
+        options['standalone'] = True
+    if args.theme and args.format == 'pdf':
+        try:
+            options['theme'] = load_theme(args.theme)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.qr_codes and args.format == 'pdf':
+        options['qr_codes'] = True
+    renderer = get_renderer(args.format, custom_event_types, **options)
+
+    trip_data = next(iter(iter_trip_file(args.input)), None)
+    if trip_data is None or isinstance(trip_data, InvalidRecord):
+        print(f"❌ {args.input}: {trip_data.error if trip_data else 'no trip found'}", file=sys.stderr)
+        return 1
+    report = validate_trip(trip_data, custom_event_types, escape=renderer.paragraph_markup)
+    if not report.ok:
+        print(f"❌ {args.input}: {report.message()}", file=sys.stderr)
+        return 1
+
+    output = renderer.render(report.trip)
+    if args.output is None:
+        sys.stdout.write(output)
+    elif isinstance(output, bytes):
+        with open(args.output, 'wb') as f:
+            f.write(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,481 @@
+"""
+Trip Itinerary Schedule
+Read event times and day dates, sort each day, and find clashing bookings before rendering
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import re
+import sys
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+_MONTHS = {name[:3]: number for number, name in enumerate(
+    ('january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+     'september', 'october', 'november', 'december'), 1)}
+_WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+_WEEKDAY_NUMBERS = {name[:3].lower(): number for number, name in enumerate(_WEEKDAYS)}
+
+# Dates are read in the year the trip's dates name; trips that give no year
+# are laid out in this (leap) year, so their timestamps only order events
+PLACEHOLDER_YEAR = 2000
+
+_ISO_DATE = re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b')
+_MONTH_DAY = re.compile(r'\b([A-Za-z]{3,})\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4})\b)?')
+_DAY_MONTH = re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)?\s+([A-Za-z]{3,})\.?(?:,?\s+(\d{4})\b)?')
+_YEAR = re.compile(r'\b(19\d\d|20\d\d)\b')
+_WEEKDAY = re.compile(r'^\s*([A-Za-z]{3,})')
+
+# '10:30 AM', '10am', '22:15', '7-9 PM', '10:00 AM - 12:30 PM', '9h30 to 11h'
+_TIME_RANGE = re.compile(
+    r'(?<![\d:.])(?P<h1>\d{1,2})(?:[:.h](?P<m1>\d{2})|(?P<o1>h)\b)?\s*(?:(?P<p1>[ap])\.?m\b\.?)?'
+    r'(?:\s*(?:-|–|—|to\b|until\b|till\b)\s*'
+    r'(?P<h2>\d{1,2})(?:[:.h](?P<m2>\d{2})|(?P<o2>h)\b)?\s*(?:(?P<p2>[ap])\.?m\b\.?)?)?',
+    re.IGNORECASE)
+_NAMED_TIMES = (('midnight', '12:00 am'), ('noon', '12:00 pm'), ('midday', '12:00 pm'))
+# '2 hours', '90 min', '1.5h', '2 hrs 30 mins'
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)\s*(h(?:ours?|rs?)?|m(?:in(?:utes?|s)?)?)\b', re.IGNORECASE)
+
+
+def _clock(hour, minute, meridiem):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if minute > 59:
+        return None
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+    elif hour > 23:
+        return None
+    return time(hour, minute)
+
+
+@lru_cache(maxsize=4096)
+def parse_time_range(text):
+    """
+    Start and end time of an event's time text
+
+    Understands 12- and 24-hour times ('10:30 AM', '10am', '22:15', '9h30',
+    '11h', 'noon') and ranges ('7-9 PM', '10:00 AM - 12:30 PM'). A bare number such as '7'
+    is too ambiguous to read.
+
+    Returns:
+        (start, end) as datetime.time, end None when no range is given;
+        or None when text holds no readable time
+    """
+    text = str(text).lower()
+    for word, clock in _NAMED_TIMES:
+        text = text.replace(word, clock)
+    for match in _TIME_RANGE.finditer(text):
+        h1, m1, p1, h2, m2, p2 = match.group('h1', 'm1', 'p1', 'h2', 'm2', 'p2')
+        # '11h' is eleven o'clock
+        m1 = m1 or ('00' if match.group('o1') else None)
+        m2 = m2 or ('00' if match.group('o2') else None)
+        if h2 is not None and (m2 is None and p2 is None):
+            h2 = None
+        if m1 is None and p1 is None and (h2 is None or p2 is None):
+            # '7' alone, or '7-9' without AM/PM
+            continue
+        end = _clock(h2, m2, p2) if h2 is not None else None
+        if p1 is None and p2 is not None:
+            # '7-9 PM': the start shares the end's half of the day, unless that puts it after the end
+            start = _clock(h1, m1, p2)
+            if start is not None and end is not None and start > end:
+                start = _clock(h1, m1, 'a' if p2.lower() == 'p' else 'p')
+            if start is None:
+                # '13:00 - 2 PM'
+                start = _clock(h1, m1, None)
+        else:
+            start = _clock(h1, m1, p1)
+        if start is not None:
+            return start, end
+    return None
+
+
+def parse_time(text):
+    """Start time of an event's time text as datetime.time, or None (see parse_time_range)"""
+    times = parse_time_range(text)
+    return times[0] if times else None
+
+
+def parse_duration(text):
+    """timedelta for '2 hours', '90 min' or '1h 30m', or None"""
+    minutes = 0.0
+    found = False
+    for amount, unit in _DURATION.findall(str(text)):
+        minutes += float(amount) * (60 if unit[0].lower() == 'h' else 1)
+        found = True
+    return timedelta(minutes=minutes) if found and minutes > 0 else None
+
+
+def _read_date(text):
+    """(month, day, year or None, written weekday or None) from date text, or None"""
+    text = str(text)
+    match = _ISO_DATE.search(text)
+    if match:
+        year, month, day = map(int, match.groups())
+        return month, day, year, None
+    weekday = None
+    match = _WEEKDAY.match(text)
+    if match:
+        weekday = _WEEKDAY_NUMBERS.get(match.group(1)[:3].lower())
+    for pattern, month_group, day_group in ((_MONTH_DAY, 1, 2), (_DAY_MONTH, 2, 1)):
+        for match in pattern.finditer(text):
+            month = _MONTHS.get(match.group(month_group)[:3].lower())
+            if month is not None:
+                year = match.group(3)
+                return month, int(match.group(day_group)), int(year) if year else None, weekday
+    return None
+
+
+def parse_date(text, year=None):
+    """
+    datetime.date for date text such as 'Saturday, June 15', '15 June 2024' or '2024-06-15'
+
+    Args:
+        text: Date text
+        year: Year for text that gives none
+
+    Returns:
+        The date, or None when text is not a date or names no year and year is None
+    """
+    parts = _read_date(text)
+    if parts is None:
+        return None
+    month, day, text_year, _ = parts
+    try:
+        return date(text_year or year, month, day) if (text_year or year) else None
+    except ValueError:
+        return None
+
+
+def _nearest_date(month, day, near):
+    """The date with this month and day nearest to near (raises ValueError when there is none)"""
+    candidates = []
+    for year in (near.year - 1, near.year, near.year + 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            pass
+    if not candidates:
+        raise ValueError(f"no date {month}/{day}")
+    return min(candidates, key=lambda candidate: abs(candidate - near))
+
+
+def trip_year(trip_data):
+    """The first year named in the trip's dates or day dates, or None"""
+    for text in [trip_data.get('dates')] + [day.get('date') for day in trip_data.get('days', [])]:
+        match = _YEAR.search(str(text or ''))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def find_overlaps(intervals):
+    """
+    Every pair of overlapping intervals, by one sweep over their start times
+
+    Intervals are (start, end, item) with end >= start; end == start is an
+    instant. Two intervals overlap when each starts before the other ends,
+    or when they start at the same moment (two bookings at 7:00 PM).
+    Intervals still open are kept in a heap by end, so the sweep takes
+    O(n log n + k) for n intervals and k overlapping pairs, however long
+    the trip.
+
+    Yields:
+        (earlier item, later item) for each overlapping pair
+    """
+    active = []
+    ordered = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+    for sequence, (start, end, item) in enumerate(ordered):
+        # Drop what ended before this start; instants at this very start stay open
+        while active and active[0][0] <= start and active[0][2] < start:
+            heapq.heappop(active)
+        for other_end, _, other_start, other in active:
+            if other_end > start or other_start == start:
+                yield other, item
+        heapq.heappush(active, (end, sequence, start, item))
+
+
+# One event on the trip's timeline; end is None for events without a known end
+ScheduledEvent = namedtuple('ScheduledEvent', 'path day_number type time start end')
+
+
+class ScheduleReport:
+    """Trip with each day sorted by time, plus the conflicts and warnings found"""
+
+    __slots__ = ('trip', 'timeline', 'conflicts', 'warnings')
+
+    def __init__(self, trip, timeline, conflicts, warnings):
+        # Copy of the trip with every day's events in time order
+        self.trip = trip
+        # ScheduledEvent for every event with a readable time, in time order
+        self.timeline = timeline
+        # (path, message) for overlapping bookings and impossible sequences
+        self.conflicts = conflicts
+        # (path, message) for times and dates that could not be read or do not agree
+        self.warnings = warnings
+
+    @property
+    def ok(self):
+        return not self.conflicts
+
+    def __repr__(self):
+        return f"ScheduleReport({len(self.conflicts)} conflicts, {len(self.warnings)} warnings)"
+
+
+class _Scheduler:
+    """One pass over a trip: day dates, event timestamps, then the checks"""
+
+    def __init__(self, trip_data):
+        self.trip_data = trip_data
+        self.year = trip_year(trip_data)
+        self.conflicts = []
+        self.warnings = []
+
+    def day_dates(self, days):
+        """Date of every day; days without a readable date follow on from their neighbours"""
+        dates = [None] * len(days)
+        year = self.year or PLACEHOLDER_YEAR
+        previous = None
+        for index, day in enumerate(days):
+            text = day.get('date')
+            if not text:
+                continue
+            label = f"Day {self.day_number(days, index)}"
+            parts = _read_date(text)
+            if parts is None:
+                self.warnings.append((f"days[{index}].date", f"{label}: cannot read date {text!r}"))
+                continue
+            month, number, text_year, weekday = parts
+            try:
+                if text_year is None and previous is not None:
+                    # December runs into January
+                    day_date = _nearest_date(month, number, previous)
+                else:
+                    day_date = date(text_year or year, month, number)
+            except ValueError:
+                self.warnings.append((f"days[{index}].date", f"{label}: {text!r} is not a date"))
+                continue
+            year = day_date.year
+            if weekday is not None and (text_year or self.year) and weekday != day_date.weekday():
+                self.warnings.append((f"days[{index}].date",
+                                      f"{label}: {day_date:%B} {day_date.day}, {day_date.year} is a "
+                                      f"{_WEEKDAYS[day_date.weekday()]}, not a {_WEEKDAYS[weekday]}"))
+            if previous is not None and day_date < previous:
+                self.conflicts.append((f"days[{index}].date",
+                                       f"{label}: {text} comes before the day listed ahead of it"))
+            dates[index] = previous = day_date
+
+        # Fill the gaps by day number (or position) from the nearest dated day
+        anchors = [index for index, value in enumerate(dates) if value is not None]
+        if not anchors:
+            anchors = [0]
+            dates[0:1] = [date(PLACEHOLDER_YEAR, 1, 1)] if dates else []
+        for index, value in enumerate(dates):
+            if value is None:
+                position = bisect.bisect(anchors, index)
+                anchor_index = min(anchors[max(position - 1, 0):position + 1], key=lambda a: abs(a - index))
+                offset = self.day_number(days, index) - self.day_number(days, anchor_index)
+                dates[index] = dates[anchor_index] + timedelta(days=offset)
+        return dates
+
+    @staticmethod
+    def day_number(days, index):
+        number = days[index].get('day_number')
+        return number if isinstance(number, int) else index + 1
+
+    def schedule(self):
+        trip_data = self.trip_data
+        days = list(trip_data.get('days', []))
+        dates = self.day_dates(days)
+
+        timeline = []
+        stays = []
+        sorted_days = []
+        for day_index, day in enumerate(days):
+            number = self.day_number(days, day_index)
+            keyed = []
+            # Events without a time stay after the event before them
+            last_start = datetime.combine(dates[day_index], time.min)
+            for event_index, event in enumerate(day.get('events', [])):
+                path = f"days[{day_index}].events[{event_index}]"
+                scheduled = self.event_times(event, path, number, dates[day_index])
+                if scheduled is not None:
+                    timeline.append(scheduled)
+                    last_start = scheduled.start
+                    if scheduled.type == 'HOTEL':
+                        stay = self.stay(event, path, number, dates[day_index], scheduled.start)
+                        if stay is not None:
+                            stays.append(stay)
+                elif str(event.get('type', '')).upper() == 'HOTEL':
+                    stay = self.stay(event, path, number, dates[day_index], last_start)
+                    if stay is not None:
+                        stays.append(stay)
+                keyed.append((last_start, event_index, event))
+            keyed.sort(key=lambda item: item[:2])
+            sorted_day = dict(day)
+            sorted_day['events'] = [event for _, _, event in keyed]
+            sorted_days.append(sorted_day)
+
+        timeline.sort(key=lambda scheduled: (scheduled.start, scheduled.path))
+        self.check_overlaps(timeline)
+        self.check_stays(stays, timeline)
+
+        trip = dict(trip_data)
+        if 'days' in trip_data:
+            trip['days'] = sorted_days
+        return ScheduleReport(trip, timeline, self.conflicts, self.warnings)
+
+    def event_times(self, event, path, day_number, day_date):
+        """ScheduledEvent for an event with a readable time, or None"""
+        text = event.get('time')
+        if not text:
+            return None
+        times = parse_time_range(text)
+        if times is None:
+            self.warnings.append((f"{path}.time",
+                                  f"Day {day_number}: cannot read time {text!r}; the event keeps its place"))
+            return None
+        start_time, end_time = times
+        if end_time is None and event.get('ends'):
+            end_time = parse_time(event.get('ends'))
+        start = datetime.combine(day_date, start_time)
+        end = None
+        if end_time is not None:
+            end = datetime.combine(day_date, end_time)
+            if end < start:
+                # Past midnight
+                end += timedelta(days=1)
+        elif event.get('duration'):
+            duration = parse_duration(event.get('duration'))
+            if duration is not None:
+                end = start + duration
+        return ScheduledEvent(path, day_number, str(event.get('type', 'Event')).upper(), str(text), start, end)
+
+    @staticmethod
+    def date_near(text, near):
+        """Date text read in the year that puts it nearest to near, unless it names its own year"""
+        parts = _read_date(text)
+        if parts is None:
+            return None
+        month, number, text_year, _ = parts
+        try:
+            return date(text_year, month, number) if text_year else _nearest_date(month, number, near)
+        except ValueError:
+            return None
+
+    def stay(self, event, path, day_number, day_date, start):
+        """(check-in, check-out, path, day number) for a hotel with a check-out date, or None"""
+        check_out_text = event.get('check_out')
+        if not check_out_text:
+            return None
+        check_out = self.date_near(check_out_text, day_date)
+        if check_out is None:
+            self.warnings.append((f"{path}.check_out",
+                                  f"Day {day_number}: cannot read check-out date {check_out_text!r}"))
+            return None
+        check_in = day_date
+        if event.get('check_in'):
+            check_in = self.date_near(event.get('check_in'), day_date) or day_date
+        if check_out <= check_in:
+            self.conflicts.append((f"{path}.check_out",
+                                   f"Day {day_number}: HOTEL checks out ({check_out_text}) "
+                                   f"before it checks in"))
+            return None
+        return max(start, datetime.combine(check_in, time.min)), check_out, path, day_number
+
+    def check_overlaps(self, timeline):
+        intervals = ((scheduled.start, scheduled.end or scheduled.start, scheduled) for scheduled in timeline)
+        for earlier, later in find_overlaps(intervals):
+            where = f" on day {earlier.day_number}" if earlier.day_number != later.day_number else ''
+            self.conflicts.append((later.path,
+                                   f"Day {later.day_number}: {later.type} at {later.time} overlaps "
+                                   f"{earlier.type} at {earlier.time}{where}"))
+
+    def check_stays(self, stays, timeline):
+        # Stays overlap when two hotels are booked for the same night
+        nights = ((datetime.combine(start.date(), time.min), datetime.combine(check_out, time.min), (path, day))
+                  for start, check_out, path, day in stays)
+        for (_, earlier_day), (later_path, later_day) in find_overlaps(nights):
+            self.conflicts.append((later_path,
+                                   f"Day {later_day}: HOTEL stay overlaps the HOTEL stay from day {earlier_day}"))
+
+        # A stay cannot end after the next flight has left
+        flights = [scheduled for scheduled in timeline if scheduled.type == 'FLIGHT']
+        starts = [scheduled.start for scheduled in flights]
+        for start, check_out, path, day in stays:
+            position = bisect.bisect_right(starts, start)
+            if position < len(flights) and flights[position].start.date() < check_out:
+                flight = flights[position]
+                self.conflicts.append((f"{path}.check_out",
+                                       f"Day {day}: HOTEL checks out on {check_out:%B} {check_out.day}, "
+                                       f"after the FLIGHT on day {flight.day_number} at {flight.time}"))
+
+
+def check_schedule(trip_data):
+    """
+    Read every time and date in a trip, sort each day, and find conflicts
+
+    Event times ('10:30 AM', '7-9 PM', '22:15') are combined with the day's
+    date into timestamps; an event's end comes from a time range, its
+    'ends' field or its 'duration'. Day dates are read in the year the
+    trip names; days without a date follow on from their neighbours.
+
+    Conflicts are events that overlap (or start at the same time), days
+    listed out of date order, hotels checking out before they check in,
+    hotel stays sharing a night, and hotel check-outs after the next
+    flight. Times and dates that cannot be read, and weekdays that do not
+    match their date, are warnings.
+
+    Each day's events are sorted by start time. Events without a readable
+    time keep their place after the event before them, so notes stay
+    where they were written.
+
+    Args:
+        trip_data: Trip data dictionary (or trip_model.Trip), e.g. from validate_trip
+
+    Returns:
+        ScheduleReport with the sorted trip, its timeline, conflicts and warnings
+    """
+    return _Scheduler(trip_data).schedule()
+
+
+def main(argv=None):
+    from batch_generator import InvalidRecord, iter_trip_file
+
+    parser = argparse.ArgumentParser(description="Sort trip events by time and report clashing bookings")
+    parser.add_argument('inputs', nargs='+',
+                        help="JSON files holding a trip or a list of trips, "
+                             "JSONL/NDJSON files with one trip per line, or - for JSONL on stdin")
+    parser.add_argument('-o', '--output', help="Write the sorted trips to this JSONL file")
+    args = parser.parse_args(argv)
+
+    conflicts = 0
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        for path in args.inputs:
+            for index, trip_data in enumerate(iter_trip_file(path)):
+                if isinstance(trip_data, InvalidRecord):
+                    print(f"❌ {path} trip #{index}: {trip_data.error}", file=sys.stderr)
+                    continue
+                report = check_schedule(trip_data)
+                for item_path, message in report.conflicts:
+                    print(f"❌ {path} trip #{index} {item_path}: {message}")
+                for item_path, message in report.warnings:
+                    print(f"⚠️ {path} trip #{index} {item_path}: {message}")
+                conflicts += len(report.conflicts)
+                if output is not None:
+                    output.write(json.dumps(report.trip, ensure_ascii=False) + '\n')
+    finally:
+        if output is not None:
+            output.close()
+    return 1 if conflicts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Trip Itinerary Validation
+Check, coerce and escape trip data in one pass before it reaches ReportLab
+"""
+
+import re
+from collections.abc import Mapping
+
+from trip_pdf_generator import DEFAULT_COLOR_MAP
+
+# Declared trip structure: field name -> expected kind
+#   'text'   - string; numbers are converted to strings
+#   'int'    - integer; integral numbers and digit strings are converted
+#   'list'   - list of nested records
+TRIP_SCHEMA = {
+    'title': 'text',
+    'destination': 'text',
+    'dates': 'text',
+    'days': 'list',
+}
+DAY_SCHEMA = {
+    'day_number': 'int',
+    'date': 'text',
+    'events': 'list',
+}
+# Events may carry any other detail fields; those must be text as well
+EVENT_SCHEMA = {
+    'type': 'text',
+    'time': 'text',
+}
+
+# Event type colors: '#rrggbb'
+HEX_COLOR = re.compile(r'#[0-9a-fA-F]{6}')
+
+# An '&' and the entity it may start
+_AMPERSAND = re.compile(r'&(?:#(\d+);|#[xX]([0-9a-fA-F]+);|[a-zA-Z][a-zA-Z0-9]*;)?')
+
+
+def _escape_ampersand(match):
+    """Keep entities (numeric ones only within the Unicode range); escape bare '&'"""
+    entity = match.group(0)
+    if entity == '&':
+        return '&amp;'
+    decimal, hexadecimal = match.groups()
+    if decimal is not None or hexadecimal is not None:
+        code_point = int(decimal) if decimal is not None else int(hexadecimal, 16)
+        if code_point > 0x10FFFF:
+            return '&amp;' + entity[1:]
+    return entity
+
+
+class TripValidationError(ValueError):
+    """Raised by normalize_trip; errors holds every (path, message) found"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        ValueError.__init__(self, _summarize(errors))
+
+
+def escape_markup(text):
+    """
+    Escape text for Paragraph markup
+
+    Existing entities such as &amp; are kept, so escaping twice is harmless.
+    """
+    if '&' in text:
+        text = _AMPERSAND.sub(_escape_ampersand, text)
+    if '<' in text or '>' in text:
+        text = text.replace('<', '&lt;').replace('>', '&gt;')
+    return text
+
+
+def is_hex_color(value):
+    """True for an event type color in '#rrggbb' form"""
+    return isinstance(value, str) and HEX_COLOR.fullmatch(value) is not None
+
+
+def _summarize(errors, limit=5):
+    shown = [f"{path}: {message}" if path else message for path, message in errors[:limit]]
+    if len(errors) > limit:
+        shown.append(f"... and {len(errors) - limit} more")
+    return '; '.join(shown)
+
+
+class ValidationReport:
+    """Normalized trip plus every error and warning found in it"""
+
+    __slots__ = ('trip', 'errors', 'warnings')
+
+    def __init__(self, trip, errors, warnings):
+        # Normalized copy of the input; only meaningful when ok
+        self.trip = trip
+        self.errors = errors
+        self.warnings = warnings
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def message(self):
+        """One-line description of the errors"""
+        return _summarize(self.errors)
+
+    def __repr__(self):
+        return f"ValidationReport({len(self.errors)} errors, {len(self.warnings)} warnings)"
+
+
+class _Validator:
+    """One validation pass; collects issues while building the normalized copy"""
+
+    __slots__ = ('known_types', 'escape', 'errors', 'warnings')
+
+    def __init__(self, known_types, escape):
+        self.known_types = known_types
+        self.escape = escape
+        self.errors = []
+        self.warnings = []
+
+    def value(self, kind, value, path):
+        """Coerce a scalar field; returns None for empty or invalid values"""
+        if value is None or value == '':
+            return None
+        if kind == 'int':
+            if isinstance(value, bool):
+                pass
+            elif isinstance(value, int):
+                return value
+            elif isinstance(value, float) and value.is_integer():
+                return int(value)
+            elif isinstance(value, str) and value.strip().isdigit():
+                return int(value)
+            self.errors.append((path, f"expected a whole number, got {value!r}"))
+            return None
+        if isinstance(value, str):
+            return escape_markup(value) if self.escape else value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        self.errors.append((path, f"expected text, got {type(value).__name__}"))
+        return None
+
+    def record(self, data, schema, path, name):
+        """Validate a trip/day/event object, calling back for nested lists"""
+        if not isinstance(data, Mapping):
+            self.errors.append((path, f"expected {name} object, got {type(data).__name__}"))
+            return None
+        normalized = {}
+        for key, value in data.items():
+            field_path = f"{path}.{key}" if path else str(key)
+            if not isinstance(key, str):
+                self.errors.append((path, f"field name {key!r} is not a string"))
+                continue
+            kind = schema.get(key)
+            if kind == 'list':
+                value = self.nested(key, value, field_path)
+            elif kind is not None:
+                value = self.value(kind, value, field_path)
+            elif schema is EVENT_SCHEMA:
+                # Detail field names stay raw: the PDF escapes the labels built from them
+                value = self.value('text', value, field_path)
+            else:
+                self.warnings.append((field_path, "unknown field is ignored"))
+                continue
+            if value is not None:
+                normalized[key] = value
+        return normalized
+
+    def nested(self, key, value, path):
+        if not isinstance(value, (list, tuple)):
+            self.errors.append((path, f"expected a list, got {type(value).__name__}"))
+            return None
+        if key == 'days':
+            items = [self.record(day, DAY_SCHEMA, f"{path}[{i}]", 'a day') for i, day in enumerate(value)]
+        else:
+            items = [self.event(event, f"{path}[{i}]") for i, event in enumerate(value)]
+        return [item for item in items if item is not None]
+
+    def event(self, data, path):
+        event = self.record(data, EVENT_SCHEMA, path, 'an event')
+        if event is None:
+            return None
+        event_type = event.get('type')
+        if event_type is None:
+            self.warnings.append((f"{path}.type", "missing event type is drawn as EVENT"))
+        elif self.known_types is not None and event_type.upper() not in self.known_types:
+            self.warnings.append((f"{path}.type",
+                                  f"unknown event type {event_type!r} is drawn in the OTHER color"))
+        return event
+
+
+def validate_trip(trip_data, custom_event_types=None, escape=True):
+    """
+    Check trip data against the trip schema in a single pass
+
+    Every error is collected rather than stopping at the first one.
+    Numbers in text fields become strings, day numbers become integers,
+    empty values are dropped, and (with escape) '&', '<' and '>' are
+    escaped so they reach the PDF as literal text instead of being parsed
+    as Paragraph markup.
+
+    Args:
+        trip_data: Trip data dictionary (or trip_model.Trip)
+        custom_event_types: Optional dictionary mapping event type names to
+            color hex codes; colors not in '#rrggbb' form are errors, and
+            event types that are neither default nor listed here produce a
+            warning
+        escape: Escape Paragraph markup in text values
+
+    Returns:
+        ValidationReport holding the normalized trip, errors and warnings
+    """
+    known_types = set(DEFAULT_COLOR_MAP)
+    validator = _Validator(known_types, escape)
+    if custom_event_types:
+        for name, color in custom_event_types.items():
+            if not isinstance(name, str):
+                validator.errors.append(('event_types', f"event type name {name!r} is not a string"))
+            elif not is_hex_color(color):
+                validator.errors.append((f"event_types.{name}", f"expected a #rrggbb color, got {color!r}"))
+            else:
+                known_types.add(name.upper())
+    trip = validator.record(trip_data, TRIP_SCHEMA, '', 'a trip')
+    return ValidationReport(trip, validator.errors, validator.warnings)
+
+
+def normalize_trip(trip_data, custom_event_types=None, escape=True):
+    """
+    Validate trip data and return the normalized trip
+
+    Raises:
+        TripValidationError: listing every error in the trip
+    """
+    report = validate_trip(trip_data, custom_event_types, escape)
+    if not report.ok:
+        raise TripValidationError(report.errors)
+    return report.trip